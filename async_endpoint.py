@@ -0,0 +1,434 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import base64
+import csv
+import logging
+import re
+import time
+
+import aiohttp
+
+from cache import Cache
+from endpoint import Endpoint
+from extractor import extract_nodes, extract_nat_rules
+
+
+async def collect(rows):
+    """
+    Gathers records of some report
+
+    :param rows: report records, as provided by ``AsyncEndpoint``
+    :type rows: async iterator of list
+
+    :return: report records
+    :rtype: list of list
+    """
+
+    return [row async for row in rows]
+
+
+class AsyncEndpoint(object):
+    """
+    Implements an asynchronous API endpoint for the MCP
+
+    This requires python 3.6 or later, and the ``aiohttp`` package. All
+    regions can be handled from a single event loop, like this::
+
+        endpoints = [AsyncEndpoint(key, secret, region)
+                     for region in ('dd-af', 'dd-ap', 'dd-au', 'dd-eu')]
+
+        nodes = await asyncio.gather(
+            *[endpoint.get_node_by_id(id) for endpoint, id in targets])
+
+    The blocking ``Endpoint`` is still used by the pump.
+    """
+
+    HOSTS = Endpoint.HOSTS
+
+    def __init__(self, key, secret, region, endpoint=None, orgId=None,
+                 settings={}):
+        """
+        Binds to the API of one MCP region
+
+        :param key: user name to authenticate to the API
+        :type key: ``str``
+
+        :param secret: user password to authenticate to the API
+        :type secret: ``str``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param endpoint: base URL of the API, for test injection
+        :type endpoint: ``str`` or `None`
+
+        :param orgId: unique id of the organisation, for test injection
+        :type orgId: ``str`` or `None`
+
+        :param settings: the parameters of the pump, e.g., ``config.pump``
+        :type settings: ``dict``
+
+        Concurrent calls to the API of the region are limited, and this
+        can be set in the configuration file, like this::
+
+            pump = {
+                'concurrency': 8,
+            }
+
+        """
+
+        assert key not in (None, '')
+        self.key = key
+
+        assert secret not in (None, '')
+        self.secret = secret
+
+        assert region not in (None, '')
+        self.region = region
+
+        self.settings = settings
+
+        self.endpoint = endpoint if endpoint else self.HOSTS[region]
+        self.orgId = orgId
+
+        self._session = None
+        self._semaphore = None
+        self._pending = {}
+
+        self.calls = 0
+        self.elapsed = 0.0
+
+        self.nodes = Cache(size=settings.get('node_cache_size', 1000),
+                           ttl=settings.get('node_cache_ttl', 3600))
+
+        self.nat_rules = Cache(ttl=settings.get('nat_rules_ttl', 900))
+
+    def get_session(self):
+        """
+        Provides a pool of HTTP connections to the API
+
+        :return: a session that keeps connections alive
+        :rtype: ``aiohttp.ClientSession``
+
+        This has to be called from within the event loop.
+        """
+
+        if self._session is None or self._session.closed:
+
+            connector = aiohttp.TCPConnector(
+                limit=self.settings.get('pool_size', 10))
+
+            credentials = u'{}:{}'.format(self.key, self.secret)
+            authorization = 'Basic ' + base64.b64encode(
+                credentials.encode('utf-8')).decode('ascii')
+
+            self._session = aiohttp.ClientSession(
+                headers={'Authorization': authorization},
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(
+                    total=self.settings.get('timeout', 60)))
+
+            self._semaphore = asyncio.Semaphore(
+                self.settings.get('concurrency', 8))
+
+        return self._session
+
+    async def close(self):
+        """
+        Releases connections to the API
+        """
+
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def get(self, url):
+        """
+        Gets some resource from the API
+
+        :param url: the target resource
+        :type url: ``str``
+
+        :return: status code and text of the response
+        :rtype: ``tuple``
+        """
+
+        session = self.get_session()
+        async with self._semaphore:
+
+            start = time.time()
+            async with session.get(url) as r:
+                text = await r.text()
+            elapsed = time.time() - start
+
+        self.calls += 1
+        self.elapsed += elapsed
+        logging.debug(u"- {} ms for {}".format(int(elapsed*1000), url))
+
+        return r.status, text
+
+    def get_latency(self):
+        """
+        Reports on the average latency of API calls
+
+        :return: average duration of API calls, in seconds
+        :rtype: ``float``
+        """
+
+        if self.calls < 1:
+            return 0.0
+
+        return self.elapsed / self.calls
+
+    async def get_url_v1(self):
+        """
+        Provides the base URL of version 1 of the API
+
+        The unique id of the organisation is discovered on first call.
+        """
+
+        if self.orgId is None:
+            status, text = await self.get(self.endpoint+'/oec/0.9/myaccount')
+            match = re.search(r":orgId>([a-f0-9\-]+)</", text)
+            if match is None:
+                raise RuntimeError("Unable to get orgId from API")
+            self.orgId = match.group(1)
+
+        return self.endpoint+'/oec/0.9/'+self.orgId
+
+    async def get_url_v2(self):
+        """
+        Provides the base URL of version 2 of the API
+        """
+
+        await self.get_url_v1()
+        return self.endpoint+'/caas/2.5/'+self.orgId
+
+    async def get_rows(self, url):
+        """
+        Streams records of a CSV report from the API
+
+        :param url: the target report
+        :type url: ``str``
+
+        :return: report records, one at a time
+        :rtype: async iterator of list
+
+        Lines are parsed by the ``csv`` module as they are received.
+        """
+
+        session = self.get_session()
+        async with self._semaphore:
+
+            start = time.time()
+            async with session.get(url) as r:
+                encoding = r.charset or 'utf-8'
+                async for line in r.content:
+                    line = line.decode(encoding).rstrip('\r\n')
+                    for row in csv.reader([line]):
+                        if len(row) > 0:
+                            yield row
+            elapsed = time.time() - start
+
+        self.calls += 1
+        self.elapsed += elapsed
+        logging.debug(u"- {} ms for {}".format(int(elapsed*1000), url))
+
+    async def summary_usage_report(self, start_date, end_date):
+        """
+        Fetches summary usage data from the API
+
+        :param start_date: first day of the report
+        :type start_date: str
+
+        :param end_date: days after last day of the report
+        :type end_date: str
+
+        :return: report records
+        :rtype: async iterator of list
+        """
+
+        url_template = '/report/usage?startDate={}&endDate={}'
+        url = (await self.get_url_v1())+url_template.format(start_date,
+                                                           end_date)
+        async for row in self.get_rows(url):
+            yield row
+
+    async def detailed_usage_report(self, start_date, end_date):
+        """
+        Fetches detailed usage data from the API
+
+        :param start_date: first day of the report
+        :type start_date: str
+
+        :param end_date: days after last day of the report
+        :type end_date: str
+
+        :return: report records
+        :rtype: async iterator of list
+        """
+
+        url_template = '/report/usageDetailed?startDate={}&endDate={}'
+        url = (await self.get_url_v1())+url_template.format(start_date,
+                                                           end_date)
+        async for row in self.get_rows(url):
+            yield row
+
+    async def audit_log_report(self, start_date, end_date):
+        """
+        Fetches audit data from the API
+
+        :param start_date: first day of the report
+        :type start_date: str
+
+        :param end_date: days after last day of the report
+        :type end_date: str
+
+        :return: report records
+        :rtype: async iterator of list
+        """
+
+        url_template = '/auditlog?startDate={}&endDate={}'
+        url = (await self.get_url_v1())+url_template.format(start_date,
+                                                           end_date)
+        async for row in self.get_rows(url):
+            yield row
+
+    async def get_node_by_id(self, id):
+        """
+        Retrieves node details from the API
+
+        :param id: unique id of the target node
+        :type id: str
+
+        :return: attributes of the node
+        :rtype: dict or None
+
+        """
+
+        node = self.nodes.get(id)
+        if node is not None:
+            return node
+
+        url = (await self.get_url_v2())+'/server/server/'+id
+        status, text = await self.get(url)
+
+        if status != 200:
+            logging.error(u"Status: {}".format(status))
+            return None
+
+        try:
+            total, nodes = extract_nodes(text)
+            node = nodes[0]
+        except:
+            logging.error(u"Response: {}".format(text))
+            raise RuntimeError("Unable to get node from API")
+
+        try:
+            node['public_ip'] = await self.get_public_ip(
+                node['networkDomainId'],
+                node['private_ips'][0])
+
+            self.nodes.put(node['id'], node)  # only complete nodes
+
+        except Exception as feedback:
+            logging.debug(feedback)
+            node['public_ip'] = None
+
+        return node
+
+    async def get_nat_rules(self, networkDomainId):
+        """
+        Indexes NAT rules of some network domain
+
+        :param networkDomainId: unique id of the target network domain
+        :type networkDomainId: str
+
+        :return: external IP addresses by internal IP address
+        :rtype: dict
+
+        Concurrent lookups in the same network domain share a single
+        listing of NAT rules.
+        """
+
+        rules = self.nat_rules.get(networkDomainId)
+        if rules is not None:
+            return rules
+
+        if networkDomainId not in self._pending:
+            self._pending[networkDomainId] = asyncio.ensure_future(
+                self.list_nat_rules(networkDomainId))
+
+        try:
+            rules = await asyncio.shield(self._pending[networkDomainId])
+        finally:
+            self._pending.pop(networkDomainId, None)
+
+        return rules
+
+    async def list_nat_rules(self, networkDomainId):
+        """
+        Lists NAT rules of some network domain, page after page
+
+        :param networkDomainId: unique id of the target network domain
+        :type networkDomainId: str
+
+        :return: external IP addresses by internal IP address
+        :rtype: dict
+        """
+
+        size = self.settings.get('page_size', 250)
+        url_template = ((await self.get_url_v2())
+                        + '/network/natRule?networkDomainId={}'
+                        + '&pageSize={}&pageNumber={}')
+
+        rules = {}
+        page = 1
+        while True:
+            url = url_template.format(networkDomainId, size, page)
+            status, text = await self.get(url)
+
+            if status != 200:
+                logging.error(u"Status: {}".format(status))
+                raise RuntimeError("Unable to get NAT rules from API")
+
+            total, listed = extract_nat_rules(text)
+            rules.update(listed)
+
+            if page*size >= total:
+                break
+            page += 1
+
+        self.nat_rules.put(networkDomainId, rules)
+        return rules
+
+    async def get_public_ip(self, networkDomainId, private_ip):
+        """
+        Finds the public address of some node
+
+        :param networkDomainId: unique id of the network domain of the node
+        :type networkDomainId: str
+
+        :param private_ip: private IPv4 address of the node
+        :type private_ip: str
+
+        :return: the public IPv4 address of the node, or None
+        :rtype: str
+        """
+
+        rules = await self.get_nat_rules(networkDomainId)
+        return rules.get(private_ip)
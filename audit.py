@@ -0,0 +1,191 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+import logging
+
+
+class AuditTail(object):
+    """
+    Finds new records in successive polls of the audit log
+
+    The tail keeps a watermark, that is, the time of the most recent record
+    provided so far, and an index of unique ids of records provided
+    recently. On each poll, a binary search seeks to the watermark, minus
+    some slack for records that are written late, and only records after
+    this point are looked at. A record is new if its unique id is not in
+    the index, so that nothing is provided twice, even across midnight.
+    """
+
+    FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, slack=300, size=10000):
+        """
+        Sets a new tail
+
+        :param slack: seconds before the watermark where records are
+            looked for
+        :type slack: ``int``
+
+        :param size: the maximum number of unique ids in the index
+        :type size: ``int``
+
+        """
+
+        self.slack = slack
+        self.size = size
+
+        self.day = None      # last day that has been polled
+        self.stamp = None    # time of the most recent record
+        self.floor = None    # records before this time are ignored
+        self.uids = OrderedDict()  # time of records, by unique id
+
+    def get_state(self):
+        """
+        Provides the state of the tail, to be saved
+
+        :return: the last day, watermark, and unique ids at the watermark
+        :rtype: ``dict``
+        """
+
+        return {
+            'day': self.day.strftime("%Y-%m-%d") if self.day else None,
+            'stamp': self.stamp,
+            'uids': [uid for uid, stamp in self.uids.items()
+                     if stamp == self.stamp],
+        }
+
+    def set_state(self, state):
+        """
+        Restores the state of the tail, e.g., after a restart
+
+        :param state: the state provided by ``get_state()``
+        :type state: ``dict``
+
+        Records older than the watermark are ignored after a restart,
+        since the index of recent records has not been saved.
+        """
+
+        day = state.get('day')
+        self.day = datetime.strptime(day, "%Y-%m-%d").date() if day else None
+
+        self.stamp = state.get('stamp')
+        self.floor = self.stamp
+
+        self.uids = OrderedDict()
+        for uid in state.get('uids', []):
+            self.uids[uid] = self.stamp
+
+    def tail(self, rows, column=1):
+        """
+        Finds new records
+
+        :param rows: records of the audit log, without headers
+        :type rows: ``list`` of ``list``
+
+        :param column: the index of the column with time of records
+        :type column: ``int``
+
+        :return: records that have not been provided before
+        :rtype: ``list`` of ``list``
+
+        Records are expected to be sorted by time, as provided by the API.
+        """
+
+        start = 0
+        if self.floor is not None:
+            start = self.seek(rows, column, self.floor)
+
+        new = []
+        for index in range(start, len(rows)):
+            row = rows[index]
+            uid, stamp = row[0], row[column]
+
+            if self.floor is not None and stamp < self.floor:
+                continue  # late record, but out of slack
+
+            if uid in self.uids:
+                continue
+
+            new.append(row)
+            self.uids[uid] = stamp
+            if self.stamp is None or stamp > self.stamp:
+                self.stamp = stamp
+
+        if self.stamp is not None:
+            floor = self.get_floor(self.stamp)
+            if self.floor is None or floor > self.floor:
+                self.floor = floor
+
+        self.prune()
+        return new
+
+    def seek(self, rows, column, stamp):
+        """
+        Finds the first record that is not older than some time
+
+        :param rows: records of the audit log, sorted by time
+        :type rows: ``list`` of ``list``
+
+        :param column: the index of the column with time of records
+        :type column: ``int``
+
+        :param stamp: the target time, e.g., '2017-05-01 07:05:12'
+        :type stamp: ``str``
+
+        :return: index of the first record at this time or later
+        :rtype: ``int``
+        """
+
+        low, high = 0, len(rows)
+        while low < high:
+            middle = (low + high) // 2
+            if rows[middle][column] < stamp:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def get_floor(self, stamp):
+        """
+        Computes the time before which records are ignored
+
+        :param stamp: the watermark, e.g., '2017-05-01 07:05:12'
+        :type stamp: ``str``
+
+        :return: the watermark minus the slack
+        :rtype: ``str``
+        """
+
+        try:
+            moment = datetime.strptime(stamp[:19], self.FORMAT)
+        except ValueError:
+            logging.debug("- unexpected time '{}'".format(stamp))
+            return stamp
+
+        return (moment - timedelta(seconds=self.slack)).strftime(self.FORMAT)
+
+    def prune(self):
+        """
+        Forgets unique ids of records that are older than the floor
+        """
+
+        while self.uids:
+            uid, stamp = next(iter(self.uids.items()))
+            if len(self.uids) <= self.size and stamp >= self.floor:
+                break
+            del self.uids[uid]
@@ -0,0 +1,416 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+"""
+Measures the processing of reports, from parsing to updaters
+
+Reports are generated at a given size, and every path runs against fake
+services, so that only the code of the pump is measured. Run it from the
+top of the project, like this::
+
+    $ python -m bench.bench_pump --rows 10000 --tags 5
+
+Results are printed as JSON, with rows per second, microseconds per row,
+and peak memory for every benchmark. Without ``tracemalloc``, e.g., under
+Python 2, the peak is the one of the whole process, as ``process_peak_kb``,
+and it cannot be compared across benchmarks of the same run.
+"""
+
+import argparse
+from datetime import date
+import gc
+import json
+import logging
+import os
+import re
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+sys.path.insert(0, os.path.abspath('.'))
+sys.path.insert(0, os.path.abspath('models'))  # for updaters
+
+from bench import generators
+from endpoint import Endpoint
+from pump import Pump
+
+
+class FakeResponse(object):
+    """
+    Mimics a response of the API
+    """
+
+    def __init__(self, text, status_code=200):
+        self.text = text
+        self.status_code = status_code
+
+
+class FakeEndpoint(Endpoint):
+    """
+    Serves generated documents instead of calling the API
+    """
+
+    def __init__(self, servers=100, settings={}):
+        Endpoint.__init__(self, key='bench', secret='bench', region='dd-eu',
+                          endpoint='https://bench', orgId='bench',
+                          settings=settings)
+
+        self.servers = servers
+        self.ids = {}  # index of servers, by unique id
+        for index in range(servers):
+            self.ids[generators.get_server_id(index)] = index
+
+    def get(self, url, **kwargs):
+        self.calls += 1
+
+        if '/network/natRule' in url:
+            return FakeResponse(generators.nat_rules_page())
+
+        matches = re.search(r'pageSize=(\d+)&pageNumber=(\d+)', url)
+        if matches:
+            size = int(matches.group(1))
+            first = size * (int(matches.group(2)) - 1)
+            return FakeResponse(
+                generators.servers_page(first, size, self.servers))
+
+        index = self.ids.get(url.rsplit('/', 1)[-1])
+        if index is None:
+            return FakeResponse('', status_code=404)
+        return FakeResponse(generators.server_body(index))
+
+
+class FakeElasticsearch(object):
+    """
+    Accepts documents as Elasticsearch would
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def index(self, index, doc_type, body):
+        self.count += 1
+        return {'result': 'created'}
+
+
+class FakeInfluxDB(object):
+    """
+    Accepts points as InfluxDB would
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def write_points(self, points):
+        self.count += len(points)
+        return True
+
+
+def get_peak():
+    """
+    Provides peak memory, in kilobytes
+
+    With ``tracemalloc`` the peak is measured since last reset, else this
+    is the peak of the whole process.
+    """
+
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        return peak // 1024
+
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return None
+
+
+def measure(function, prepare, rows, repeat=3):
+    """
+    Runs a benchmark several times and keeps the best duration
+
+    :param function: the code to be measured
+    :type function: ``callable``
+
+    :param prepare: provides fresh arguments of the function, not measured
+    :type prepare: ``callable``
+
+    :param rows: the number of rows processed by one run
+    :type rows: ``int``
+
+    :param repeat: the number of runs
+    :type repeat: ``int``
+
+    :return: rows per second, microseconds per row, and peak memory
+    :rtype: ``dict``
+
+    The peak of memory is labelled ``peak_kb`` if it has been measured for
+    the benchmark only, else ``process_peak_kb``.
+    """
+
+    best = None
+    peak = 0
+    for count in range(repeat):
+        args = prepare()
+        gc.collect()
+
+        if tracemalloc is not None:
+            tracemalloc.start()
+
+        start = time.time()
+        function(*args)
+        elapsed = time.time() - start
+
+        peak = max(peak, get_peak() or 0)
+        if tracemalloc is not None:
+            tracemalloc.stop()
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    best = max(best, 0.000001)
+    return {
+        'rows': rows,
+        'seconds': round(best, 4),
+        'rows_per_second': int(rows / best),
+        'us_per_row': round(1000000.0 * best / max(rows, 1), 2),
+        'peak_kb' if tracemalloc else 'process_peak_kb': peak,
+    }
+
+
+def consume(iterator):
+    """
+    Pulls all items from some iterator
+    """
+
+    for item in iterator:
+        pass
+
+
+def get_reports(rows, tags):
+    """
+    Generates all reports, headers first
+    """
+
+    return {
+        'summary_usage': generators.summary_usage(rows),
+        'detailed_usage': generators.detailed_usage(rows, tags=tags),
+        'audit_log': generators.audit_log(rows, servers=max(10, rows // 20)),
+    }
+
+
+def bench_parsers(reports, repeat):
+    """
+    Measures the parsing of CSV reports by the endpoint
+    """
+
+    engine = FakeEndpoint(servers=1)
+    results = {}
+    for label, rows in reports.items():
+        lines = generators.to_csv(rows)
+        results['parse_'+label] = measure(
+            lambda lines: consume(engine.parse_rows(lines)),
+            lambda: (iter(lines),),
+            len(lines), repeat)
+
+    return results
+
+
+def bench_tail(reports, repeat):
+    """
+    Measures the detection of new records in the audit log
+    """
+
+    rows = reports['audit_log']
+    on = date(2017, 5, 1)
+
+    def cold():
+        return (Pump({}), list(rows))
+
+    def warm():
+        pump = Pump({})
+        pump.tail_audit_log(on, list(rows))  # everything has been seen
+        return (pump, list(rows))
+
+    def run(pump, raw):
+        pump.tail_audit_log(on, raw)
+
+    return {
+        'tail_cold': measure(run, cold, len(rows) - 1, repeat),
+        'tail_warm': measure(run, warm, len(rows) - 1, repeat),
+    }
+
+
+def bench_servers(reports, repeat):
+    """
+    Measures the detection of active servers, with a fake API
+    """
+
+    rows = reports['audit_log'][1:]
+    servers = max(10, len(rows) // 20)
+
+    def cold():
+        pump = Pump({})
+        pump.engines['dd-eu'] = FakeEndpoint(servers=servers)
+        return (pump, rows)
+
+    def warm():
+        pump, rows = cold()
+        pump.engines['dd-eu'].list_servers()  # cache is full
+        return (pump, rows)
+
+    def run(pump, raw):
+        pump.list_active_servers(raw, 'dd-eu')
+
+    return {
+        'servers_cold': measure(run, cold, len(rows), repeat),
+        'servers_warm': measure(run, warm, len(rows), repeat),
+    }
+
+
+def get_updaters():
+    """
+    Builds updaters with fake clients, and skips those that cannot load
+    """
+
+    updaters = {}
+
+    try:
+        from models.files import FilesUpdater
+        updaters['files'] = FilesUpdater({
+            'summary_usage': os.devnull,
+            'detailed_usage': os.devnull,
+            'audit_log': os.devnull,
+        })
+    except ImportError as feedback:
+        logging.warning("- skipping files: {}".format(feedback))
+
+    try:
+        from models.elastic import ElasticUpdater
+        updaters['elastic'] = ElasticUpdater({})
+        updaters['elastic'].db = FakeElasticsearch()
+    except ImportError as feedback:
+        logging.warning("- skipping elastic: {}".format(feedback))
+
+    try:
+        from models.influx import InfluxdbUpdater
+        updaters['influxdb'] = InfluxdbUpdater({})
+        updaters['influxdb'].db = FakeInfluxDB()
+    except ImportError as feedback:
+        logging.warning("- skipping influxdb: {}".format(feedback))
+
+    return updaters
+
+
+def bench_updaters(reports, repeat):
+    """
+    Measures the building of records by every updater
+    """
+
+    results = {}
+    for name, updater in sorted(get_updaters().items()):
+        for label, rows in reports.items():
+            function = getattr(updater, 'update_'+label)
+            results['{}_{}'.format(name, label)] = measure(
+                lambda items: function(items, 'dd-eu'),
+                lambda: ([list(row) for row in rows],),
+                len(rows) - 1, repeat)
+
+    return results
+
+
+BENCHMARKS = (
+    ('parsers', bench_parsers),
+    ('tail', bench_tail),
+    ('servers', bench_servers),
+    ('updaters', bench_updaters),
+)
+
+
+def main(rows=10000, tags=3, only=None, repeat=3, output=None):
+    """
+    Runs benchmarks and prints results as JSON
+
+    :param rows: the number of records in every report
+    :type rows: ``int``
+
+    :param tags: the number of tag columns in detailed usage
+    :type tags: ``int``
+
+    :param only: names of benchmarks to run, or `None` for all
+    :type only: ``list`` of ``str``
+
+    :param repeat: the number of runs of every benchmark
+    :type repeat: ``int``
+
+    :param output: the file where results are written, or `None`
+    :type output: ``str``
+
+    :return: results by benchmark
+    :rtype: ``dict``
+    """
+
+    reports = get_reports(rows, tags)
+
+    results = {
+        'python': sys.version.split()[0],
+        'rows': rows,
+        'tags': tags,
+        'memory': 'tracemalloc' if tracemalloc else 'ru_maxrss',
+    }
+
+    for name, function in BENCHMARKS:
+        if only and name not in only:
+            continue
+
+        logging.info("Running {}".format(name))
+        results.update(function(reports, repeat))
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if output:
+        with open(output, 'w') as handle:
+            handle.write(text+'\n')
+    print(text)
+
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=10000,
+                        help='records in every report')
+    parser.add_argument('--tags', type=int, default=3,
+                        help='tag columns in detailed usage')
+    parser.add_argument('--only', action='append',
+                        choices=[name for name, function in BENCHMARKS],
+                        help='run only some benchmarks')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs of every benchmark, the best is kept')
+    parser.add_argument('--output',
+                        help='write results to this file as well')
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(message)s', level=logging.WARNING)
+    main(rows=args.rows, tags=args.tags, only=args.only,
+         repeat=args.repeat, output=args.output)
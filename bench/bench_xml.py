@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compares the extraction of server records with the former xmltodict path
+
+Run it from the top of the project, like this::
+
+    $ python -m bench.bench_xml 2000
+
+"""
+
+import json
+import logging
+import os
+import sys
+import timeit
+
+import xmltodict
+
+sys.path.insert(0, os.path.abspath('.'))
+
+from extractor import etree, extract_nodes, extract_nat_rules
+from test.test_endpoint import node_1_body, node_2_body
+from test.test_endpoint import node_3_body, node_4_body
+from test.test_endpoint import nat_rules_page_1, nat_rules_page_2
+
+
+def legacy_node(text):
+    """
+    Builds node details as the pump did with ``xmltodict``
+    """
+
+    item = xmltodict.parse(text)['server']
+
+    node = {}
+    node['id'] = item['@id']
+    node['name'] = item['name']
+    node['description'] = item.get('description', '')
+    node['private_ips'] = [ item['networkInfo']['primaryNic']['@privateIpv4'] ]
+    node['datacenterId'] = item['@datacenterId']
+    node['cpu'] = item['cpu']['@count']
+    node['memoryMb'] = int(item['memoryGb'])*1024
+    node['networkDomainId'] = item['networkInfo']['@networkDomainId']
+    node['ipv6'] = item['networkInfo']['primaryNic']['@ipv6']
+    node['vlanId'] = item['networkInfo']['primaryNic']['@vlanId']
+    node['vlanName'] = item['networkInfo']['primaryNic']['@vlanName']
+    node['networkAdapter'] = item['networkInfo']['primaryNic']['@networkAdapter']
+    try:
+        node['macAddress'] = item['networkInfo']['primaryNic']['@macAddress']
+    except:
+        node['macAddress'] = None
+    node['sourceImageId'] = item['sourceImageId']
+    node['deployed'] = item['deployed']
+    node['deployedTime'] = item.get('createTime')
+    node['started'] = item['started']
+    node['state'] = item['state']
+    node['OS_id'] = item['guest']['operatingSystem']['@id']
+    node['OS_displayName'] = item['guest']['operatingSystem']['@displayName']
+    node['OS_type'] = item['guest']['operatingSystem']['@family']
+    try:
+        node['virtualHardware'] = item['virtualHardware']['@version']
+    except:
+        node['virtualHardware'] = None
+    node['disks'] = []
+
+    disks = item['scsiController']['disk']
+    if not isinstance(disks, list):
+        disks = [disks]
+
+    for disk in disks:
+        node['disks'].append(disk['@sizeGb'])
+
+    return node
+
+
+def legacy_nat_rules(text):
+    """
+    Indexes NAT rules as the pump did with ``xmltodict``
+    """
+
+    items = xmltodict.parse(text, force_list=('natRule',))['natRules']
+    rules = {}
+    for item in items.get('natRule', []):
+        rules[item['internalIp']] = item['externalIp']
+    return rules
+
+
+def measure(function, documents, number):
+    """
+    Measures the average duration of one call, in microseconds
+    """
+
+    def run():
+        for document in documents:
+            function(document)
+
+    duration = timeit.timeit(run, number=number)
+    return 1000000.0 * duration / (number * len(documents))
+
+
+def main(number=1000):
+    """
+    Runs the benchmark and prints results as JSON
+    """
+
+    servers = [node_1_body, node_2_body, node_3_body, node_4_body]
+    rules = [nat_rules_page_1, nat_rules_page_2]
+
+    # both paths have to provide exactly the same data
+    #
+    for text in servers:
+        assert extract_nodes(text)[1] == [legacy_node(text)]
+
+    for text in rules:
+        assert extract_nat_rules(text)[1] == legacy_nat_rules(text)
+
+    results = {
+        'parser': etree.__name__,
+        'iterations': number,
+    }
+
+    for label, legacy, fast, documents in (
+            ('server', legacy_node, extract_nodes, servers),
+            ('natRule', legacy_nat_rules, extract_nat_rules, rules)):
+
+        before = measure(legacy, documents, number)
+        after = measure(fast, documents, number)
+        results[label] = {
+            'xmltodict_us': round(before, 1),
+            'extractor_us': round(after, 1),
+            'speedup': round(before / after, 2),
+        }
+
+    print(json.dumps(results, indent=2, sort_keys=True))
+    return results
+
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.INFO)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
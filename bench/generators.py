@@ -0,0 +1,325 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Generates synthetic reports and API responses for benchmarks
+
+Data is random but reproducible, since every generator uses its own
+seeded random generator.
+"""
+
+from datetime import datetime, timedelta
+import random
+import uuid
+
+
+SUMMARY_HEADERS = [
+    'DAY', 'Location', 'CPU Hours', 'High Performance CPU Hours',
+    'RAM Hours', 'Storage Hours', 'High Performance Storage Hours',
+    'Economy Storage Hours', 'Bandwidth In', 'Bandwidth Out',
+    'Sub-Admin Hours', 'Network Hours', 'Essentials Network Domain Hours',
+    'Advanced Network Domain Hours', 'VLAN Hours', 'Public IP Hours',
+    'Cloud Files Account Hours', 'Cloud Files (GB Days)', 'Software Units',
+    'Essentials Client Days', 'Advanced Client Days',
+    'Enterprise Client Days', 'Essentials Backups (GB)',
+    'Advanced Backups (GB)', 'Enterprise Backups (GB)',
+    'Essentials Monitoring Hours', 'Advanced Monitoring Hours']
+
+DETAILED_HEADERS_HEAD = [
+    'Name', 'UUID', 'Type', 'Location', 'Private IP Address', 'Status']
+
+DETAILED_HEADERS_TAIL = [
+    'Start Time', 'End Time', 'Duration (Hours)', 'CPU Type', 'CPU Count',
+    'RAM (GB)', 'Storage (GB)', 'High Performance Storage (GB)',
+    'Economy Storage (GB)', 'CPU Hours', 'High Performance CPU Hours',
+    'RAM Hours', 'Storage Hours', 'High Performance Storage Hours',
+    'Economy Storage Hours', 'Bandwidth-In (GB)', 'Bandwidth-Out (GB)',
+    'Subadmin Hours', 'Network Hours', 'Essentials Network Domain Hours',
+    'Advanced Network Domain Hours', 'VLAN Hours', 'Public IP Hours',
+    'Cloud Files Account Hours', 'Cloud Storage (GB)']
+
+AUDIT_HEADERS = [
+    'UUID', 'Time', 'Create User', 'Department', 'Customer Defined 1',
+    'Customer Defined 2', 'Type', 'Name', 'Action', 'Details',
+    'Response Code']
+
+LOCATIONS = ['EU6', 'EU7', 'EU8', 'NA9', 'AP3']
+
+ACTIONS = ['Deploy Server', 'Start Server', 'Graceful Shutdown Server',
+           'Power Off Server', 'Reboot Server', 'Add Disk',
+           'Create Nat Rule', 'List Servers']
+
+SERVER_TEMPLATE = (
+    '<server xmlns="urn:didata.com:api:cloud:types" id="{id}"'
+    ' datacenterId="{location}"><name>{name}</name>'
+    '<description>Synthetic node #bench</description>'
+    '<cpu count="{cpu}" speed="STANDARD" coresPerSocket="1"/>'
+    '<memoryGb>{memory}</memoryGb>'
+    '<scsiController state="NORMAL" id="{controller}"'
+    ' adapterType="VMWARE_PARAVIRTUAL" key="1000" busNumber="0">'
+    '{disks}</scsiController>'
+    '<networkInfo networkDomainId="{domain}"><primaryNic id="{nic}"'
+    ' privateIpv4="{ip}" ipv6="2a00:47c0:111:1379::1" vlanId="{vlan}"'
+    ' vlanName="Web" networkAdapter="VMXNET3"'
+    ' macAddress="00:50:56:bb:00:1b" key="4000" state="NORMAL"/>'
+    '</networkInfo><sourceImageId>{image}</sourceImageId>'
+    '<createTime>2017-04-28T20:00:44.000Z</createTime>'
+    '<deployed>true</deployed><started>true</started><state>NORMAL</state>'
+    '<guest osCustomization="true"><operatingSystem id="UBUNTU1464"'
+    ' displayName="UBUNTU14/64" family="UNIX"/></guest>'
+    '<virtualHardware version="vmx-10" upToDate="true"/></server>')
+
+DISK_TEMPLATE = (
+    '<disk state="NORMAL" id="{id}" sizeGb="{size}" speed="STANDARD"'
+    ' scsiId="{index}"/>')
+
+
+def get_uuid(generator):
+    """
+    Provides a reproducible unique id
+    """
+
+    return str(uuid.UUID(int=generator.getrandbits(128)))
+
+
+def get_server_id(index, seed=4):
+    """
+    Provides the unique id of some server
+
+    :param index: the index of the server
+    :type index: ``int``
+
+    :return: the same id for the same index, in the audit log and in
+        descriptions of servers
+    :rtype: ``str``
+    """
+
+    return get_uuid(random.Random(seed * 1000003 + index))
+
+
+def to_csv(rows):
+    """
+    Turns rows into lines of CSV, as received from the network
+
+    :param rows: rows of a report, headers first
+    :type rows: ``list`` of ``list``
+
+    :return: encoded lines
+    :rtype: ``list`` of ``bytes``
+    """
+
+    lines = []
+    for row in rows:
+        cells = []
+        for cell in row:
+            if ',' in cell or '"' in cell:
+                cell = '"' + cell.replace('"', '""') + '"'
+            cells.append(cell)
+        lines.append(','.join(cells).encode('utf-8'))
+
+    return lines
+
+
+def summary_usage(count, day='2017-05-01', seed=1):
+    """
+    Generates a summary usage report
+
+    :param count: the number of records
+    :type count: ``int``
+
+    :return: rows, headers first, and a line of totals
+    :rtype: ``list`` of ``list``
+    """
+
+    generator = random.Random(seed)
+
+    rows = [list(SUMMARY_HEADERS)]
+    for index in range(count):
+        row = [day, LOCATIONS[index % len(LOCATIONS)]]
+        for column in SUMMARY_HEADERS[2:]:
+            if column in ('Sub-Admin Hours', 'Network Hours',
+                          'Cloud Files Account Hours'):
+                row.append('{:.2f}'.format(generator.uniform(0, 100)))
+            else:
+                row.append(str(generator.randint(0, 1000)))
+        rows.append(row)
+
+    rows.append([''] + ['Total'] + ['0'] * (len(SUMMARY_HEADERS) - 2))
+    return rows
+
+
+def detailed_usage(count, tags=3, day='2017-05-01', seed=2):
+    """
+    Generates a detailed usage report
+
+    :param count: the number of records
+    :type count: ``int``
+
+    :param tags: the number of tag columns, that are set by users
+    :type tags: ``int``
+
+    :return: rows, headers first, and a line of totals
+    :rtype: ``list`` of ``list``
+    """
+
+    generator = random.Random(seed)
+
+    headers = (DETAILED_HEADERS_HEAD
+               + ['"user: Tag {}"'.format(x) for x in range(tags)]
+               + DETAILED_HEADERS_TAIL)
+
+    rows = [headers]
+    for index in range(count):
+        kind = generator.choice(['Server', 'Server', 'Server',
+                                 'Public IP Block', 'Cloud Files Account'])
+        if kind == 'Server':
+            location = generator.choice(LOCATIONS)
+            ip = '10.0.{}.{}'.format(index // 250 % 250, index % 250)
+            cpu = str(generator.choice([1, 2, 4, 8]))
+        elif kind == 'Public IP Block':
+            location, ip, cpu = generator.choice(LOCATIONS), '', '0'
+        else:
+            location, ip, cpu = '', '', '0'
+
+        row = ['node-{}'.format(index), get_uuid(generator), kind,
+               location, ip, 'NORMAL']
+        row += ['value, {}'.format(generator.randint(0, 9))
+                for x in range(tags)]
+        row += [day + ' 00:00:00', day + ' 23:59:59', '24.00', 'STANDARD',
+                cpu, str(generator.choice([2, 4, 8, 16])),
+                str(generator.randint(10, 500)), '0', '0']
+        row += [str(generator.randint(0, 100))
+                for x in range(len(DETAILED_HEADERS_TAIL) - 9)]
+        rows.append(row)
+
+    rows.append(['Total', '', ''] + [''] * (len(headers) - 3))
+    return rows
+
+
+def audit_log(count, servers=100, day='2017-05-01', seed=3):
+    """
+    Generates an audit log, sorted by time
+
+    :param count: the number of records
+    :type count: ``int``
+
+    :param servers: the number of servers that appear in the log
+    :type servers: ``int``
+
+    :return: rows, headers first
+    :rtype: ``list`` of ``list``
+    """
+
+    generator = random.Random(seed)
+
+    start = datetime.strptime(day, "%Y-%m-%d")
+    step = 86400.0 / max(1, count)
+
+    rows = [list(AUDIT_HEADERS)]
+    for index in range(count):
+        stamp = start + timedelta(seconds=int(index * step))
+        action = generator.choice(ACTIONS)
+        kind = 'NETWORK' if 'Nat' in action else 'SERVER'
+        server = generator.randint(0, servers - 1)
+        rows.append([
+            get_uuid(generator),
+            stamp.strftime("%Y-%m-%d %H:%M:%S"),
+            generator.choice(['foo.bar', 'john.doe', 'OEC_SYSTEM']),
+            'IT', '', '', kind,
+            'node-{}[dd-eu_{}]'.format(server, get_server_id(server)),
+            action, '', 'OK'])
+
+    return rows
+
+
+def server(index, seed=4):
+    """
+    Generates the description of one server, as provided by the API
+
+    :param index: the index of the server
+    :type index: ``int``
+
+    :return: an XML element
+    :rtype: ``str``
+    """
+
+    generator = random.Random(seed * 1000003 + index)
+    id = get_uuid(generator)  # as provided by get_server_id()
+
+    disks = ''.join(DISK_TEMPLATE.format(id=get_uuid(generator),
+                                         size=generator.choice([10, 50, 200]),
+                                         index=x)
+                    for x in range(generator.randint(1, 4)))
+
+    return SERVER_TEMPLATE.format(
+        id=id,
+        location=LOCATIONS[index % len(LOCATIONS)],
+        name='node-{}'.format(index),
+        cpu=generator.choice([1, 2, 4, 8]),
+        memory=generator.choice([1, 2, 4, 8, 16]),
+        controller=get_uuid(generator),
+        disks=disks,
+        domain=get_uuid(generator),
+        nic=get_uuid(generator),
+        ip='10.0.{}.{}'.format(index // 250 % 250, index % 250),
+        vlan=get_uuid(generator),
+        image=get_uuid(generator))
+
+
+def server_body(index, seed=4):
+    """
+    Generates the response to a lookup of one server
+    """
+
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            + server(index, seed))
+
+
+def servers_page(first, size, total, seed=4):
+    """
+    Generates one page of the inventory of servers
+
+    :param first: the index of the first server of the page
+    :type first: ``int``
+
+    :param size: the number of servers per page
+    :type size: ``int``
+
+    :param total: the number of servers in the inventory
+    :type total: ``int``
+
+    :return: an XML document
+    :rtype: ``str``
+    """
+
+    elements = ''.join(server(x, seed)
+                       for x in range(first, min(first + size, total)))
+
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<servers xmlns="urn:didata.com:api:cloud:types"'
+            ' pageNumber="{}" pageCount="{}" totalCount="{}"'
+            ' pageSize="{}">{}</servers>'.format(
+                first // size + 1, min(size, total - first), total, size,
+                elements))
+
+
+def nat_rules_page():
+    """
+    Generates an empty list of NAT rules
+    """
+
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<natRules xmlns="urn:didata.com:api:cloud:types" pageNumber="1"'
+            ' pageCount="0" totalCount="0" pageSize="250"></natRules>')
@@ -0,0 +1,120 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import threading
+import time
+
+
+class CircuitBreaker(object):
+    """
+    Stops calls to a store that keeps failing
+
+    The breaker is closed while the store works. After some consecutive
+    failures, it opens, and calls are refused for some time. Then one call
+    is let through to probe the store: the breaker closes on success, and
+    opens again on failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failures=3, reset=60.0):
+        """
+        Sets a new breaker
+
+        :param failures: consecutive failures before the breaker opens
+        :type failures: ``int``
+
+        :param reset: seconds before a call is tried again
+        :type reset: ``float``
+
+        """
+
+        assert failures >= 1
+        self.threshold = failures
+        self.reset = float(reset)
+
+        self.lock = threading.Lock()
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened = 0.0
+
+        self.trips = 0
+
+    def allow(self):
+        """
+        Tells if a call can be made now
+
+        :return: `True` if the store can be called, else `False`
+        :rtype: ``bool``
+
+        Only one probe is let through when the breaker is half-open.
+        """
+
+        with self.lock:
+            if self.state == self.CLOSED:
+                return True
+
+            if (self.state == self.OPEN
+                    and time.time() - self.opened >= self.reset):
+                logging.debug("- probing the store")
+                self.state = self.HALF_OPEN
+                return True
+
+            return False
+
+    def succeed(self):
+        """
+        Reports that the store has accepted a call
+        """
+
+        with self.lock:
+            if self.state != self.CLOSED:
+                logging.info("- the store is available again")
+
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def fail(self):
+        """
+        Reports that the store has failed
+        """
+
+        with self.lock:
+            self.failures += 1
+
+            if (self.state == self.HALF_OPEN
+                    or self.failures >= self.threshold):
+
+                if self.state == self.CLOSED:
+                    logging.warning("- the store is unavailable, "
+                                    "retrying in {:.0f} seconds".format(
+                                        self.reset))
+                    self.trips += 1
+
+                self.state = self.OPEN
+                self.opened = time.time()
+
+    def is_closed(self):
+        """
+        Tells if the store is considered as working
+
+        :return: `True` if the breaker is closed
+        :rtype: ``bool``
+        """
+
+        return self.state == self.CLOSED
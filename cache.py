@@ -0,0 +1,212 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import OrderedDict
+import errno
+import json
+import logging
+import os
+import time
+
+
+class Cache(object):
+    """
+    Keeps a bounded number of values for some time
+
+    Least recently used values are evicted first when the cache is full,
+    and values are forgotten when they are older than the time to live.
+    """
+
+    def __init__(self, size=1000, ttl=3600, path=None):
+        """
+        Sets a new cache
+
+        :param size: the maximum number of values to keep
+        :type size: ``int``
+
+        :param ttl: seconds before a value expires
+        :type ttl: ``int`` or ``float``
+
+        :param path: file where values are saved, or `None`
+        :type path: ``str``
+
+        """
+
+        self.size = size
+        self.ttl = ttl
+        self.path = path
+
+        self.values = OrderedDict()
+        self.dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, key):
+        item = self.values.get(key)
+        return item is not None and item[0] >= time.time()
+
+    def get(self, key, default=None):
+        """
+        Gets a value from the cache
+
+        :param key: the key of the value
+        :type key: ``str``
+
+        :param default: the value provided on cache miss
+        :type default: any
+
+        :return: the cached value, or the default value
+        """
+
+        try:
+            expires, value = self.values.pop(key)
+
+        except KeyError:
+            self.misses += 1
+            return default
+
+        if expires < time.time():
+            self.dirty = True
+            self.misses += 1
+            return default
+
+        self.values[key] = (expires, value)  # most recently used
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Puts a value in the cache
+
+        :param key: the key of the value
+        :type key: ``str``
+
+        :param value: the value to remember
+        :type value: any
+
+        """
+
+        self.values.pop(key, None)
+        self.values[key] = (time.time() + self.ttl, value)
+        self.dirty = True
+
+        while len(self.values) > self.size:
+            self.values.popitem(last=False)
+            self.evictions += 1
+
+    def forget(self, key):
+        """
+        Removes a value from the cache
+
+        :param key: the key of the value
+        :type key: ``str``
+
+        """
+
+        if self.values.pop(key, None) is not None:
+            self.dirty = True
+
+    def clear(self):
+        """
+        Removes all values from the cache
+        """
+
+        self.values.clear()
+        self.dirty = True
+
+    def get_stats(self):
+        """
+        Reports on the efficiency of the cache
+
+        :return: counters of hits, misses and evictions, and current size
+        :rtype: ``dict``
+        """
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self.values),
+        }
+
+    def load(self):
+        """
+        Loads values previously saved to the file of the cache
+
+        Expired values are dropped, and a missing or invalid file is
+        silently ignored, so that the cache starts cold.
+        """
+
+        if not self.path or not os.path.isfile(self.path):
+            return
+
+        try:
+            with open(self.path, 'r') as handle:
+                items = json.load(handle)
+
+        except Exception as feedback:
+            logging.warning("- could not load cache from {}".format(self.path))
+            logging.debug(feedback)
+            return
+
+        now = time.time()
+        for key, expires, value in items:
+            if expires > now:
+                self.values[key] = (expires, value)
+
+        while len(self.values) > self.size:
+            self.values.popitem(last=False)
+
+        self.dirty = False
+        logging.debug("- loaded {} values from {}".format(
+            len(self.values), self.path))
+
+    def save(self):
+        """
+        Saves values to the file of the cache, if they have changed
+
+        The file is replaced atomically, so that a crash does not leave
+        a truncated cache behind.
+        """
+
+        if not self.path or not self.dirty:
+            return
+
+        path = os.path.dirname(self.path)
+        if path and not os.path.exists(path):
+            try:
+                os.makedirs(path)
+            except OSError as feedback:  # prevent race condition
+                if feedback.errno != errno.EEXIST:
+                    raise
+
+        items = [[key, expires, value]
+                 for key, (expires, value) in self.values.items()]
+
+        try:
+            temporary = '{}.{}'.format(self.path, os.getpid())
+            with open(temporary, 'w') as handle:
+                json.dump(items, handle)
+            os.rename(temporary, self.path)
+            self.dirty = False
+
+        except Exception as feedback:
+            logging.warning("- could not save cache to {}".format(self.path))
+            logging.debug(feedback)
@@ -0,0 +1,275 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from datetime import datetime
+import errno
+import json
+import logging
+import os
+import sqlite3
+import time
+
+
+class Checkpoint(object):
+    """
+    Remembers the progress of the pump in a SQLite database
+
+    Every report of every region and day is a task that is either pending
+    or done, and the position in the audit log of every region is kept as
+    well. The database can be used by several processes at once, and
+    every process has its own connection.
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS tasks ("
+        " region TEXT NOT NULL,"
+        " day TEXT NOT NULL,"
+        " label TEXT NOT NULL,"
+        " state TEXT NOT NULL,"
+        " updated REAL NOT NULL,"
+        " PRIMARY KEY (region, day, label))",
+
+        "CREATE TABLE IF NOT EXISTS cursors ("
+        " region TEXT PRIMARY KEY,"
+        " cursor TEXT NOT NULL,"
+        " updated REAL NOT NULL)",
+    )
+
+    def __init__(self, path):
+        """
+        Opens a checkpoint store
+
+        :param path: the database file, e.g., './cache/checkpoint.db'
+        :type path: ``str``
+
+        """
+
+        self.path = path
+
+        self._connection = None
+        self._pid = None
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            try:
+                os.makedirs(folder)
+            except OSError as feedback:  # prevent race condition
+                if feedback.errno != errno.EEXIST:
+                    raise
+
+        with self.get_connection() as connection:
+            for statement in self.SCHEMA:
+                connection.execute(statement)
+
+    def get_connection(self):
+        """
+        Provides a connection to the database
+
+        :return: a connection for the current process
+        :rtype: ``sqlite3.Connection``
+
+        The connection is made on first use, and again after a fork.
+        """
+
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30)
+            try:
+                connection.execute("PRAGMA journal_mode=WAL")
+            except sqlite3.DatabaseError as feedback:
+                logging.debug(feedback)
+
+            self._connection = connection
+            self._pid = os.getpid()
+
+        return self._connection
+
+    @staticmethod
+    def encode_day(on):
+        """
+        Turns a day, or a window of days, into text
+
+        :param on: the day, or the first and last days of a window
+        :type on: ``date`` or ``tuple``
+
+        :return: e.g., '2017-05-01' or '2017-05-01/2017-05-07'
+        :rtype: ``str``
+        """
+
+        if isinstance(on, tuple):
+            return '/'.join([x.strftime("%Y-%m-%d") for x in on])
+
+        return on.strftime("%Y-%m-%d")
+
+    @staticmethod
+    def decode_day(text):
+        """
+        Turns text into a day, or into a window of days
+
+        :param text: e.g., '2017-05-01' or '2017-05-01/2017-05-07'
+        :type text: ``str``
+
+        :return: the day, or the first and last days of a window
+        :rtype: ``date`` or ``tuple``
+        """
+
+        days = [datetime.strptime(x, "%Y-%m-%d").date()
+                for x in text.split('/')]
+
+        if len(days) > 1:
+            return tuple(days)
+
+        return days[0]
+
+    def add_tasks(self, tasks):
+        """
+        Records tasks to be done
+
+        :param tasks: tasks, with region, day or window, and report
+        :type tasks: ``list`` of ``tuple``
+
+        Tasks that are known already are left untouched, so that work done
+        before a restart is not done again.
+        """
+
+        now = time.time()
+        with self.get_connection() as connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks VALUES (?, ?, ?, 'pending', ?)",
+                [(region, self.encode_day(on), label, now)
+                 for region, on, label in tasks])
+
+    def complete(self, task):
+        """
+        Records that some task has been done
+
+        :param task: region, day or window, and report
+        :type task: ``tuple``
+
+        """
+
+        region, on, label = task
+        with self.get_connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, 'done', ?)",
+                (region, self.encode_day(on), label, time.time()))
+
+    def get_pending(self):
+        """
+        Lists tasks that have not been done yet
+
+        :return: tasks, with region, day or window, and report
+        :rtype: ``list`` of ``tuple``
+
+        """
+
+        cursor = self.get_connection().execute(
+            "SELECT region, day, label FROM tasks"
+            " WHERE state = 'pending' ORDER BY day, region, label")
+
+        return [(region, self.decode_day(day), label)
+                for region, day, label in cursor.fetchall()]
+
+    def get_done(self):
+        """
+        Lists tasks that have been done
+
+        :return: tasks, with region, day or window, and report
+        :rtype: ``set`` of ``tuple``
+
+        """
+
+        cursor = self.get_connection().execute(
+            "SELECT region, day, label FROM tasks WHERE state = 'done'")
+
+        return set((region, self.decode_day(day), label)
+                   for region, day, label in cursor.fetchall())
+
+    def reset(self):
+        """
+        Forgets all tasks and positions, e.g., on a new horizon
+        """
+
+        with self.get_connection() as connection:
+            connection.execute("DELETE FROM tasks")
+            connection.execute("DELETE FROM cursors")
+
+    def get_last_day(self):
+        """
+        Finds the most recent day that has been pulled
+
+        :return: the last day of completed tasks, or `None`
+        :rtype: ``date``
+
+        """
+
+        cursor = self.get_connection().execute(  # last day of windows
+            "SELECT MAX(SUBSTR(day, -10)) FROM tasks WHERE state = 'done'")
+
+        day = cursor.fetchone()[0]
+        if day is None:
+            return None
+
+        return self.decode_day(day)
+
+    def is_empty(self):
+        """
+        Tells if the pump has made no progress so far
+
+        :return: `True` if no task has been done
+        :rtype: ``bool``
+        """
+
+        cursor = self.get_connection().execute(
+            "SELECT COUNT(*) FROM tasks WHERE state = 'done'")
+
+        return cursor.fetchone()[0] < 1
+
+    def set_cursor(self, region, cursor):
+        """
+        Remembers the position in the audit log of some region
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param cursor: the state of the tail, from ``AuditTail.get_state()``
+        :type cursor: ``dict``
+
+        """
+
+        with self.get_connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)",
+                (region, json.dumps(cursor), time.time()))
+
+    def get_cursor(self, region):
+        """
+        Retrieves the position in the audit log of some region
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :return: the state of the tail, or `None`
+        :rtype: ``dict``
+
+        """
+
+        cursor = self.get_connection().execute(
+            "SELECT cursor FROM cursors WHERE region = ?", (region,))
+
+        row = cursor.fetchone()
+        if row is None:
+            return None
+
+        return json.loads(row[0])
@@ -16,6 +16,20 @@ pump = {
     # 'regions': ['dd-af', 'dd-ap', 'dd-au', 'dd-eu', 'dd-na'],
     # 'regions': ['dd-eu'],
 
+    # skip regions where no network domain and no server can be found, and
+    # check them again after 'regions_ttl' -- this skips their usage history
+    #
+    # 'prune_regions': True,
+
+    # remember regions across restarts, and for how many seconds
+    #
+    # 'regions_cache': './cache/regions.json',
+    # 'regions_ttl': 86400,
+
+    # remember progress across restarts, and resume from there
+    #
+    # 'checkpoint': './cache/checkpoint.db',
+
     # should better be set in computer environment
     #
     # 'MCP_USER': 'foo.bar',
@@ -24,6 +38,137 @@ pump = {
     #
     # 'MCP_PASSWORD': 'WhatsUpDoc',
 
+    # several accounts can be pumped at once, each with its own credentials
+    # and regions, and records are tagged with the name of the account
+    #
+    # 'accounts': [
+    #     {'name': 'acme',
+    #      'MCP_USER': 'acme.watch',
+    #      'MCP_PASSWORD': '$ACME_PASSWORD',
+    #      'regions': ['dd-eu', 'dd-na']},
+    #     {'name': 'globex',
+    #      'MCP_USER': 'globex.watch',
+    #      'MCP_PASSWORD': '$GLOBEX_PASSWORD'},
+    # ],
+
+    # connections kept alive to the API of each region
+    #
+    # 'pool_size': 10,
+
+    # seconds before a call to the API is abandoned
+    #
+    # 'timeout': 60,
+
+    # calls per second to the API of each region, shared by all workers,
+    # and calls that can be made at once
+    #
+    # 'api_rate': 5.0,
+    # 'api_burst': 10,
+
+    # share of the rate given to backfill, that also waits while the audit
+    # log is polled, for some seconds at most
+    #
+    # 'backfill_share': 0.5,
+    # 'realtime_timeout': 60,
+
+    # retries of a call rejected by the API (429, 5xx) or on network error,
+    # after a pause that doubles up to some maximum, in seconds
+    #
+    # 'api_retries': 5,
+    # 'api_backoff': 1.0,
+    # 'api_backoff_max': 60.0,
+
+    # details of servers kept in memory, and for how many seconds
+    #
+    # 'node_cache_size': 1000,
+    # 'node_cache_ttl': 3600,
+
+    # save details of servers across restarts, one file per region
+    #
+    # 'node_cache': './cache/nodes-{}.json',
+
+    # seconds before NAT rules of a network domain are listed again
+    #
+    # 'nat_rules_ttl': 900,
+
+    # seconds between polls of the audit log, at start, when servers are
+    # active, and when nothing happens
+    #
+    # 'tick_interval': 60,
+    # 'tick_min': 15,
+    # 'tick_max': 300,
+
+    # seconds before the most recent record where the audit log is
+    # checked for records written late
+    #
+    # 'audit_slack': 300,
+
+    # list all servers when at least this number have been activated
+    #
+    # 'inventory_threshold': 5,
+
+    # records listed at once from the API
+    #
+    # 'page_size': 250,
+
+    # days of usage fetched at once on backfill, and windows fetched day by
+    # day after the API has rejected a window
+    #
+    # 'backfill_window': 7,
+    # 'backfill_fallback': 10,
+
+    # processes of the backfill, tasks of a region running at once, seconds
+    # between progress reports, and before a task is given up
+    #
+    # 'backfill_workers': 8,
+    # 'backfill_per_region': 2,
+    # 'backfill_progress': 60,
+    # 'backfill_timeout': 3600,
+
+    # records passed at once to updaters
+    #
+    # 'batch_size': 1000,
+
+    # daily pulls go through stages joined by queues of limited depth, and
+    # every stage has its own threads
+    #
+    # 'pipeline_depth': 4,
+    # 'fetch_threads': 3,
+    # 'parse_threads': 1,
+    # 'store_threads': 2,
+
+    # threads running updaters, seconds before an updater is given up,
+    # unless it has its own 'timeout', and calls in progress at most for an
+    # updater that is not waited for
+    #
+    # 'updater_threads': 8,
+    # 'updater_timeout': 60,
+    # 'updater_backlog': 10,
+
+    # workers are restarted when they die or stay silent for too long, and
+    # recycled after some tasks or above some megabytes of memory
+    #
+    # 'heartbeat': 30,
+    # 'supervisor_interval': 10,
+    # 'worker_timeout': 3600,
+    # 'worker_backoff': 1.0,
+    # 'worker_backoff_max': 300.0,
+    # 'worker_tasks': 1000,
+    # 'worker_rss': 512,
+
+    # serve metrics of all processes at http://127.0.0.1:9100/metrics
+    #
+    # 'metrics_port': 9100,
+    # 'metrics_host': '127.0.0.1',
+    # 'metrics_interval': 5,
+
+    # profile workers, as with --profile on the command line, and write
+    # statistics on SIGUSR1 and after some seconds of CPU time
+    #
+    # 'profile': './profiles',
+    # 'profile_interval': 300,
+    # 'profile_top': 25,
+
     }
 
 #
@@ -44,6 +189,14 @@ files = {
 elastic = {
     'active': True,
     'host': 'localhost:9200',
+
+    # stop calling the database after some failures, keep data on disk
+    # meanwhile, and replay it at some rate when the database is back
+    #
+    # 'breaker_failures': 3,
+    # 'breaker_reset': 60,
+    # 'spool': './cache/spool-elastic.jsonl.gz',
+    # 'spool_rate': 10,
     }
 
 #
@@ -57,6 +210,14 @@ influxdb = {
     'user': 'root',
     'password': 'root',
     'database': 'mcp',
+
+    # stop calling the database after some failures, keep data on disk
+    # meanwhile, and replay it at some rate when the database is back
+    #
+    # 'breaker_failures': 3,
+    # 'breaker_reset': 60,
+    # 'spool': './cache/spool-influxdb.jsonl.gz',
+    # 'spool_rate': 10,
     }
 
 #
@@ -69,6 +230,10 @@ qualys = {
     'login': '$QUALYS_LOGIN',
     'password': '$QUALYS_PASSWORD',
     'option': 'MCPWatch',
+
+    # do not wait for scans to be launched
+    #
+    # 'wait': False,
     }
 
 #
@@ -80,5 +245,9 @@ spark = {
     'room': 'MCP Watch',
     'moderators': '$CHAT_ROOM_MODERATORS',
     'token': '$CHAT_TOKEN',
+
+    # do not wait for messages to be posted
+    #
+    # 'wait': False,
     }
 
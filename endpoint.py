@@ -14,17 +14,26 @@
 # limitations under the License.
 
 import colorlog
+import csv
 from datetime import date, datetime, timedelta
+import errno
+import hashlib
 import logging
 import os
 import re
 import requests
+import six
 from six import string_types
 import socket
 import string
 import sys
+import threading
 import time
-import xmltodict
+
+from cache import Cache
+from extractor import extract_nodes, extract_nat_rules
+from limiter import RateLimiter
+from metrics import registry as metrics
 
 
 class Endpoint(object):
@@ -40,7 +49,93 @@ class Endpoint(object):
         'dd-na': 'https://api-na.dimensiondata.com',
     }
 
-    def __init__(self, key, secret, region, endpoint=None, orgId=None):
+    CHUNK_SIZE = 65536  # bytes read at once from the network
+
+    # pools of connections shared by all endpoints of a process
+    #
+    adapters = {}
+    adapters_lock = threading.Lock()
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    NETWORK_ERRORS = (socket.error,
+                      requests.exceptions.ConnectionError,
+                      requests.exceptions.Timeout)
+
+    def __init__(self, key, secret, region, endpoint=None, orgId=None,
+                 settings={}, account=None, limiter=None):
+        """
+        Binds to the API of one MCP region
+
+        :param key: user name to authenticate to the API
+        :type key: ``str``
+
+        :param secret: user password to authenticate to the API
+        :type secret: ``str``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param endpoint: base URL of the API, for test injection
+        :type endpoint: ``str`` or `None`
+
+        :param orgId: unique id of the organisation, for test injection
+        :type orgId: ``str`` or `None`
+
+        :param settings: the parameters of the pump, e.g., ``config.pump``
+        :type settings: ``dict``
+
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
+        :param limiter: the limiter shared with other accounts, if any
+        :type limiter: ``RateLimiter``
+
+        HTTP connections are pooled and kept alive across calls, and the
+        pool is shared by all endpoints of a process, whatever their account.
+        The pool can be tuned from the configuration file, like this::
+
+            pump = {
+                'pool_size': 10,
+                'timeout': 60,
+            }
+
+        Node details are cached for some time. The cache can be saved
+        to a file per region, and per account, so that a restarted pump
+        starts warm::
+
+            pump = {
+                'node_cache_size': 1000,
+                'node_cache_ttl': 3600,
+                'node_cache': './cache/nodes-{}.json',
+            }
+
+        NAT rules are indexed per network domain, and refreshed after
+        some time::
+
+            pump = {
+                'nat_rules_ttl': 900,
+            }
+
+        Calls to the API are paced by a ``RateLimiter``, which is shared by
+        all processes forked after the endpoint has been created. Calls
+        that fail with status 429 or 5xx, or with a network error, are
+        retried some times after a pause::
+
+            pump = {
+                'api_rate': 5.0,
+                'api_retries': 5,
+            }
+
+        Calls are made in the real-time lane, unless ``lane`` is set to
+        'backfill' in processes that load history. Backfill gets only a share
+        of the rate, and gives way to real-time polls::
+
+            pump = {
+                'backfill_share': 0.5,
+            }
+
+        """
 
         assert key not in (None, '')
         self.key = key
@@ -51,19 +146,431 @@ class Endpoint(object):
         assert region not in (None, '')
         self.region = region
 
+        self.account = account
+
+        self.settings = settings
+
+        self._session = None
+        self._pid = None
+
+        self.calls = 0
+        self.elapsed = 0.0
+
+        self.limiter = limiter or RateLimiter.from_settings(settings)
+        self.lane = 'realtime'
+        self.retries = 0
+
+        self.fingerprints = {}  # last response per report type
+        self.skipped = 0
+        self.processed = 0
+
+        path = settings.get('node_cache')
+        if path and account:
+            path = path.format(u'{}@{}'.format(account, region))
+        elif path:
+            path = path.format(region)
+        self.nodes = Cache(size=settings.get('node_cache_size', 1000),
+                           ttl=settings.get('node_cache_ttl', 3600),
+                           path=path)
+        self.nodes.load()
+
+        self.nat_rules = Cache(ttl=settings.get('nat_rules_ttl', 900))
+
+        self.pages = 1  # size of last inventory, in pages
+
         if endpoint is None:   # allow for endpoint injection
             endpoint = self.HOSTS[region]
 
         if orgId is None:  # allow for orgId injection
-            r = requests.get(endpoint+'/oec/0.9/myaccount',
-                             auth=(self.key, self.secret))
+            r = self.get(endpoint+'/oec/0.9/myaccount')
             orgId_re = r":orgId>([a-f0-9\-]+)</"
             match = re.search(orgId_re, r.text)
+            if match is None:
+                logging.error(u"Status: {}".format(r.status_code))
+                raise RuntimeError("Unable to get orgId from API")
             orgId = match.group(1)
 
+        self.orgId = orgId
+
         self.url_v1 = endpoint+'/oec/0.9/'+orgId
         self.url_v2 = endpoint+'/caas/2.5/'+orgId
 
+    def get_session(self):
+        """
+        Provides a pool of HTTP connections to the API
+
+        :return: a session that keeps connections alive
+        :rtype: ``requests.Session``
+
+        The session is built on first use, and again after a fork, so that
+        every worker process has its own pool of connections. Sessions of
+        different accounts have their own credentials, but share the pool.
+        """
+
+        if self._session is None or self._pid != os.getpid():
+
+            adapter = self.get_adapter()
+
+            session = requests.Session()
+            session.auth = (self.key, self.secret)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+
+            self._session = session
+            self._pid = os.getpid()
+
+        return self._session
+
+    def get_adapter(self):
+        """
+        Provides the pool of connections of this process
+
+        :return: an adapter shared by all endpoints of the process
+        :rtype: ``requests.adapters.HTTPAdapter``
+
+        """
+
+        pool_size = self.settings.get('pool_size', 10)
+        key = (os.getpid(), pool_size)
+
+        with self.adapters_lock:
+            adapter = self.adapters.get(key)
+            if adapter is None:
+                for pid, size in list(self.adapters.keys()):
+                    if pid != key[0]:  # inherited from the parent process
+                        del self.adapters[(pid, size)]
+
+                adapter = requests.adapters.HTTPAdapter(
+                    pool_connections=pool_size,
+                    pool_maxsize=pool_size)
+                self.adapters[key] = adapter
+
+        return adapter
+
+    def get(self, url, **kwargs):
+        """
+        Gets some resource from the API
+
+        :param url: the target resource
+        :type url: ``str``
+
+        :return: the response from the API
+        :rtype: ``requests.Response``
+
+        Additional parameters are passed to ``requests.Session.get()``.
+
+        When the API pushes back, or cannot be reached, the call is retried
+        after a pause that grows with consecutive failures. The last
+        response, or the last exception, is passed to the caller. A call
+        interrupted by a signal, e.g., SIGUSR1 sent to a profiled worker, is
+        retried at once, since the API has not failed.
+        """
+
+        kwargs.setdefault('timeout', self.settings.get('timeout', 60))
+
+        resource = self.get_resource(url)
+
+        attempts = 1 + self.settings.get('api_retries', 5)
+        for attempt in range(1, attempts+1):
+
+            self.limiter.acquire(self.lane)
+
+            start = time.time()
+            try:
+                r = self.get_session().get(url, **kwargs)
+
+            except self.NETWORK_ERRORS as feedback:
+                metrics.increment('mcp_api_calls_total', region=self.region,
+                                  resource=resource, status='error')
+                if attempt >= attempts:
+                    raise
+
+                logging.debug(u"- {} for {}".format(feedback, url))
+                if self.is_interrupted(feedback):
+                    continue
+
+                self.limiter.fail()
+                self.retries += 1
+                continue
+
+            finally:
+                elapsed = time.time() - start
+                self.calls += 1
+                self.elapsed += elapsed
+                metrics.observe('mcp_api_seconds', elapsed,
+                                region=self.region, resource=resource)
+
+            logging.debug(u"- {} ms for {}".format(int(elapsed*1000), url))
+            metrics.increment('mcp_api_calls_total', region=self.region,
+                              resource=resource, status=r.status_code)
+
+            if r.status_code not in self.RETRY_STATUSES or attempt >= attempts:
+                if r.status_code < 400:
+                    self.limiter.succeed()
+                return r
+
+            logging.debug(u"- status {} for {}".format(r.status_code, url))
+            self.limiter.fail(self.get_retry_after(r))
+            self.retries += 1
+            r.close()
+
+    @classmethod
+    def is_interrupted(cls, feedback):
+        """
+        Tells if a network error comes from a signal
+
+        :param feedback: the exception raised on some call
+        :type feedback: ``Exception``
+
+        :return: `True` if a system call has been interrupted (EINTR)
+        :rtype: ``bool``
+
+        Errors of sockets are wrapped by ``urllib3`` and by ``requests``, and
+        the original error is looked for in these wrappers.
+        """
+
+        if getattr(feedback, 'errno', None) == errno.EINTR:
+            return True
+
+        for inner in [getattr(feedback, 'reason', None)] + list(
+                getattr(feedback, 'args', ())):
+            if isinstance(inner, Exception) and inner is not feedback:
+                if cls.is_interrupted(inner):
+                    return True
+
+        return False
+
+    @staticmethod
+    def get_resource(url):
+        """
+        Names the resource of some URL, for metrics
+
+        :param url: the target resource
+        :type url: ``str``
+
+        :return: the path without organisation and unique ids, e.g.,
+            '/server/server/:id' or '/report/usage'
+        :rtype: ``str``
+        """
+
+        path = url.split('?')[0]
+        path = re.sub(r'^https?://[^/]+', '', path)
+
+        match = re.match(r'^/(oec|caas)/[\d.]+(/[^/]+)(/.*)?$', path)
+        if match:
+            path = match.group(3) or match.group(2)
+
+        return re.sub(r'/[0-9a-f]{8}-[0-9a-f\-]{27}', '/:id', path)
+
+    def get_retry_after(self, r):
+        """
+        Reads the pause requested by the API, if any
+
+        :param r: a response from the API
+        :type r: ``requests.Response``
+
+        :return: seconds to wait, or `None`
+        :rtype: ``float``
+        """
+
+        try:
+            return float(r.headers['Retry-After'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def get_latency(self):
+        """
+        Reports on the average latency of API calls
+
+        :return: average duration of API calls, in seconds
+        :rtype: ``float``
+        """
+
+        if self.calls < 1:
+            return 0.0
+
+        return self.elapsed / self.calls
+
+    def get_rows(self, url):
+        """
+        Streams records of a CSV report from the API
+
+        :param url: the target report
+        :type url: ``str``
+
+        :return: report records, one at a time
+        :rtype: iterator of list
+
+        The response is read chunk by chunk and parsed by the ``csv`` module,
+        so that quoted fields may contain commas, and so that large reports
+        are never held in memory. Empty lines are skipped.
+        """
+
+        r = self.get(url, stream=True)
+        try:
+            lines = r.iter_lines(chunk_size=self.CHUNK_SIZE)
+            for row in self.parse_rows(lines, r.encoding):
+                yield row
+
+        finally:
+            r.close()
+
+    def parse_rows(self, lines, encoding=None):
+        """
+        Parses lines of a CSV report
+
+        :param lines: lines of the report, as received from the network
+        :type lines: iterator of ``bytes``
+
+        :param encoding: the encoding of the report, if known
+        :type encoding: ``str`` or `None`
+
+        :return: report records, one at a time
+        :rtype: iterator of list
+
+        """
+
+        if not six.PY2:  # csv module expects text in python 3
+            encoding = encoding or 'utf-8'
+            lines = (line.decode(encoding) for line in lines)
+
+        count = 0
+        try:
+            for row in csv.reader(lines):
+                if len(row) > 0:
+                    count += 1
+                    yield row
+
+        finally:
+            metrics.increment('mcp_rows_parsed_total', count,
+                              region=self.region)
+
+    def get_changed_rows(self, url, label):
+        """
+        Provides records of a CSV report, unless it has not changed
+
+        :param url: the target report
+        :type url: ``str``
+
+        :param label: the type of report, e.g., 'audit_log'
+        :type label: ``str``
+
+        :return: report records, or `None` if the report has not changed
+        :rtype: list of list or `None`
+
+        The body of each response is fingerprinted with its hash and length.
+        When the same report is polled again and the body is identical to
+        the previous one, it is not parsed at all. Conditional headers are
+        also sent to the API, so that it can answer with 304 if it wants to.
+
+        The API always sends the whole report. When the body only has new
+        lines appended to the previous body, then the previous body is
+        skipped, and only new lines are parsed, after the column headers.
+        Else the whole report is parsed, and records that have been
+        provided before are filtered out by ``AuditTail``.
+        """
+
+        previous = self.fingerprints.get(label)
+        if previous and previous['url'] != url:  # e.g., new day
+            previous = None
+
+        headers = {}
+        if previous and previous.get('etag'):
+            headers['If-None-Match'] = previous['etag']
+        if previous and previous.get('modified'):
+            headers['If-Modified-Since'] = previous['modified']
+
+        r = self.get(url, headers=headers)
+
+        if previous and r.status_code == 304:
+            self.skipped += 1
+            return None
+
+        content = r.content
+
+        prefix = None  # digest of the part that has been received before
+        digest = hashlib.sha1()
+        if previous and previous['length'] <= len(content):
+            digest.update(content[:previous['length']])
+            prefix = digest.hexdigest()
+            digest.update(content[previous['length']:])
+
+        else:
+            digest.update(content)
+
+        fingerprint = {
+            'url': url,
+            'digest': digest.hexdigest(),
+            'length': len(content),
+            'complete': content.endswith(b'\n'),
+            'etag': r.headers.get('ETag'),
+            'modified': r.headers.get('Last-Modified'),
+            'headers': None,
+        }
+        self.fingerprints[label] = fingerprint
+
+        if (previous
+                and previous['digest'] == fingerprint['digest']
+                and previous['length'] == fingerprint['length']):
+            fingerprint['headers'] = previous['headers']
+            self.skipped += 1
+            return None
+
+        offset = 0  # lines that have been parsed before
+        if (prefix is not None
+                and prefix == previous['digest']
+                and previous['complete']
+                and previous['headers']):
+            offset = previous['length']
+            fingerprint['headers'] = previous['headers']
+
+        self.processed += 1
+
+        if offset:
+            rows = [fingerprint['headers']]
+            rows.extend(self.parse_rows(content[offset:].splitlines(),
+                                        r.encoding))
+            return rows
+
+        rows = list(self.parse_rows(content.splitlines(), r.encoding))
+        fingerprint['headers'] = rows[0] if rows else None
+        return rows
+
+    def get_poll_stats(self):
+        """
+        Reports on polls of reports that have not changed
+
+        :return: counters of skipped and processed polls
+        :rtype: ``dict``
+        """
+
+        return {
+            'skipped': self.skipped,
+            'processed': self.processed,
+        }
+
+    def has_footprint(self):
+        """
+        Checks if the organisation uses resources in this region
+
+        :return: `True` if some network domain or server can be found
+        :rtype: ``bool``
+
+        """
+
+        for resource in ('/network/networkDomain', '/server/server'):
+            r = self.get(self.url_v2+resource+'?pageSize=1')
+
+            if r.status_code != 200:
+                logging.error(u"Status: {}".format(r.status_code))
+                raise RuntimeError("Unable to list resources from API")
+
+            match = re.search(r'totalCount="(\d+)"', r.text)
+            if match and int(match.group(1)) > 0:
+                return True
+
+        return False
+
     def summary_usage_report(self, start_date, end_date):
         """
         Fetches smmary usage data from the API
@@ -75,14 +582,12 @@ class Endpoint(object):
         :type end_date: str
 
         :return: report records
-        :rtype: list of list
+        :rtype: iterator of list
         """
 
         url_template = self.url_v1+'/report/usage?startDate={}&endDate={}'
         url = url_template.format(start_date, end_date)
-        r = requests.get(url, auth=(self.key, self.secret))
-        lines = str.splitlines(str(r.text))
-        return [line.split(',') for line in lines]
+        return self.get_rows(url)
 
     def detailed_usage_report(self, start_date, end_date):
         """
@@ -95,17 +600,14 @@ class Endpoint(object):
         :type end_date: str
 
         :return: report records
-        :rtype: list of list
+        :rtype: iterator of list
         """
 
-
         url_template = self.url_v1+'/report/usageDetailed?startDate={}&endDate={}'
         url = url_template.format(start_date, end_date)
-        r = requests.get(url, auth=(self.key, self.secret))
-        lines = str.splitlines(str(r.text))
-        return [line.split(',') for line in lines]
+        return self.get_rows(url)
 
-    def audit_log_report(self, start_date, end_date):
+    def audit_log_report(self, start_date, end_date, changed_only=False):
         """
         Fetches audit data from the API
 
@@ -115,17 +617,20 @@ class Endpoint(object):
         :param end_date: days after last day of the report
         :type end_date: str
 
-        :return: report records
-        :rtype: list of list
-        """
+        :param changed_only: provide nothing if the report has not changed
+        :type changed_only: `True` or `False`
 
+        :return: report records, or `None`
+        :rtype: iterator of list
+        """
 
         url_template = self.url_v1+'/auditlog?startDate={}&endDate={}'
         url = url_template.format(start_date, end_date)
-        r = requests.get(url, auth=(self.key, self.secret))
-        lines = str.splitlines(str(r.text))
-        #print(lines)
-        return [line.split(',') for line in lines]
+
+        if changed_only:
+            return self.get_changed_rows(url, 'audit_log')
+
+        return self.get_rows(url)
 
     def get_node_by_id(self, id=None, body=None):
         """
@@ -140,16 +645,28 @@ class Endpoint(object):
         :return: attributes of the node
         :rtype: dict or None
 
+        Nodes are cached, so that the API is called only once for a node
+        that is activated multiple times.
         """
         assert id is None or body is None
         assert id is not None or body is not None
 
+        if id is not None:
+            node = self.nodes.get(id)
+            if node is not None:
+                metrics.increment('mcp_node_lookups_total',
+                                  region=self.region, result='hit')
+                return node
+
+            metrics.increment('mcp_node_lookups_total',
+                              region=self.region, result='miss')
+
         if body:  # allow for test injection
             text = body
 
         else:
             url = self.url_v2+'/server/server/'+id
-            r = requests.get(url, auth=(self.key, self.secret))
+            r = self.get(url)
 
             if r.status_code != 200:
                 logging.error(u"Status: {}".format(r.status_code))
@@ -158,64 +675,155 @@ class Endpoint(object):
             text = r.text
 
         try:
-            #print(text)
-            item = xmltodict.parse(text)['server']
+            total, nodes = extract_nodes(text)
+            node = nodes[0]
         except:
             logging.error(u"Response: {}".format(text))
             raise RuntimeError("Unable to get node from API")
 
-        #print(item.keys())
-
-        node = {}
-        node['id'] = item['@id']
-        node['name'] = item['name']
-        node['description'] = item.get('description', '')
-        node['private_ips'] = [ item['networkInfo']['primaryNic']['@privateIpv4'] ]
-        node['datacenterId'] = item['@datacenterId']
-        node['cpu'] = item['cpu']['@count']
-        node['memoryMb'] = int(item['memoryGb'])*1024
-        node['networkDomainId'] = item['networkInfo']['@networkDomainId']
-        node['ipv6'] = item['networkInfo']['primaryNic']['@ipv6']
-        node['vlanId'] = item['networkInfo']['primaryNic']['@vlanId']
-        node['vlanName'] = item['networkInfo']['primaryNic']['@vlanName']
-        node['networkAdapter'] = item['networkInfo']['primaryNic']['@networkAdapter']
-        try:
-            node['macAddress'] = item['networkInfo']['primaryNic']['@macAddress']
-        except:
-            node['macAddress'] = None
-        node['sourceImageId'] = item['sourceImageId']
-        node['deployed'] = item['deployed']
-        node['deployedTime'] = item.get('createTime')
-        node['started'] = item['started']
-        node['state'] = item['state']
-        node['OS_id'] = item['guest']['operatingSystem']['@id']
-        node['OS_displayName'] = item['guest']['operatingSystem']['@displayName']
-        node['OS_type'] = item['guest']['operatingSystem']['@family']
-        try:
-            node['virtualHardware'] = item['virtualHardware']['@version']
-        except:
-            node['virtualHardware'] = None
-        node['disks'] = []
-
-        if not isinstance(item['scsiController']['disk'], list):
-            item['scsiController']['disk'] = [item['scsiController']['disk']]
-
-        for disk in item['scsiController']['disk']:
-            node['disks'].append(disk['@sizeGb'])
-
         # hack - the API does not report public ipv4 accurately
         # so we look at the NAT rules to find public IP address
 
         try:
             assert body is None
 
-            url_template = self.url_v2+'/network/natRule?networkDomainId={}&internalIp={}'
-            url = url_template.format(node['networkDomainId'], node['private_ips'][0])
-            r = requests.get(url, auth=(self.key, self.secret))
-            #print(r.text)
-            node['public_ip'] = xmltodict.parse(r.text)['natRules']['natRule']['externalIp']
+            node['public_ip'] = self.get_public_ip(node['networkDomainId'],
+                                                   node['private_ips'][0])
+
+            self.nodes.put(node['id'], node)  # only complete nodes
 
         except:
             node['public_ip'] = None
 
         return node
+
+    def list_servers(self):
+        """
+        Retrieves details of all nodes of the region
+
+        :return: attributes of every node
+        :rtype: list of dict
+
+        Servers are listed page after page, and their public addresses are
+        resolved with one index of NAT rules per network domain. Nodes are
+        cached, so that subsequent calls to ``get_node_by_id()`` are
+        served from this snapshot of the inventory.
+        """
+
+        size = self.settings.get('page_size', 250)
+        url_template = self.url_v2+'/server/server?pageSize={}&pageNumber={}'
+
+        nodes = []
+        page = 1
+        while True:
+            url = url_template.format(size, page)
+            r = self.get(url)
+
+            if r.status_code != 200:
+                logging.error(u"Status: {}".format(r.status_code))
+                raise RuntimeError("Unable to list servers from API")
+
+            total, listed = extract_nodes(r.text)
+            for node in listed:
+                try:
+                    node['public_ip'] = self.get_public_ip(
+                        node['networkDomainId'],
+                        node['private_ips'][0])
+
+                    self.nodes.put(node['id'], node)
+
+                except Exception as feedback:
+                    logging.debug(feedback)
+                    node['public_ip'] = None
+
+                nodes.append(node)
+
+            if page*size >= total:
+                break
+            page += 1
+
+        self.pages = page
+        logging.debug("- listed {} servers in {} pages for {}".format(
+            len(nodes), page, self.region))
+
+        return nodes
+
+    def forget_node(self, id):
+        """
+        Forgets cached details of some node
+
+        :param id: unique id of the target node
+        :type id: str
+
+        This is used when the audit log shows that the node has changed.
+        """
+
+        self.nodes.forget(id)
+
+    def get_nat_rules(self, networkDomainId):
+        """
+        Indexes NAT rules of some network domain
+
+        :param networkDomainId: unique id of the target network domain
+        :type networkDomainId: str
+
+        :return: external IP addresses by internal IP address
+        :rtype: dict
+
+        All rules of the network domain are listed page after page, and
+        the index is cached, so that servers started at the same time in
+        the same network domain cost only one call to the API.
+        """
+
+        rules = self.nat_rules.get(networkDomainId)
+        if rules is not None:
+            return rules
+
+        size = self.settings.get('page_size', 250)
+        url_template = (self.url_v2+'/network/natRule?networkDomainId={}'
+                        '&pageSize={}&pageNumber={}')
+
+        rules = {}
+        page = 1
+        while True:
+            url = url_template.format(networkDomainId, size, page)
+            r = self.get(url)
+
+            if r.status_code != 200:
+                logging.error(u"Status: {}".format(r.status_code))
+                raise RuntimeError("Unable to get NAT rules from API")
+
+            total, listed = extract_nat_rules(r.text)
+            rules.update(listed)
+
+            if page*size >= total:
+                break
+            page += 1
+
+        self.nat_rules.put(networkDomainId, rules)
+        return rules
+
+    def get_public_ip(self, networkDomainId, private_ip):
+        """
+        Finds the public address of some node
+
+        :param networkDomainId: unique id of the network domain of the node
+        :type networkDomainId: str
+
+        :param private_ip: private IPv4 address of the node
+        :type private_ip: str
+
+        :return: the public IPv4 address of the node, or None
+        :rtype: str
+        """
+
+        return self.get_nat_rules(networkDomainId).get(private_ip)
+
+    def forget_nat_rules(self):
+        """
+        Forgets NAT rules of all network domains
+
+        This is used when the audit log shows that NAT rules have changed.
+        """
+
+        self.nat_rules.clear()
@@ -0,0 +1,409 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import deque
+from datetime import timedelta
+import logging
+import multiprocessing
+from multiprocessing.pool import Pool
+from six.moves import queue as Queue
+import time
+
+# the pump used by processes of the pool, set when they are forked
+#
+worker_pump = None
+
+
+def bind_worker(pump):
+    """
+    Gives the pump to a process of the pool
+
+    :param pump: the pump that has been set in the parent process
+    :type pump: ``Pump``
+
+    Calls to the API are made in the backfill lane, so that real-time polls
+    come first.
+    """
+
+    global worker_pump
+    worker_pump = pump
+    worker_pump.set_lane('backfill')
+
+
+def run_task(task):
+    """
+    Runs one task in a process of the pool
+
+    :param task: region, day or (first, last) window, and report
+    :type task: ``tuple``
+
+    :return: the task, a flag of success, and its duration in seconds
+    :rtype: ``tuple``
+    """
+
+    region, on, label = task
+
+    start = time.time()
+    try:
+        succeeded = worker_pump.pull_report(label, on, region)
+
+    except Exception as feedback:
+        logging.exception(feedback)
+        succeeded = False
+
+    return task, succeeded, time.time() - start
+
+
+class Executor(object):
+    """
+    Runs a backfill on a pool of processes
+
+    Every report of every region over every day, or window of days, is a
+    separate task. Idle processes take the next task of the region that
+    has the most work left, so that fast regions do not wait for slow ones.
+    The number of tasks running at once for a region is capped, so that
+    the rate limit of its API is not exhausted by a single region. The cap
+    covers all accounts of the region. A task that has not ended after some
+    time, e.g., because its process has died, is counted as failed, and it
+    is left in the checkpoint for next run.
+
+    The pool can be sized in the configuration file, like this::
+
+        pump = {
+            'backfill_workers': 8,
+            'backfill_per_region': 2,
+            'backfill_progress': 60,
+            'backfill_timeout': 3600,
+        }
+
+    """
+
+    def __init__(self, pump, settings={}):
+        """
+        Sets a new executor
+
+        :param pump: the pump that fetches and dispatches data
+        :type pump: ``Pump``
+
+        :param settings: the parameters of the pump, e.g., ``config.pump``
+        :type settings: ``dict``
+
+        """
+
+        self.pump = pump
+
+        self.size = settings.get('backfill_workers',
+                                 multiprocessing.cpu_count())
+        self.per_region = max(1, settings.get('backfill_per_region', 2))
+        self.progress = settings.get('backfill_progress', 60)
+        self.timeout = settings.get('backfill_timeout', 3600)
+        self.window = settings.get('backfill_window', 7)
+
+        self.pool = None
+
+        self.done = 0
+        self.failed = 0
+
+    def open(self):
+        """
+        Starts processes of the pool
+
+        This should be called from the main thread, before the backfill is
+        run in the background, so that processes are not forked from a
+        thread.
+        """
+
+        if self.pool is None:
+            self.pool = Pool(self.size,
+                             initializer=bind_worker,
+                             initargs=(self.pump,))
+
+    def close(self):
+        """
+        Stops processes of the pool
+        """
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def get_tasks(self, first, last, regions, done=()):
+        """
+        Lists tasks of some backfill
+
+        :param first: the first target day, e.g., date(2016, 11, 1)
+        :type first: ``date``
+
+        :param last: the last target day, e.g., date(2016, 11, 30)
+        :type last: ``date``
+
+        :param regions: the target regions, e.g., ['dd-eu', 'acme@dd-na']
+        :type regions: ``list`` of ``str``
+
+        :param done: tasks that have been done before, if any
+        :type done: ``set`` of ``tuple``
+
+        :return: tasks, with region, day or window, and report
+        :rtype: ``list`` of ``tuple``
+
+        Usage reports are fetched over windows of days, while the audit log
+        is fetched day after day. Windows are aligned on the calendar, e.g.,
+        on weeks from Monday to Sunday for windows of 7 days, and days that
+        do not fill a window are fetched one at a time. In this way, tasks
+        are the same from one run to the next, even if the horizon moves. A
+        window that has some day done already, e.g., by the daily pull, is
+        fetched day after day as well, so that nothing is pulled twice.
+        """
+
+        tasks = []
+        for region in regions:
+
+            head = first
+            while head <= last:
+                tail = self.get_window_end(head)
+                if tail > last:
+                    tail = head
+
+                for label in ('summary_usage', 'detailed_usage'):
+                    if tail > head and not self.has_done_day(
+                            done, region, head, tail, label):
+                        tasks.append((region, (head, tail), label))
+                        continue
+
+                    day = head
+                    while day <= tail:
+                        tasks.append((region, day, label))
+                        day += timedelta(days=1)
+
+                while head <= tail:
+                    tasks.append((region, head, 'audit_log'))
+                    head += timedelta(days=1)
+
+        return tasks
+
+    def get_window_end(self, day):
+        """
+        Finds the last day of the window that begins on some day
+
+        :param day: the first day of the window, e.g., date(2017, 5, 1)
+        :type day: ``date``
+
+        :return: the last day of the window, or the same day if no window
+            of the calendar begins on this day
+        :rtype: ``date``
+
+        """
+
+        if self.window > 1 and (day.toordinal() - 1) % self.window == 0:
+            return day + timedelta(days=self.window-1)
+
+        return day
+
+    @staticmethod
+    def has_done_day(done, region, first, last, label):
+        """
+        Checks if some day of a window has been done already
+
+        :param done: tasks that have been done before
+        :type done: ``set`` of ``tuple``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param first: the first day of the window
+        :type first: ``date``
+
+        :param last: the last day of the window
+        :type last: ``date``
+
+        :param label: the type of report, e.g., 'summary_usage'
+        :type label: ``str``
+
+        :return: `True` if some day of the window has been done on its own
+        :rtype: ``bool``
+        """
+
+        day = first
+        while day <= last:
+            if (region, day, label) in done:
+                return True
+            day += timedelta(days=1)
+
+        return False
+
+    def run(self, tasks):
+        """
+        Runs tasks until completion
+
+        :param tasks: tasks, with region, day or window, and report
+        :type tasks: ``list`` of ``tuple``
+
+        :return: the number of tasks that have succeeded
+        :rtype: ``int``
+
+        """
+
+        pending = {}
+        for task in tasks:
+            pending.setdefault(task[0], deque()).append(task)
+        running = dict((self.get_region(target), 0)
+                       for target in pending.keys())
+
+        total = len(tasks)
+        if total < 1:
+            self.close()
+            return 0
+
+        logging.info("Backfilling {} tasks with {} workers".format(
+            total, self.size))
+
+        results = Queue.Queue()
+        started = {}  # tasks in progress, and when they have started
+        given_up = False
+        self.open()
+
+        try:
+            start = time.time()
+            reported = start
+            while self.done + self.failed < total:
+
+                while len(started) < self.size:
+                    target = self.next_region(pending, running)
+                    if target is None:
+                        break
+
+                    task = pending[target].popleft()
+                    running[self.get_region(target)] += 1
+                    started[task] = time.time()
+                    self.pool.apply_async(run_task, (task,),
+                                          callback=results.put)
+
+                try:
+                    task, succeeded, duration = results.get(
+                        timeout=max(1, min(self.progress, self.timeout)))
+
+                except Queue.Empty:
+                    task = self.get_expired(started)
+                    if task is None:
+                        continue
+
+                    succeeded = False
+                    given_up = True
+                    logging.warning("- no end of {} for {} on {} after {} "
+                                    "seconds".format(task[2], task[0],
+                                                     task[1], self.timeout))
+
+                if task not in started:  # has ended after its timeout
+                    continue
+
+                del started[task]
+                running[self.get_region(task[0])] -= 1
+
+                if succeeded:
+                    self.done += 1
+                else:
+                    self.failed += 1
+                    logging.warning("- failed {} for {} on {}".format(
+                        task[2], task[0], task[1]))
+
+                now = time.time()
+                if (now - reported >= self.progress
+                        or self.done + self.failed == total):
+                    self.report(total, now - start)
+                    reported = now
+
+        finally:
+            if started or given_up:  # do not wait for tasks that never end
+                self.pool.terminate()
+            self.close()
+
+        return self.done
+
+    def get_expired(self, started):
+        """
+        Finds a task that has been running for too long
+
+        :param started: tasks in progress, and when they have started
+        :type started: ``dict``
+
+        :return: a task that has not ended in time, or `None`
+        :rtype: ``tuple``
+        """
+
+        now = time.time()
+        for task, stamp in started.items():
+            if now - stamp >= self.timeout:
+                return task
+
+        return None
+
+    @staticmethod
+    def get_region(target):
+        """
+        Provides the region of some target
+
+        :param target: the target region, e.g., 'dd-eu' or 'acme@dd-eu'
+        :type target: ``str``
+
+        :return: the region, e.g., 'dd-eu'
+        :rtype: ``str``
+        """
+
+        return target.split('@', 1)[-1]
+
+    def next_region(self, pending, running):
+        """
+        Selects the region of next task
+
+        :param pending: tasks that have not been started, per target region
+        :type pending: ``dict`` of ``deque``
+
+        :param running: count of tasks in progress, per region
+        :type running: ``dict``
+
+        :return: the target region with most work left, in a region that is
+            below its cap
+        :rtype: ``str`` or `None`
+        """
+
+        candidates = [target for target in pending.keys()
+                      if pending[target]
+                      and running[self.get_region(target)] < self.per_region]
+
+        if not candidates:
+            return None
+
+        return max(candidates, key=lambda target: len(pending[target]))
+
+    def report(self, total, elapsed):
+        """
+        Reports on the progress of the backfill
+
+        :param total: the number of tasks of the backfill
+        :type total: ``int``
+
+        :param elapsed: seconds since the beginning of the backfill
+        :type elapsed: ``float``
+
+        """
+
+        completed = self.done + self.failed
+        rate = completed / max(elapsed, 0.001)
+        eta = (total - completed) / rate if rate > 0 else 0
+
+        logging.info("- {}/{} tasks, {} failed, {:.1f} per minute, "
+                     "ETA {}".format(completed, total, self.failed, rate*60,
+                                     timedelta(seconds=int(eta))))
@@ -0,0 +1,193 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import six
+
+try:
+    from lxml import etree
+except ImportError:
+    try:
+        import xml.etree.cElementTree as etree
+    except ImportError:
+        import xml.etree.ElementTree as etree
+
+
+def local_name(tag):
+    """
+    Strips the namespace from the tag of some XML element
+
+    :param tag: the tag, e.g., '{urn:didata.com:api:cloud:types}server'
+    :type tag: ``str``
+
+    :return: the tag without namespace, e.g., 'server'
+    :rtype: ``str``
+    """
+
+    return tag.rsplit('}', 1)[-1]
+
+
+def iterate_elements(text, tag):
+    """
+    Streams elements of some kind out of an XML document
+
+    :param text: the XML document
+    :type text: ``str`` or ``bytes``
+
+    :param tag: the tag of target elements, without namespace
+    :type tag: ``str``
+
+    :return: the root element, then every target element
+    :rtype: iterator of ``Element``
+
+    The root element is provided as soon as it is opened, so that only its
+    attributes can be used. Target elements are provided once complete,
+    and then cleared to keep memory low on large documents.
+    """
+
+    if isinstance(text, six.text_type):
+        text = text.encode('utf-8')
+
+    root = None
+    for event, element in etree.iterparse(io.BytesIO(text),
+                                          events=('start', 'end')):
+
+        if root is None:
+            root = element
+            yield root
+
+        elif event == 'end' and local_name(element.tag) == tag:
+            yield element
+            element.clear()
+
+
+def build_node(element):
+    """
+    Builds node details out of a server description
+
+    :param element: the ``<server>`` element of an API response
+    :type element: ``Element``
+
+    :return: attributes of the node, except the public address
+    :rtype: dict
+
+    Only children of the server that are actually used are looked at.
+    """
+
+    node = {
+        'id': element.get('id'),
+        'datacenterId': element.get('datacenterId'),
+        'description': '',
+        'deployedTime': None,
+        'macAddress': None,
+        'virtualHardware': None,
+        'disks': [],
+    }
+
+    for child in element:
+        tag = local_name(child.tag)
+
+        if tag in ('name', 'description', 'sourceImageId',
+                   'deployed', 'started', 'state'):
+            node[tag] = child.text
+
+        elif tag == 'createTime':
+            node['deployedTime'] = child.text
+
+        elif tag == 'cpu':
+            node['cpu'] = child.get('count')
+
+        elif tag == 'memoryGb':
+            node['memoryMb'] = int(child.text)*1024
+
+        elif tag == 'networkInfo':
+            node['networkDomainId'] = child.get('networkDomainId')
+            for nic in child:
+                if local_name(nic.tag) == 'primaryNic':
+                    node['private_ips'] = [nic.get('privateIpv4')]
+                    node['ipv6'] = nic.get('ipv6')
+                    node['vlanId'] = nic.get('vlanId')
+                    node['vlanName'] = nic.get('vlanName')
+                    node['networkAdapter'] = nic.get('networkAdapter')
+                    node['macAddress'] = nic.get('macAddress')
+
+        elif tag == 'guest':
+            for system in child:
+                if local_name(system.tag) == 'operatingSystem':
+                    node['OS_id'] = system.get('id')
+                    node['OS_displayName'] = system.get('displayName')
+                    node['OS_type'] = system.get('family')
+
+        elif tag == 'virtualHardware':
+            node['virtualHardware'] = child.get('version')
+
+        elif tag == 'scsiController':
+            for disk in child:
+                if local_name(disk.tag) == 'disk':
+                    node['disks'].append(disk.get('sizeGb'))
+
+    return node
+
+
+def extract_nodes(text):
+    """
+    Extracts node details from a server or from a list of servers
+
+    :param text: the XML document returned by the API
+    :type text: ``str`` or ``bytes``
+
+    :return: the total count of servers, and attributes of listed nodes
+    :rtype: ``tuple`` of ``int`` and list of dict
+
+    """
+
+    elements = iterate_elements(text, 'server')
+    root = next(elements)
+    total = int(root.get('totalCount', 1))
+
+    nodes = [build_node(element) for element in elements]
+    return total, nodes
+
+
+def extract_nat_rules(text):
+    """
+    Extracts NAT rules from a list of rules
+
+    :param text: the XML document returned by the API
+    :type text: ``str`` or ``bytes``
+
+    :return: the total count of rules, and external IP addresses by
+        internal IP address
+    :rtype: ``tuple`` of ``int`` and dict
+
+    """
+
+    elements = iterate_elements(text, 'natRule')
+    root = next(elements)
+    total = int(root.get('totalCount', 0))
+
+    rules = {}
+    for element in elements:
+        internal = external = None
+        for child in element:
+            tag = local_name(child.tag)
+            if tag == 'internalIp':
+                internal = child.text
+            elif tag == 'externalIp':
+                external = child.text
+
+        rules[internal] = external
+
+    return total, rules
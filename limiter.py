@@ -0,0 +1,266 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from multiprocessing import Lock, Value
+import random
+import time
+
+
+class RateLimiter(object):
+    """
+    Paces calls to the API of one region
+
+    This is a token bucket, with tokens added at a steady rate up to some
+    burst size, and one token consumed per call. State is kept in shared
+    memory, so that a limiter created before worker processes are forked
+    is shared by all of them.
+
+    When the API pushes back, all calls are suspended for some time, that
+    grows exponentially with consecutive failures, with random jitter so
+    that workers do not retry all at once.
+
+    Calls are made in one of two lanes. Real-time calls only need a token
+    from the bucket. Backfill calls also need a token from a smaller bucket,
+    refilled at a share of the rate, so that backfill never takes the whole
+    budget of the region. Moreover, backfill gives way while some real-time
+    work is in progress, e.g., while the audit log is polled.
+    """
+
+    LANES = ('realtime', 'backfill')
+
+    def __init__(self, rate=5.0, burst=10, backoff=1.0, backoff_max=60.0,
+                 share=0.5):
+        """
+        Sets a new limiter
+
+        :param rate: calls per second in the long run
+        :type rate: ``float``
+
+        :param burst: calls that can be made at once
+        :type burst: ``int``
+
+        :param backoff: seconds of pause after a first failure
+        :type backoff: ``float``
+
+        :param backoff_max: maximum seconds of pause after failures
+        :type backoff_max: ``float``
+
+        :param share: the part of the rate that backfill can use
+        :type share: ``float``
+
+        """
+
+        assert rate > 0
+        self.rate = float(rate)
+
+        assert burst >= 1
+        self.burst = float(burst)
+
+        self.backoff = float(backoff)
+        self.backoff_max = float(backoff_max)
+
+        self.lock = Lock()
+        self.tokens = Value('d', self.burst, lock=False)
+        self.stamp = Value('d', time.time(), lock=False)
+        self.paused = Value('d', 0.0, lock=False)  # no call before this time
+        self.failures = Value('i', 0, lock=False)
+
+        assert 0 < share <= 1
+        self.share = float(share)
+        self.backfill_burst = max(1.0, self.burst * self.share)
+        self.backfill_tokens = Value('d', self.backfill_burst, lock=False)
+        self.backfill_stamp = Value('d', time.time(), lock=False)
+
+        self.urgent = Value('d', 0.0, lock=False)  # backfill waits until then
+
+    @classmethod
+    def from_settings(cls, settings={}):
+        """
+        Builds a limiter out of the configuration file
+
+        :param settings: the parameters of the pump, e.g., ``config.pump``
+        :type settings: ``dict``
+
+        :return: a new limiter
+        :rtype: ``RateLimiter``
+
+        Calls to the API of each region can be tuned like this::
+
+            pump = {
+                'api_rate': 5.0,
+                'api_burst': 10,
+                'api_backoff': 1.0,
+                'api_backoff_max': 60.0,
+                'backfill_share': 0.5,
+            }
+
+        """
+
+        return cls(rate=settings.get('api_rate', 5.0),
+                   burst=settings.get('api_burst', 10),
+                   backoff=settings.get('api_backoff', 1.0),
+                   backoff_max=settings.get('api_backoff_max', 60.0),
+                   share=settings.get('backfill_share', 0.5))
+
+    def acquire(self, lane='realtime'):
+        """
+        Waits until a call can be made
+
+        :param lane: 'realtime' or 'backfill'
+        :type lane: ``str``
+
+        :return: seconds spent waiting
+        :rtype: ``float``
+        """
+
+        assert lane in self.LANES
+
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.time()
+
+                if now < self.paused.value:
+                    delay = self.paused.value - now
+
+                elif lane == 'backfill' and now < self.urgent.value:
+                    delay = min(self.urgent.value - now, 1.0 / self.rate)
+
+                else:
+                    self.refill(now)
+
+                    if lane == 'realtime':
+                        if self.tokens.value >= 1.0:
+                            self.tokens.value -= 1.0
+                            return waited
+
+                        delay = (1.0 - self.tokens.value) / self.rate
+
+                    else:
+                        if (self.tokens.value >= 1.0
+                                and self.backfill_tokens.value >= 1.0):
+                            self.tokens.value -= 1.0
+                            self.backfill_tokens.value -= 1.0
+                            return waited
+
+                        delay = max(
+                            (1.0 - self.tokens.value) / self.rate,
+                            ((1.0 - self.backfill_tokens.value)
+                             / (self.rate * self.share)))
+
+            time.sleep(delay)
+            waited += delay
+
+    def refill(self, now):
+        """
+        Adds tokens earned since last call, in both buckets
+
+        :param now: the current time
+        :type now: ``float``
+
+        This is called with the lock.
+        """
+
+        elapsed = max(0.0, now - self.stamp.value)
+        self.tokens.value = min(self.burst,
+                                self.tokens.value + elapsed * self.rate)
+        self.stamp.value = now
+
+        elapsed = max(0.0, now - self.backfill_stamp.value)
+        self.backfill_tokens.value = min(
+            self.backfill_burst,
+            self.backfill_tokens.value + elapsed * self.rate * self.share)
+        self.backfill_stamp.value = now
+
+    def preempt(self, timeout=60.0):
+        """
+        Holds back backfill while some real-time work is in progress
+
+        :param timeout: seconds after which backfill resumes anyway, in
+            case ``release()`` is never called
+        :type timeout: ``float``
+
+        """
+
+        with self.lock:
+            self.urgent.value = max(self.urgent.value,
+                                    time.time() + timeout)
+
+    def release(self):
+        """
+        Lets backfill resume after some real-time work
+        """
+
+        with self.lock:
+            self.urgent.value = 0.0
+
+    def give_way(self):
+        """
+        Waits until no real-time work is in progress
+
+        :return: seconds spent waiting
+        :rtype: ``float``
+
+        This is used by backfill between two steps that do not call the API,
+        e.g., before a batch is passed to updaters.
+        """
+
+        waited = 0.0
+        while True:
+            delay = self.urgent.value - time.time()
+            if delay <= 0:
+                return waited
+
+            delay = min(delay, 1.0 / self.rate)
+            time.sleep(delay)
+            waited += delay
+
+    def succeed(self):
+        """
+        Reports that a call has been accepted by the API
+        """
+
+        if self.failures.value > 0:
+            with self.lock:
+                self.failures.value = 0
+
+    def fail(self, delay=None):
+        """
+        Reports that the API has pushed back
+
+        :param delay: seconds requested by the API, e.g., from Retry-After
+        :type delay: ``float`` or `None`
+
+        :return: seconds before next call
+        :rtype: ``float``
+        """
+
+        with self.lock:
+            self.failures.value += 1
+
+            if delay is None:
+                delay = min(self.backoff_max,
+                            self.backoff * 2 ** (self.failures.value - 1))
+                delay = random.uniform(delay / 2.0, delay)
+
+            self.paused.value = max(self.paused.value, time.time() + delay)
+            self.tokens.value = 0.0
+            self.stamp.value = self.paused.value  # refill after the pause
+            self.backfill_tokens.value = 0.0
+            self.backfill_stamp.value = self.paused.value
+
+        logging.debug("- backing off for {:.1f} seconds".format(delay))
+        return delay
@@ -0,0 +1,386 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from multiprocessing import Queue
+import os
+from six.moves import BaseHTTPServer
+from six.moves.queue import Empty
+import threading
+import time
+
+
+class Registry(object):
+    """
+    Keeps counters, gauges and histograms of the pump
+
+    Every process records its own metrics. Once ``share()`` has been
+    called, processes forked afterwards send what they have recorded to
+    the parent process every few seconds, so that all metrics are
+    aggregated in one place, and served from there in the text format of
+    Prometheus.
+    """
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+               10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.helps = {}
+
+        self.queue = None
+        self.interval = 5.0
+
+    def check_pid(self):
+        """
+        Starts afresh in a process that has just been forked
+
+        Metrics inherited from the parent process are dropped, since they
+        are kept there, and recording is sent to the parent from now on.
+        """
+
+        if self.pid == os.getpid():
+            return
+
+        self.pid = os.getpid()
+        self.lock = threading.Lock()  # may have been held during the fork
+
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+        if self.queue is not None:
+            flusher = threading.Thread(target=self.flush_every_interval)
+            flusher.daemon = True
+            flusher.start()
+
+    @staticmethod
+    def get_key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def increment(self, name, value=1, **labels):
+        """
+        Adds to a counter
+
+        :param name: the name of the counter, e.g., 'mcp_api_calls_total'
+        :type name: ``str``
+
+        :param value: the quantity to add
+        :type value: ``int`` or ``float``
+
+        Other named parameters are labels of the counter, e.g.,
+        ``region='dd-eu'``.
+        """
+
+        self.check_pid()
+        key = self.get_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        """
+        Sets a gauge
+
+        :param name: the name of the gauge, e.g., 'mcp_queue_depth'
+        :type name: ``str``
+
+        :param value: the current value
+        :type value: ``int`` or ``float``
+
+        """
+
+        self.check_pid()
+        key = self.get_key(name, labels)
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name, value, **labels):
+        """
+        Adds a measure to a histogram
+
+        :param name: the name of the histogram, e.g., 'mcp_api_seconds'
+        :type name: ``str``
+
+        :param value: the measure, e.g., a duration in seconds
+        :type value: ``float``
+
+        """
+
+        self.check_pid()
+        key = self.get_key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = [[0] * len(self.BUCKETS), 0.0, 0]
+                self.histograms[key] = histogram
+
+            for index, bound in enumerate(self.BUCKETS):
+                if value <= bound:
+                    histogram[0][index] += 1
+                    break
+
+            histogram[1] += value
+            histogram[2] += 1
+
+    def describe(self, name, text):
+        """
+        Documents a metric
+
+        :param name: the name of the metric
+        :type name: ``str``
+
+        :param text: what is measured
+        :type text: ``str``
+
+        """
+
+        self.helps[name] = text
+
+    def share(self, interval=5.0):
+        """
+        Collects metrics of processes that will be forked
+
+        :param interval: seconds between two sendings from a child process
+        :type interval: ``float``
+
+        This has to be called before processes are forked.
+        """
+
+        if self.queue is not None:
+            return
+
+        self.interval = interval
+        self.queue = Queue()
+
+        collector = threading.Thread(target=self.collect)
+        collector.daemon = True
+        collector.start()
+
+    def take(self):
+        """
+        Provides metrics recorded since last call, and forgets them
+
+        :return: counters, gauges and histograms
+        :rtype: ``dict``
+        """
+
+        with self.lock:
+            delta = {'counters': self.counters,
+                     'gauges': self.gauges,
+                     'histograms': self.histograms}
+
+            self.counters = {}
+            self.gauges = {}
+            self.histograms = {}
+
+        return delta
+
+    def flush_every_interval(self):
+        """
+        Sends metrics of a child process to the parent process
+        """
+
+        while True:
+            time.sleep(self.interval)
+
+            delta = self.take()
+            if any(delta.values()):
+                self.queue.put(delta)
+
+    def collect(self):
+        """
+        Receives metrics of child processes
+        """
+
+        while True:
+            try:
+                self.merge(self.queue.get(timeout=60))
+            except Empty:
+                pass
+            except Exception as feedback:
+                logging.debug(feedback)
+
+    def merge(self, delta):
+        """
+        Adds metrics of a child process
+
+        :param delta: counters, gauges and histograms
+        :type delta: ``dict``
+
+        """
+
+        with self.lock:
+            for key, value in delta['counters'].items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+            self.gauges.update(delta['gauges'])
+
+            for key, (buckets, total, count) in delta['histograms'].items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = [[0] * len(self.BUCKETS), 0.0, 0]
+                    self.histograms[key] = histogram
+
+                for index, value in enumerate(buckets):
+                    histogram[0][index] += value
+                histogram[1] += total
+                histogram[2] += count
+
+    @staticmethod
+    def format_labels(labels, extra=()):
+        """
+        Formats labels of a metric, e.g., '{region="dd-eu"}'
+        """
+
+        pairs = []
+        for name, value in tuple(labels) + tuple(extra):
+            value = (u'{}'.format(value)
+                     .replace('\\', '\\\\')
+                     .replace('"', '\\"')
+                     .replace('\n', '\\n'))
+            pairs.append(u'{}="{}"'.format(name, value))
+
+        if not pairs:
+            return u''
+
+        return u'{' + u','.join(pairs) + u'}'
+
+    def render(self):
+        """
+        Formats all metrics for Prometheus
+
+        :return: metrics in the text exposition format
+        :rtype: ``str``
+        """
+
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = dict((key, (list(value[0]), value[1], value[2]))
+                              for key, value in self.histograms.items())
+
+        lines = []
+        for kind, values in (('counter', counters), ('gauge', gauges)):
+            for name in sorted(set(key[0] for key in values.keys())):
+                if name in self.helps:
+                    lines.append(u'# HELP {} {}'.format(name, self.helps[name]))
+                lines.append(u'# TYPE {} {}'.format(name, kind))
+
+                for key in sorted(x for x in values.keys() if x[0] == name):
+                    lines.append(u'{}{} {}'.format(
+                        name, self.format_labels(key[1]), values[key]))
+
+        for name in sorted(set(key[0] for key in histograms.keys())):
+            if name in self.helps:
+                lines.append(u'# HELP {} {}'.format(name, self.helps[name]))
+            lines.append(u'# TYPE {} histogram'.format(name))
+
+            for key in sorted(x for x in histograms.keys() if x[0] == name):
+                buckets, total, count = histograms[key]
+
+                cumulated = 0
+                for bound, value in zip(self.BUCKETS, buckets):
+                    cumulated += value
+                    lines.append(u'{}_bucket{} {}'.format(
+                        name,
+                        self.format_labels(key[1], (('le', bound),)),
+                        cumulated))
+
+                lines.append(u'{}_bucket{} {}'.format(
+                    name,
+                    self.format_labels(key[1], (('le', '+Inf'),)),
+                    count))
+                lines.append(u'{}_sum{} {}'.format(
+                    name, self.format_labels(key[1]), total))
+                lines.append(u'{}_count{} {}'.format(
+                    name, self.format_labels(key[1]), count))
+
+        return u'\n'.join(lines) + u'\n'
+
+    def serve(self, port=9100, host='127.0.0.1'):
+        """
+        Serves metrics over HTTP, in a separate thread
+
+        :param port: the port to listen to
+        :type port: ``int``
+
+        :param host: the address to listen to
+        :type host: ``str``
+
+        :return: the running server
+        :rtype: ``BaseHTTPServer.HTTPServer``
+
+        """
+
+        registry = self
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logging.debug(format % args)
+
+        server = BaseHTTPServer.HTTPServer((host, port), Handler)
+
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        logging.info("Serving metrics on http://{}:{}/metrics".format(
+            host, server.server_port))
+        return server
+
+
+# the metrics of the pump, shared by all modules
+#
+registry = Registry()
+
+registry.describe('mcp_api_calls_total',
+                  'Calls to the API, per region, resource and status')
+registry.describe('mcp_api_seconds',
+                  'Duration of calls to the API, per region and resource')
+registry.describe('mcp_rows_parsed_total',
+                  'Records parsed from CSV reports, per region')
+registry.describe('mcp_node_lookups_total',
+                  'Lookups of node details, per region and result')
+registry.describe('mcp_records_written_total',
+                  'Records passed to updaters, per updater and report')
+registry.describe('mcp_write_seconds',
+                  'Duration of updater calls, per updater')
+registry.describe('mcp_updater_errors_total',
+                  'Updater calls that failed, timed out or were spooled')
+registry.describe('mcp_queue_depth',
+                  'Items waiting in front of a stage of the pipeline')
+registry.describe('mcp_stage_items_total',
+                  'Items processed by a stage of the pipeline')
+registry.describe('mcp_errors_total',
+                  'Pulls and ticks that have failed, per region')
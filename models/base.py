@@ -15,6 +15,35 @@
 
 import logging
 import os
+import threading
+
+from breaker import CircuitBreaker
+from spool import Spool
+
+
+class StoreError(Exception):
+    """
+    Signals that the store of an updater cannot be reached
+
+    Updaters raise this error instead of dropping data, so that data is
+    kept in a spool until the store is back.
+    """
+
+    def __init__(self, message, items=None):
+        """
+        Describes the error
+
+        :param message: the description of the error
+        :type message: ``str``
+
+        :param items: data that has not been saved, headers first, if part
+            of it has been saved already
+        :type items: ``list``
+
+        """
+
+        super(StoreError, self).__init__(message)
+        self.items = items
 
 
 class Updater(object):
@@ -29,10 +58,29 @@ class Updater(object):
         :param settings: the parameters for this updater
         :type settings: ``dict``
 
+        When the store fails several times in a row, data is saved in a
+        spool on disk, and the store is left alone for some time. When the
+        store is back, the spool is replayed at a controlled rate. This can
+        be set for every updater in the configuration file, like this::
+
+            elastic = {
+                'breaker_failures': 3,
+                'breaker_reset': 60,
+                'spool': './cache/spool-elastic.jsonl.gz',
+                'spool_rate': 10,
+            }
+
         """
 
         self.settings = settings
 
+        self.breaker = CircuitBreaker(
+            failures=settings.get('breaker_failures', 3),
+            reset=settings.get('breaker_reset', 60))
+
+        self._spool = None
+        self._drainer = None
+
     def get(self, label, default=None):
         """
         Gets some settings
@@ -59,6 +107,158 @@ class Updater(object):
 
         return value
 
+    def get_spool(self):
+        """
+        Provides the spool of this updater
+
+        :return: the spool where data is kept while the store is down
+        :rtype: ``Spool``
+        """
+
+        if self._spool is None:
+            path = self.settings.get(
+                'spool',
+                './cache/spool-{}.jsonl.gz'.format(
+                    self.__class__.__name__.lower()))
+            self._spool = Spool(path)
+
+        return self._spool
+
+    def get_spool_stats(self):
+        """
+        Reports on the spool of this updater
+
+        :return: statistics of the spool, or `None` if it has not been used
+        :rtype: ``dict``
+        """
+
+        if self._spool is None:
+            return None
+
+        stats = self._spool.get_stats()
+        stats['breaker'] = self.breaker.state
+        return stats
+
+    def deliver(self, label, items=[], region='dd-eu', account=None):
+        """
+        Passes data to the store, or to the spool
+
+        :param label: the function to use, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param items: the data to save
+        :type items: ``list``
+
+        :param region: source of the information, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
+        :return: `True` if data has been saved in the store, else `False`
+        :rtype: ``bool``
+
+        """
+
+        if not self.breaker.allow():
+            self.get_spool().append(label, items, region, account)
+            return False
+
+        try:
+            getattr(self, label)(list(items), region,
+                                 **self.get_tags(account))
+
+        except StoreError as feedback:
+            logging.warning("- spooling {} for {}".format(label, region))
+            logging.debug(feedback)
+            self.breaker.fail()
+            self.get_spool().append(label, feedback.items or items, region,
+                                    account)
+            return False
+
+        self.breaker.succeed()
+
+        if not self.get_spool().is_empty():
+            self.drain_spool()
+
+        return True
+
+    def drain_spool(self):
+        """
+        Replays the spool in the background
+        """
+
+        if self._drainer is not None and self._drainer.is_alive():
+            return
+
+        self._drainer = threading.Thread(
+            target=self.get_spool().drain,
+            args=(self.replay, self.settings.get('spool_rate', 10)))
+        self._drainer.daemon = True
+        self._drainer.start()
+
+    def replay(self, label, items=[], region='dd-eu', account=None):
+        """
+        Passes data from the spool to the store
+
+        :param label: the function to use, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param items: the data to save
+        :type items: ``list``
+
+        :param region: source of the information, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
+        :return: `False` if the store has failed, else `True`
+        :rtype: ``bool``
+
+        Data that cannot be saved for other reasons is dropped, so that it
+        does not block the spool.
+        """
+
+        if not self.breaker.allow():
+            return False
+
+        try:
+            getattr(self, label)(list(items), region,
+                                 **self.get_tags(account))
+
+        except StoreError as feedback:
+            logging.debug(feedback)
+            self.breaker.fail()
+            return False
+
+        except Exception as feedback:
+            logging.warning("- dropping spooled {} for {}".format(
+                label, region))
+            logging.exception(feedback)
+
+        self.breaker.succeed()
+        return True
+
+    def get_tags(self, account=None):
+        """
+        Provides the account of records, if any
+
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
+        :return: keyword arguments of update functions
+        :rtype: ``dict``
+
+        Records of a single account are not tagged, so that updaters that
+        do not know about accounts still work in that case.
+        """
+
+        if account:
+            return {'account': account}
+
+        return {}
+
     def use_store(self):
         """
         Opens an existing store before updating it
@@ -77,7 +277,7 @@ class Updater(object):
         """
         logging.debug(u"- no code to close store")
 
-    def update_summary_usage(self, items=[], region='dd-eu'):
+    def update_summary_usage(self, items=[], region='dd-eu', account=None):
         """
         Updates detailed usage records
 
@@ -87,6 +287,9 @@ class Updater(object):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         Items provided have the following structure:
         - DAY
         - Location
@@ -119,7 +322,7 @@ class Updater(object):
         """
         logging.debug(u"- no code to update summary usage")
 
-    def update_detailed_usage(self, items=[], region='dd-eu'):
+    def update_detailed_usage(self, items=[], region='dd-eu', account=None):
         """
         Updates detailed usage records
 
@@ -129,6 +332,9 @@ class Updater(object):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         Items provided have more or less the following structure:
         - Name
         - UUID
@@ -165,7 +371,7 @@ class Updater(object):
         """
         logging.debug(u"- no code to update detailed usage")
 
-    def update_audit_log(self, items=[], region='dd-eu'):
+    def update_audit_log(self, items=[], region='dd-eu', account=None):
         """
         Updates audit log records
 
@@ -175,6 +381,9 @@ class Updater(object):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         Items provided have the following structure:
         - UUID
         - Time
@@ -191,7 +400,7 @@ class Updater(object):
         """
         logging.debug(u"- no code to update audit log")
 
-    def on_servers(self, updates=[], region='dd-eu'):
+    def on_servers(self, updates=[], region='dd-eu', account=None):
         """
         Signals the deployment, start or reboot of cloud servers
 
@@ -201,6 +410,9 @@ class Updater(object):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         Items provided have following named attributes:
         - 'name' - node name
         - 'id' - node unique id
@@ -210,6 +422,7 @@ class Updater(object):
         - 'public_ip' - node public ip address, or None
         - 'description' - node description, or None
         - 'region' - region where the node belongs
+        - 'account' - the MCP account, if there are several
         - 'sourceImageId' - unique id of the image used for this node
         - 'networkDomainId' - unique id of the network domain of this node
         - 'datacenterId' - unique id of the data centre of this node
@@ -15,7 +15,7 @@
 
 import logging
 import os
-from base import Updater
+from base import StoreError, Updater
 from elasticsearch import Elasticsearch, ConnectionError
 
 
@@ -62,7 +62,7 @@ class ElasticUpdater(Updater):
 
         return self.db
 
-    def update_summary_usage(self, items=[], region='dd-eu'):
+    def update_summary_usage(self, items=[], region='dd-eu', account=None):
         """
         Updates summary usage records
 
@@ -72,6 +72,9 @@ class ElasticUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
         if len(items) > 0:
@@ -79,7 +82,7 @@ class ElasticUpdater(Updater):
             logging.debug("- headers: {}".format(headers))
 
         updated = 0
-        for item in items:
+        for index, item in enumerate(items):
 
             if len(item[1]) < 1:
                 continue
@@ -116,23 +119,29 @@ class ElasticUpdater(Updater):
                     "Advanced Monitoring Hours": int(item[26]),
                 }
 
+            if account:
+                measurement['account'] = account
+
             try:
                 result = self.db.index(index="mcp-watch",
                                        doc_type='summary',
                                        body=measurement)
                 updated += 1
 
+            except ConnectionError as feedback:
+                logging.error('- unable to reach elasticsearch')
+                raise StoreError(str(feedback), [headers] + items[index:])
+
             except Exception as feedback:
                 logging.error('- unable to update elasticsearch')
                 logging.debug(feedback)
-                return
 
         if updated:
             logging.info(
                 "- stored {} measurements for {} in elasticsearch".format(
                     updated, region))
 
-    def update_detailed_usage(self, items=[], region='dd-eu'):
+    def update_detailed_usage(self, items=[], region='dd-eu', account=None):
         """
         Updates detailed usage records
 
@@ -142,6 +151,9 @@ class ElasticUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         Note that headers can change dynamically, so it is important to map
         them appropriately.
 
@@ -152,7 +164,7 @@ class ElasticUpdater(Updater):
             logging.debug("- headers: {}".format(headers))
 
         updated = 0
-        for item in items:
+        for index, item in enumerate(items):
 
             if len(item[2]) < 1:  # no type (e.g., total line)
                 continue
@@ -198,23 +210,29 @@ class ElasticUpdater(Updater):
                     }
                 doc_type = 'detailed-global'
 
+            if account:
+                measurement['account'] = account
+
             try:
                 result = self.db.index(index="mcp-watch",
                                        doc_type=doc_type,
                                        body=measurement)
                 updated += 1
 
+            except ConnectionError as feedback:
+                logging.error('- unable to reach elasticsearch')
+                raise StoreError(str(feedback), [headers] + items[index:])
+
             except Exception as feedback:
                 logging.error('- unable to update elasticsearch')
                 logging.debug(feedback)
-                return
 
         if updated:
             logging.info(
                 "- stored {} measurements for {} in elasticsearch".format(
                     updated, region))
 
-    def update_audit_log(self, items=[], region='dd-eu'):
+    def update_audit_log(self, items=[], region='dd-eu', account=None):
         """
         Updates audit log records
 
@@ -224,6 +242,9 @@ class ElasticUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
         if len(items) > 0:
@@ -231,7 +252,7 @@ class ElasticUpdater(Updater):
             logging.debug("- headers: {}".format(headers))
 
         updated = 0
-        for item in items:
+        for index, item in enumerate(items):
 
             measurement = {
                     "measurement": 'Audit log',
@@ -248,23 +269,29 @@ class ElasticUpdater(Updater):
                     "stamp": item[1],
                 }
 
+            if account:
+                measurement['account'] = account
+
             try:
                 result = self.db.index(index="mcp-watch",
                                        doc_type='audit',
                                        body=measurement)
                 updated += 1
 
+            except ConnectionError as feedback:
+                logging.error('- unable to reach elasticsearch')
+                raise StoreError(str(feedback), [headers] + items[index:])
+
             except Exception as feedback:
                 logging.error('- unable to update elasticsearch')
                 logging.debug(feedback)
-                return
 
         if updated:
             logging.info(
                 "- stored {} measurements for {} in elasticsearch".format(
                     updated, region))
 
-    def on_servers(self, updates=[], region='dd-eu'):
+    def on_servers(self, updates=[], region='dd-eu', account=None):
         """
         Signals the deployment, start or reboot of cloud servers
 
@@ -274,10 +301,13 @@ class ElasticUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
         updated = 0
-        for item in updates:
+        for index, item in enumerate(updates):
             updated += 1
 
             try:
@@ -285,10 +315,13 @@ class ElasticUpdater(Updater):
                                        doc_type='server',
                                        body=item)
 
+            except ConnectionError as feedback:
+                logging.error('- unable to reach elasticsearch')
+                raise StoreError(str(feedback), updates[index:])
+
             except Exception as feedback:
                 logging.error('- unable to update elasticsearch')
                 logging.debug(feedback)
-                return
 
         if updated:
             logging.info(
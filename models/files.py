@@ -13,6 +13,9 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import errno
+import fcntl
+import glob
 import logging
 import os
 from base import Updater
@@ -23,54 +26,108 @@ class FilesUpdater(Updater):
     Updates files
     """
 
-    def get_summary_usage_file(self):
-        return self.settings.get('summary_usage', './logs/summary_usage.log')
+    def get_summary_usage_file(self, account=None):
+        return self.get_file('summary_usage', './logs/summary_usage.log',
+                             account)
 
-    def get_detailed_usage_file(self):
-        return self.settings.get('detailed_usage', './logs/detailed_usage.log')
+    def get_detailed_usage_file(self, account=None):
+        return self.get_file('detailed_usage', './logs/detailed_usage.log',
+                             account)
 
-    def get_audit_log_file(self):
-        return self.settings.get('audit_log', './logs/audit_log.log')
+    def get_audit_log_file(self, account=None):
+        return self.get_file('audit_log', './logs/audit_log.log', account)
+
+    def get_file(self, label, default, account=None):
+        """
+        Provides the file of some report
+
+        :param label: the name of the report, e.g., 'audit_log'
+        :type label: ``str``
+
+        :param default: the file used if none has been set
+        :type default: ``str``
+
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
+        :return: the path of the file
+        :rtype: ``str``
+
+        Files are not tagged, so every account has its own files, e.g.,
+        './logs/audit_log-acme.log' for the account 'acme'.
+        """
+
+        path = self.settings.get(label, default)
+        if account:
+            root, extension = os.path.splitext(path)
+            path = u'{}-{}{}'.format(root, account, extension)
+
+        return path
+
+    def get_files(self, label, default):
+        """
+        Lists files of some report, for all accounts
+
+        :param label: the name of the report, e.g., 'audit_log'
+        :type label: ``str``
+
+        :param default: the file used if none has been set
+        :type default: ``str``
+
+        :return: the file of the report, and files of accounts that exist
+        :rtype: ``list`` of ``str``
+
+        """
+
+        path = self.get_file(label, default)
+        root, extension = os.path.splitext(path)
+        return [path] + sorted(glob.glob(u'{}-*{}'.format(root, extension)))
 
     def reset_store(self):
         """
-        Opens a database for points
+        Truncates log files, including files of accounts
         """
 
         logging.info('Truncating log files')
 
-        file = self.get_summary_usage_file()
-        try:
-            logging.debug('- {}'.format(file))
+        for label in ('summary_usage', 'detailed_usage', 'audit_log'):
+            default = './logs/{}.log'.format(label)
+            for file in self.get_files(label, default):
+                try:
+                    logging.debug('- {}'.format(file))
 
-            with open(file, 'w') as handle:
-                handle.truncate()
+                    with open(file, 'w') as handle:
+                        handle.truncate()
 
-        except:
-            logging.warning("could not truncate {}".format(file))
+                except:
+                    logging.warning("could not truncate {}".format(file))
 
-        file = self.get_detailed_usage_file()
-        try:
-            logging.debug('- {}'.format(file))
 
-            with open(file, 'w') as handle:
-                handle.truncate()
+    def append(self, handle, items):
+        """
+        Appends records to some file
 
-        except:
-            logging.warning("could not truncate {}".format(file))
+        :param handle: the file opened for writing
+        :type handle: ``file``
 
-        file = self.get_audit_log_file()
-        try:
-            logging.debug('- {}'.format(file))
+        :param items: records to be written, one per line
+        :type items: ``list`` of ``list``
 
-            with open(file, 'w') as handle:
-                handle.truncate()
+        Records are written at once, under an exclusive lock, so that lines
+        of concurrent writers are not mixed in the file.
+        """
 
-        except:
-            logging.warning("could not truncate {}".format(file))
+        if len(items) < 1:
+            return
 
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            handle.write(''.join(str(item)+'\n' for item in items))
+            handle.flush()
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
 
-    def update_summary_usage(self, items=[], region='dd-eu'):
+    def update_summary_usage(self, items=[], region='dd-eu', account=None):
         """
         Updates summary usage records
 
@@ -80,9 +137,12 @@ class FilesUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
-        file = self.get_summary_usage_file()
+        file = self.get_summary_usage_file(account)
         try:
             logging.debug("- logging into {}".format(file))
 
@@ -105,8 +165,7 @@ class FilesUpdater(Updater):
                     headers = items.pop(0)
                     logging.debug("- headers: {}".format(headers))
 
-                for item in items:
-                    handle.write(str(item)+'\n')
+                self.append(handle, items)
 
             logging.info("- logged {} measurements for {}".format(
                 len(items), region))
@@ -115,7 +174,7 @@ class FilesUpdater(Updater):
             logging.warning("- could not update {}".format(file))
 
 
-    def update_detailed_usage(self, items=[], region='dd-eu'):
+    def update_detailed_usage(self, items=[], region='dd-eu', account=None):
         """
         Updates detailed usage records
 
@@ -125,9 +184,12 @@ class FilesUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
-        file = self.get_detailed_usage_file()
+        file = self.get_detailed_usage_file(account)
         try:
             logging.debug("- logging into {}".format(file))
 
@@ -150,8 +212,7 @@ class FilesUpdater(Updater):
                     headers = items.pop(0)
                     logging.debug("- headers: {}".format(headers))
 
-                for item in items:
-                    handle.write(str(item)+'\n')
+                self.append(handle, items)
 
             logging.info("- logged {} measurements for {}".format(
                 len(items), region))
@@ -159,7 +220,7 @@ class FilesUpdater(Updater):
         except:
             logging.warning("- could not update {}".format(file))
 
-    def update_audit_log(self, items=[], region='dd-eu'):
+    def update_audit_log(self, items=[], region='dd-eu', account=None):
         """
         Updates audit log records
 
@@ -169,9 +230,12 @@ class FilesUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
-        file = self.get_audit_log_file()
+        file = self.get_audit_log_file(account)
         try:
             logging.debug("- logging into {}".format(file))
 
@@ -194,8 +258,7 @@ class FilesUpdater(Updater):
                     headers = items.pop(0)
                     logging.debug("- headers: {}".format(headers))
 
-                for item in items:
-                    handle.write(str(item)+'\n')
+                self.append(handle, items)
 
             logging.info("- logged {} measurements for {}".format(
                 len(items), region))
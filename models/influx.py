@@ -15,8 +15,10 @@
 
 import logging
 import os
-from base import Updater
+from base import StoreError, Updater
 from influxdb import InfluxDBClient
+from influxdb.exceptions import InfluxDBServerError
+from requests import ConnectionError
 
 
 class InfluxdbUpdater(Updater):
@@ -56,7 +58,7 @@ class InfluxdbUpdater(Updater):
         self.db.create_database(self.settings.get('database', 'mcp'))
         return self.db
 
-    def update_summary_usage(self, items=[], region='dd-eu'):
+    def update_summary_usage(self, items=[], region='dd-eu', account=None):
         """
         Updates summary usage records
 
@@ -66,6 +68,9 @@ class InfluxdbUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
         measurements = []
@@ -117,6 +122,9 @@ class InfluxdbUpdater(Updater):
 
 #            print measurement
 
+            if account:
+                measurement['tags']['account'] = account
+
             measurements.append(measurement)
 
         try:
@@ -125,11 +133,15 @@ class InfluxdbUpdater(Updater):
             logging.info("- stored {} measurements for {} in influxdb".format(
                 len(measurements), region))
 
-        except Error as feedback:
+        except (ConnectionError, InfluxDBServerError) as feedback:
+            logging.warning('- unable to reach influxdb')
+            raise StoreError(str(feedback))
+
+        except Exception as feedback:
             logging.warning('- unable to update influxdb')
             logging.warning(str(feedback))
 
-    def update_detailed_usage(self, items=[], region='dd-eu'):
+    def update_detailed_usage(self, items=[], region='dd-eu', account=None):
         """
         Updates detailed usage records
 
@@ -139,6 +151,9 @@ class InfluxdbUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         Note that headers can change dynamically, so it is important to map
         them appropriately.
 
@@ -209,6 +224,9 @@ class InfluxdbUpdater(Updater):
 
 #            print measurement
 
+            if account:
+                measurement['tags']['account'] = account
+
             measurements.append(measurement)
 
         try:
@@ -217,11 +235,15 @@ class InfluxdbUpdater(Updater):
             logging.info("- stored {} measurements for {} in influxdb".format(
                 len(measurements), region))
 
-        except Error as feedback:
+        except (ConnectionError, InfluxDBServerError) as feedback:
+            logging.warning('- unable to reach influxdb')
+            raise StoreError(str(feedback))
+
+        except Exception as feedback:
             logging.warning('- unable to update influxdb')
             logging.warning(str(feedback))
 
-    def update_audit_log(self, items=[], region='dd-eu'):
+    def update_audit_log(self, items=[], region='dd-eu', account=None):
         """
         Updates audit log records
 
@@ -231,6 +253,9 @@ class InfluxdbUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
         measurements = []
@@ -263,6 +288,9 @@ class InfluxdbUpdater(Updater):
 
 #            print measurement
 
+            if account:
+                measurement['tags']['account'] = account
+
             measurements.append(measurement)
 
         try:
@@ -271,6 +299,10 @@ class InfluxdbUpdater(Updater):
             logging.info("- stored {} measurements for {} in influxdb".format(
                 len(measurements), region))
 
+        except (ConnectionError, InfluxDBServerError) as feedback:
+            logging.warning('- unable to reach influxdb')
+            raise StoreError(str(feedback))
+
         except Exception as feedback:
             logging.warning('- unable to update influxdb')
             logging.warning(str(feedback))
@@ -34,7 +34,7 @@ class QualysUpdater(Updater):
 
     """
 
-    def on_servers(self, updates=[], region='dd-eu'):
+    def on_servers(self, updates=[], region='dd-eu', account=None):
         """
         Signals the deployment, start or reboot of cloud servers
 
@@ -44,6 +44,9 @@ class QualysUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
         # access the qualys API directly
@@ -77,7 +77,7 @@ class SparkUpdater(Updater):
             logging.error(u"Unable to close Cisco Spark")
             logging.exception(feedback)
 
-    def on_servers(self, updates=[], region='dd-eu'):
+    def on_servers(self, updates=[], region='dd-eu', account=None):
         """
         Signals the deployment, start or reboot of cloud servers
 
@@ -87,6 +87,9 @@ class SparkUpdater(Updater):
         :param region: source of the information, e.g., 'dd-eu' or other region
         :type region: ``str``
 
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
         """
 
         count = 0
@@ -0,0 +1,263 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from six.moves.queue import Queue
+import threading
+import time
+
+from metrics import registry as metrics
+
+
+class Stage(object):
+    """
+    Processes items with some threads
+
+    The function of a stage takes one item and provides an iterator of items
+    for the next stage, or `None` for the last stage.
+    """
+
+    def __init__(self, name, function, workers=1, depth=4):
+        """
+        Sets a new stage
+
+        :param name: the name of the stage, e.g., 'fetch'
+        :type name: ``str``
+
+        :param function: the processing of one item
+        :type function: ``callable``
+
+        :param workers: threads running at once for this stage
+        :type workers: ``int``
+
+        :param depth: items waiting at most in front of this stage
+        :type depth: ``int``
+
+        """
+
+        self.name = name
+        self.function = function
+        self.workers = max(1, workers)
+
+        self.queue = Queue(maxsize=max(1, depth))
+
+        self.lock = threading.Lock()
+        self.running = 0
+
+        self.received = 0
+        self.provided = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.deepest = 0
+
+    def get_stats(self, elapsed):
+        """
+        Reports on the activity of this stage
+
+        :param elapsed: seconds since the beginning of the pipeline
+        :type elapsed: ``float``
+
+        :return: items received and provided, errors, current and maximum
+            depth of the input queue, items per second, and the share of
+            time that workers have been busy
+        :rtype: ``dict``
+        """
+
+        return {
+            'received': self.received,
+            'provided': self.provided,
+            'errors': self.errors,
+            'depth': self.queue.qsize(),
+            'deepest': self.deepest,
+            'rate': round(self.received / max(elapsed, 0.001), 1),
+            'busy': round(self.busy / max(elapsed * self.workers, 0.001), 2),
+        }
+
+
+class Pipeline(object):
+    """
+    Chains stages with bounded queues
+
+    Every stage has its own threads, and passes items to the next stage
+    through a queue of limited size. When a stage falls behind, its queue
+    fills up, and the previous stage waits, and so on up to the first
+    stage. Memory use is bounded, and the stage that is the bottleneck is
+    the one that is the most busy.
+    """
+
+    def __init__(self, depth=4, name='pipeline'):
+        """
+        Sets a new pipeline
+
+        :param depth: items waiting at most in front of every stage
+        :type depth: ``int``
+
+        :param name: the name of the pipeline in metrics, e.g., 'dd-eu'
+        :type name: ``str``
+
+        """
+
+        self.depth = depth
+        self.name = name
+        self.stages = []
+        self.failures = []
+
+        self.start = None
+        self.lock = threading.Lock()
+
+    def add_stage(self, name, function, workers=1):
+        """
+        Appends a stage to the pipeline
+
+        :param name: the name of the stage, e.g., 'fetch'
+        :type name: ``str``
+
+        :param function: the processing of one item
+        :type function: ``callable``
+
+        :param workers: threads running at once for this stage
+        :type workers: ``int``
+
+        """
+
+        self.stages.append(Stage(name, function, workers, self.depth))
+
+    def run(self, items):
+        """
+        Processes items through all stages
+
+        :param items: the input of the first stage
+        :type items: ``list``
+
+        :return: failed items, with the name of the stage
+        :rtype: ``list`` of ``tuple``
+
+        This waits until all items have gone through the pipeline.
+        """
+
+        assert len(self.stages) > 0
+
+        self.start = time.time()
+        self.failures = []
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            stage.running = stage.workers
+            for count in range(stage.workers):
+                thread = threading.Thread(target=self.work, args=(index,))
+                thread.daemon = True
+                thread.start()
+                threads.append(thread)
+
+        first = self.stages[0]
+        for item in items:
+            self.put(first, item)
+
+        for count in range(first.workers):
+            first.queue.put(None)
+
+        for thread in threads:
+            thread.join()
+
+        return self.failures
+
+    def put(self, stage, item):
+        """
+        Passes an item to some stage, and waits if it is busy
+        """
+
+        stage.queue.put(item)
+        size = stage.queue.qsize()
+        if size > stage.deepest:
+            stage.deepest = size
+
+        metrics.set_gauge('mcp_queue_depth', size,
+                          pipeline=self.name, stage=stage.name)
+
+    def work(self, index):
+        """
+        Processes items of some stage until the end of its input
+        """
+
+        stage = self.stages[index]
+        following = self.stages[index+1] if index+1 < len(self.stages) else None
+
+        while True:
+            item = stage.queue.get()
+            if item is None:
+                break
+
+            start = time.time()
+            with stage.lock:
+                stage.received += 1
+            metrics.increment('mcp_stage_items_total',
+                              pipeline=self.name, stage=stage.name)
+
+            try:
+                outputs = stage.function(item)
+                for output in (outputs or []):
+                    with stage.lock:
+                        stage.provided += 1
+
+                    if following is not None:
+                        with stage.lock:  # time blocked is not busy time
+                            stage.busy += time.time() - start
+                        self.put(following, output)
+                        start = time.time()
+
+            except Exception as feedback:
+                logging.error("- {} has failed".format(stage.name))
+                logging.exception(feedback)
+                with stage.lock:
+                    stage.errors += 1
+                with self.lock:
+                    self.failures.append((stage.name, item))
+
+            with stage.lock:
+                stage.busy += time.time() - start
+
+        with stage.lock:  # last worker signals the end to the next stage
+            stage.running -= 1
+            last = (stage.running == 0)
+
+        if last and following is not None:
+            for count in range(following.workers):
+                following.queue.put(None)
+
+    def get_stats(self):
+        """
+        Reports on all stages
+
+        :return: statistics per stage
+        :rtype: ``dict``
+        """
+
+        elapsed = time.time() - (self.start or time.time())
+        return dict((stage.name, stage.get_stats(elapsed))
+                    for stage in self.stages)
+
+    def get_bottleneck(self):
+        """
+        Finds the stage that limits the pipeline
+
+        :return: the name of the most busy stage, or `None`
+        :rtype: ``str``
+        """
+
+        stats = self.get_stats()
+        if not stats:
+            return None
+
+        return max(stats.keys(), key=lambda name: stats[name]['busy'])
@@ -0,0 +1,219 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cProfile
+import errno
+import logging
+import os
+import signal
+import time
+
+try:
+    import tracemalloc  # python 3 only
+except ImportError:
+    tracemalloc = None
+
+
+class Profiler(object):
+    """
+    Profiles worker processes
+
+    Every worker runs under ``cProfile``, and under ``tracemalloc`` where
+    available. Statistics are written to a folder periodically, and each
+    time the process receives SIGUSR1, e.g., with ``kill -USR1 <pid>``:
+
+    - ``<worker>-<pid>.pstats`` has cumulated CPU statistics, to be read
+      with ``pstats`` or ``snakeviz``
+    - ``<worker>-<pid>-<time>-<n>.txt`` lists the top allocations of memory
+
+    The period is measured in CPU time of the process, with SIGPROF, and
+    not in wall time, with SIGALRM. A process that waits for the network
+    consumes no CPU time, so the timer does not interrupt its reads of
+    sockets, and profiling does not change the behaviour of the worker.
+
+    This is activated with ``--profile`` on the command line, and can be
+    set in the configuration file, like this::
+
+        pump = {
+            'profile': './profiles',
+            'profile_interval': 300,
+            'profile_top': 25,
+        }
+
+    """
+
+    def __init__(self, folder='./profiles', interval=300, top=25):
+        """
+        Sets a new profiler
+
+        :param folder: where statistics are written
+        :type folder: ``str``
+
+        :param interval: seconds of CPU time between two snapshots, or 0
+        :type interval: ``int``
+
+        :param top: number of allocations listed in snapshots
+        :type top: ``int``
+
+        """
+
+        self.folder = folder
+        self.interval = interval
+        self.top = top
+
+        self.name = None
+        self.profile = None
+        self.snapshots = 0
+
+    @classmethod
+    def from_settings(cls, settings={}):
+        """
+        Builds a profiler out of the configuration file
+
+        :param settings: the parameters of the pump, e.g., ``config.pump``
+        :type settings: ``dict``
+
+        :return: a new profiler, or `None` if profiling is off
+        :rtype: ``Profiler``
+
+        """
+
+        folder = settings.get('profile')
+        if not folder:
+            return None
+
+        if folder is True:
+            folder = './profiles'
+
+        return cls(folder=folder,
+                   interval=settings.get('profile_interval', 300),
+                   top=settings.get('profile_top', 25))
+
+    def wrap(self, kind, function):
+        """
+        Profiles the function of some worker
+
+        :param kind: the type of worker, e.g., 'day' or 'minute'
+        :type kind: ``str``
+
+        :param function: the function ran by the worker, with queue and
+            region as first parameters
+        :type function: ``callable``
+
+        :return: a function with the same parameters
+        :rtype: ``callable``
+
+        """
+
+        def profiled(queue, region, *args):
+            return self.run('{}-{}'.format(kind, region),
+                            function, queue, region, *args)
+
+        return profiled
+
+    def run(self, name, function, *args):
+        """
+        Runs a function under profilers
+
+        :param name: the name of statistics files, e.g., 'day-dd-eu'
+        :type name: ``str``
+
+        :param function: the function to run
+        :type function: ``callable``
+
+        This is expected to run in the main thread of a process, so that
+        signals can be received.
+        """
+
+        try:
+            os.makedirs(self.folder)
+        except OSError as feedback:  # prevent race condition
+            if feedback.errno != errno.EEXIST:
+                raise
+
+        self.name = '{}-{}'.format(name, os.getpid())
+        self.profile = cProfile.Profile()
+
+        if tracemalloc is not None:
+            tracemalloc.start()
+
+        handlers = {}
+        for signum in (signal.SIGUSR1, signal.SIGPROF):
+            handlers[signum] = signal.signal(signum, self.on_signal)
+            signal.siginterrupt(signum, False)  # restart system calls
+
+        if self.interval:
+            signal.setitimer(signal.ITIMER_PROF,
+                             self.interval, self.interval)
+
+        logging.info("Profiling {} in {}".format(self.name, self.folder))
+        try:
+            return self.profile.runcall(function, *args)
+
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+            self.snapshot(resume=False)
+            if tracemalloc is not None:
+                tracemalloc.stop()
+
+    def on_signal(self, signum, frame):
+        """
+        Writes statistics when a signal is received
+        """
+
+        self.snapshot()
+
+    def snapshot(self, resume=True):
+        """
+        Writes statistics of the current process
+
+        :param resume: if profiling goes on after the snapshot
+        :type resume: ``bool``
+
+        """
+
+        path = os.path.join(self.folder, self.name + '.pstats')
+        try:
+            self.profile.dump_stats(path)  # this stops the profiler
+
+        except Exception as feedback:
+            logging.warning("- unable to write {}".format(path))
+            logging.debug(feedback)
+
+        finally:
+            if resume:
+                self.profile.enable()
+
+        if tracemalloc is None or not tracemalloc.is_tracing():
+            return
+
+        self.snapshots += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.folder, '{}-{}-{}.txt'.format(
+            self.name, stamp, self.snapshots))
+
+        statistics = tracemalloc.take_snapshot().statistics('lineno')
+        with open(path, 'w') as handle:
+            current, peak = tracemalloc.get_traced_memory()
+            handle.write("current {:.1f} MB, peak {:.1f} MB\n".format(
+                current / 1048576.0, peak / 1048576.0))
+
+            for statistic in statistics[:self.top]:
+                handle.write("{}\n".format(statistic))
+
+        logging.debug("- profile of {} in {}".format(self.name, path))
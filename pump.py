@@ -15,20 +15,34 @@
 
 import colorlog
 from datetime import date, datetime, timedelta
+import itertools
 import logging
-from multiprocessing import Process, Queue
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
 import os
 import re
 import requests
 from six import string_types
+from six.moves.queue import Empty
 import socket
 import string
 import sys
+import threading
 import time
 import xmltodict
 
+from audit import AuditTail
+from cache import Cache
+from checkpoint import Checkpoint
 import config
 from endpoint import Endpoint
+from executor import Executor
+from limiter import RateLimiter
+from metrics import registry as metrics
+from pipeline import Pipeline
+from profiler import Profiler
+from scheduler import Scheduler
+from supervisor import Supervisor
 
 
 __version__ = '17.4.30'
@@ -46,6 +60,10 @@ class Pump(object):
 
     """
 
+    REPORTS = ('summary_usage', 'detailed_usage', 'audit_log')
+
+    DAY_COLUMNS = ('DAY', 'End Time')  # dates of usage records
+
     def __init__(self, settings={}):
         """
         Ignites the plumbing engine
@@ -68,13 +86,57 @@ class Pump(object):
         self._userPassword = None
 
         self.engines = {}
-        self.dqueues = []
-        self.mqueues = []
+        self.limiters = {}
+        self.supervisor = None
+
+        self._daily = None  # functions of workers
+        self._minutely = None
+
+        self.pruned = {}  # regions without resources, and when checked
+        self.pruned_at = None
 
         self.updaters = []
 
         self.context = {}
 
+        self._fan_out = None
+        self._fan_out_pid = None
+        self._stats_lock = threading.Lock()
+        self.updater_stats = {}
+        self._updater_locks = {}  # one lock per updater and report
+        self._backlogs = {}  # calls not done yet, per updater
+
+        path = settings.get('checkpoint')
+        self.checkpoint = Checkpoint(path) if path else None
+
+    def serve_metrics(self):
+        """
+        Serves metrics of all processes of the pump over HTTP
+
+        :return: the running server, or `None`
+        :rtype: ``BaseHTTPServer.HTTPServer``
+
+        This has to be called before processes are started. Metrics are
+        served in the text format of Prometheus, if a port has been set in
+        the configuration file, like this::
+
+            pump = {
+                'metrics_port': 9100,
+                'metrics_host': '127.0.0.1',
+                'metrics_interval': 5,
+            }
+
+        """
+
+        port = self.settings.get('metrics_port')
+        if not port:
+            return None
+
+        metrics.share(interval=self.settings.get('metrics_interval', 5))
+        return metrics.serve(port=port,
+                             host=self.settings.get('metrics_host',
+                                                    '127.0.0.1'))
+
     def get_user_name(self):
         """
         Retrieves user name to authenticate to the API
@@ -168,48 +230,410 @@ class Pump(object):
         return self.settings.get('regions',
                                  ('dd-af', 'dd-ap', 'dd-au', 'dd-eu', 'dd-na'))
 
+    def get_accounts(self):
+        """
+        Retrieves accounts to be pumped
+
+        :return: the list of accounts, with name, credentials and regions
+        :rtype: ``list`` of ``dict``
+
+        Several accounts can be pumped by the same process, each with its
+        own credentials and regions::
+
+            pump = {
+                'accounts': [
+                    {'name': 'acme',
+                     'MCP_USER': 'acme.watch',
+                     'MCP_PASSWORD': '$ACME_PASSWORD',
+                     'regions': ['dd-eu', 'dd-na']},
+                    {'name': 'globex',
+                     'MCP_USER': 'globex.watch',
+                     'MCP_PASSWORD': '$GLOBEX_PASSWORD'},
+                ],
+            }
+
+        A value that starts with `$` is taken from the environment, and
+        regions of the pump are used for an account that has none. Without
+        accounts, the pump uses its own credentials, and records are not
+        tagged with an account.
+        """
+
+        return self.settings.get('accounts') or [{}]
+
+    def get_credentials(self, account={}):
+        """
+        Retrieves credentials of some account
+
+        :param account: the target account, from ``get_accounts()``
+        :type account: ``dict``
+
+        :return: user name and password
+        :rtype: ``tuple``
+
+        :raises: :class:`Exception`
+            - if no credentials can be found
+
+        """
+
+        if not account.get('name'):
+            return (self.get_user_name(), self.get_user_password())
+
+        credentials = []
+        for label in ('MCP_USER', 'MCP_PASSWORD'):
+            value = account.get(label)
+            if value is not None and str(value)[0] == '$':
+                value = os.getenv(str(value)[1:])
+
+            if value is None or len(value) < 3:
+                raise Exception("Missing {} for account {}".format(
+                    label, account['name']))
+
+            credentials.append(value)
+
+        return tuple(credentials)
+
+    @staticmethod
+    def get_target(region, account=None):
+        """
+        Names the binding of some account to some region
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
+        :return: the key of the engine, e.g., 'dd-eu' or 'acme@dd-eu'
+        :rtype: ``str``
+
+        Engines, workers, tails and checkpoints are keyed by this name,
+        and functions of the pump accept it wherever a region is expected.
+        """
+
+        if account:
+            return u'{}@{}'.format(account, region)
+
+        return region
+
+    @staticmethod
+    def split_target(target):
+        """
+        Finds the account and the region of some binding
+
+        :param target: the key of the engine, e.g., 'acme@dd-eu'
+        :type target: ``str``
+
+        :return: the account, or `None`, and the region
+        :rtype: ``tuple``
+        """
+
+        if '@' in target:
+            account, region = target.split('@', 1)
+            return account, region
+
+        return None, target
+
+    def get_targets(self, region):
+        """
+        Lists bindings of all accounts to some region
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :return: keys of engines, e.g., ['acme@dd-eu', 'globex@dd-eu']
+        :rtype: ``list`` of ``str``
+        """
+
+        return sorted([target for target in self.engines.keys()
+                       if self.split_target(target)[1] == region])
+
+    def get_limiter(self, region):
+        """
+        Provides the limiter of some region
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :return: the limiter shared by all accounts in this region
+        :rtype: ``RateLimiter``
+
+        """
+
+        if region not in self.limiters:
+            self.limiters[region] = RateLimiter.from_settings(self.settings)
+
+        return self.limiters[region]
+
     def set_endpoints(self):
         """
         Sets API endpoints
 
-        This function initializes one endpoint per region.
+        This function initializes one endpoint per account and per region.
+        Regions are bound in parallel, and findings are cached in a file for
+        some time, so that next start of the pump does not wait for the
+        API::
+
+            pump = {
+                'regions_cache': './cache/regions.json',
+                'regions_ttl': 86400,
+            }
+
+        Regions that cannot be accessed are not pumped. Regions where the
+        organisation has no network domain and no server are not pumped
+        either if ``'prune_regions': True`` is set, and these are checked
+        again after ``'regions_ttl'`` seconds, see ``check_regions()``.
+        Note that the usage history of pruned regions is not pumped.
+
+        Endpoints are keyed by account and region, see ``get_target()``.
+        All accounts share the rate limiter of each region, and the
+        connections of each process.
         """
 
         self.engines = {}
+        self.pruned = {}
+        self.pruned_at = time.time()
+
+        regions = Cache(ttl=self.settings.get('regions_ttl', 86400),
+                        path=self.settings.get('regions_cache'))
+        regions.load()
+
+        tasks = []
+        for account in self.get_accounts():
+
+            try:
+                user, password = self.get_credentials(account)
+            except Exception as feedback:
+                if not account.get('name'):
+                    raise
+                logging.warning(feedback)
+                continue
+
+            for region in account.get('regions', self.get_regions()):
+                self.get_limiter(region)  # before threads
+                key = u'{}@{}'.format(user, region)
+                tasks.append((region, account, key, regions.get(key)))
+
+        pool = ThreadPool(max(1, len(tasks)))
+        try:
+            results = pool.map(
+                lambda task: self.bind_region(task[0], task[3], task[1]),
+                tasks)
+        finally:
+            pool.close()
+            pool.join()
+
+        for (region, account, key, known), (engine, findings) in zip(
+                tasks, results):
+
+            if findings is not None:
+                regions.put(key, findings)
+
+            if engine is not None:
+                target = self.get_target(region, account.get('name'))
+                self.engines[target] = engine
+
+            elif findings is not None:
+                self.pruned[key] = (region, account)
+
+        regions.save()
+
+        logging.info("Pumping regions {}".format(
+            ', '.join(sorted(self.engines.keys()))))
+
+    def check_regions(self):
+        """
+        Binds again regions that have been pruned
+
+        :return: targets that have been bound, e.g., ['dd-eu']
+        :rtype: ``list`` of ``str``
+
+        Regions where the organisation had no resource are checked again
+        every ``'regions_ttl'`` seconds, so that the first server of a new
+        region is pumped without a restart.
+        """
+
+        ttl = self.settings.get('regions_ttl', 86400)
+        if not self.pruned or time.time() - self.pruned_at < ttl:
+            return []
+
+        self.pruned_at = time.time()
+
+        regions = Cache(ttl=ttl, path=self.settings.get('regions_cache'))
+        regions.load()
+
+        targets = []
+        for key, (region, account) in sorted(self.pruned.items()):
 
-        for region in self.get_regions():
+            engine, findings = self.bind_region(region, None, account)
+            if findings is not None:
+                regions.put(key, findings)
 
-            self.engines[region] = Endpoint(
-                key=self.get_user_name(),
-                secret=self.get_user_password(),
-                region=region)
+            if engine is not None:
+                logging.info("- resources have been found in {}".format(
+                    region))
+                target = self.get_target(region, account.get('name'))
+                self.engines[target] = engine
+                targets.append(target)
+                del self.pruned[key]
+
+        regions.save()
+        return targets
+
+    def bind_region(self, region, known=None, account={}):
+        """
+        Binds to the API of some region
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param known: findings of a previous run, or `None`
+        :type known: ``dict``
+
+        :param account: the target account, from ``get_accounts()``
+        :type account: ``dict``
+
+        :return: an endpoint or `None`, and findings on this region
+        :rtype: ``tuple``
+
+        Findings have the unique id of the organisation, and a flag that
+        tells if the organisation has resources in the region.
+        """
+
+        prune = self.settings.get('prune_regions', False)
+
+        try:
+            user, password = self.get_credentials(account)
+
+            if known:
+                if prune and not known['footprint']:
+                    logging.debug("- no resource in {}".format(region))
+                    return None, known
+
+                engine = Endpoint(
+                    key=user,
+                    secret=password,
+                    region=region,
+                    orgId=known['orgId'],
+                    settings=self.settings,
+                    account=account.get('name'),
+                    limiter=self.get_limiter(region))
+
+                return engine, known
+
+            engine = Endpoint(
+                key=user,
+                secret=password,
+                region=region,
+                settings=self.settings,
+                account=account.get('name'),
+                limiter=self.get_limiter(region))
+
+            findings = {
+                'orgId': engine.orgId,
+                'footprint': engine.has_footprint() if prune else True,
+            }
+
+            if prune and not findings['footprint']:
+                logging.info("- no resource in {}".format(region))
+                return None, findings
+
+            return engine, findings
+
+        except Exception as feedback:
+            logging.warning("Unable to access region {}".format(region))
+            logging.debug(feedback)
+            return None, None
+
+    def set_lane(self, lane, region=None):
+        """
+        Sets the lane of calls made to the API by this process
+
+        :param lane: 'realtime' or 'backfill'
+        :type lane: ``str``
+
+        :param region: the target region, or `None` for all regions
+        :type region: ``str``
+
+        """
+
+        for target, engine in self.engines.items():
+            if region in (None, self.split_target(target)[1]):
+                engine.lane = lane
 
     def set_workers(self):
         """
         Sets processing workers
 
-        This function creates 2 queues per region, one for the processing
+        This function creates 2 workers per region, one for the processing
         of daily data, and another one for the processing of real-time data.
+        Workers of a region serve all accounts that are bound to it.
+        Workers are processes that are restarted by a supervisor when they
+        die, and that are recycled when they have done many tasks or when
+        they use too much memory. Workers are profiled if ``--profile`` has
+        been set on the command line, see ``Profiler``.
+        """
+
+        self.supervisor = Supervisor(self.settings)
+
+        daily = self.work_every_day
+        minutely = self.work_every_minute
+
+        profiler = Profiler.from_settings(self.settings)
+        if profiler:
+            daily = profiler.wrap('day', daily)
+            minutely = profiler.wrap('minute', minutely)
+
+        self._daily = daily
+        self._minutely = minutely
+
+        regions = set([self.split_target(x)[1] for x in self.engines.keys()])
+        for region in sorted(regions):
+
+            for target in self.get_targets(region):
+                self.context[ target ] = {}
+                self.restore_tail(target)
+
+            self.supervisor.add('day', region, daily)
+
+            self.supervisor.add('minute', region, minutely,
+                                sticky=True)  # current day after a restart
+
+    def add_target(self, target):
+        """
+        Pumps a target that has been bound after workers have been set
+
+        :param target: the target region, e.g., 'dd-eu' or 'acme@dd-eu'
+        :type target: ``str``
+
+        Workers are added for a new region. Else workers of the region are
+        recycled, so that their processes are forked with the new endpoint.
         """
 
-        self.dqueues = []
-        self.mqueues = []
+        region = self.split_target(target)[1]
+
+        self.context[ target ] = {}
+        self.restore_tail(target)
+
+        if [x for x in self.supervisor.workers if x.region == region]:
+            self.supervisor.recycle(region)
+            return
+
+        self.supervisor.add('day', region, self._daily)
+        self.supervisor.add('minute', region, self._minutely, sticky=True)
 
-        for region in self.get_regions():
+    def restore_tail(self, region):
+        """
+        Restores the position in the audit log of some region
 
-            self.context[ region ] = {}
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
 
-            q = Queue()
-            w = Process(target=self.work_every_day, args=(q, region))
-            w.daemon = True
-            w.start()
-            self.dqueues.append(q)
+        """
 
-            q = Queue()
-            w = Process(target=self.work_every_minute, args=(q, region))
-            w.daemon = True
-            w.start()
-            self.mqueues.append(q)
+        if self.checkpoint:
+            cursor = self.checkpoint.get_cursor(region)
+            if cursor:
+                self.get_tail(region).set_state(cursor)
 
     def get_date(self, horizon='90d', since=None):
         """
@@ -268,28 +692,67 @@ class Pump(object):
 
         tail = date.today()
 
-        while head < tail:
-            logging.info("Pumping data for {}".format(head))
-            for queue in self.dqueues:
-                queue.put(head)
-            head += timedelta(days=1)
+        if since is None and self.checkpoint:  # catch up after a restart
+            last = self.checkpoint.get_last_day()
+            if last is not None:
+                head = min(last + timedelta(days=1), tail)
+
+        executor = Executor(self, self.settings)
+
+        tasks = []
+        if head < tail:
+            logging.info("Pumping data from {} to {}".format(
+                head, tail - timedelta(days=1)))
+            done = self.checkpoint.get_done() if self.checkpoint else ()
+            tasks = executor.get_tasks(head, tail - timedelta(days=1),
+                                       sorted(self.engines.keys()),
+                                       done)
+
+        if self.checkpoint:  # skip work done, and resume work not done
+            self.checkpoint.add_tasks(tasks)
+            tasks = [x for x in self.checkpoint.get_pending()
+                     if x[0] in self.engines]
+            logging.info("Resuming {} tasks from checkpoint".format(
+                len(tasks)))
+
+        if tasks:
+            if forever:  # keep on with real-time data in the meantime
+                executor.open()  # fork processes from the main thread
+                worker = threading.Thread(target=executor.run, args=(tasks,))
+                worker.daemon = True
+                worker.start()
 
+            else:
+                executor.run(tasks)
+
+        head = max(head, tail)
+
+        announced = None
         while forever:
 
             if head < tail:
                 logging.info("Pumping data for {}".format(head))
-                for queue in self.dqueues:
-                    queue.put(head)
+                self.supervisor.send('day', head)
                 head += timedelta(days=1)
 
             else:
-                logging.info("Pumping data for one minute")
-                for queue in self.mqueues:
-                    queue.put(head)
-                time.sleep(60)
+                if head != announced:  # minute workers pace themselves
+                    logging.info("Pumping real-time data for {}".format(head))
+                    self.supervisor.send('minute', head)
+                    announced = head
+
+                if self.supervisor.check():
+                    logging.info("- workers: {}".format(
+                        self.supervisor.get_stats()))
+
+                for target in self.check_regions():
+                    self.add_target(target)
+                    announced = None  # to new minute workers as well
+
+                time.sleep(self.settings.get('supervisor_interval', 10))
                 tail = date.today()
 
-    def work_every_day(self, queue, region):
+    def work_every_day(self, queue, region, heart=None):
         """
         Handles data for one day and for one region
 
@@ -299,40 +762,121 @@ class Pump(object):
         :param region: the region to consider
         :type region: `str`
 
+        :param heart: signals to the supervisor, if any
+        :type heart: ``Heartbeat``
+
         This is ran as an independant process, so it works asynchronously
-        from the rest.
+        from the rest. The process ends by itself when it is worn out, and
+        the supervisor starts a fresh one. Calls to the API are made in the
+        backfill lane, so that real-time polls of the region come first.
         """
 
+        self.set_lane('backfill', region)
+
+        interval = self.settings.get('heartbeat', 30)
+
         try:
 
-            for cursor in iter(queue.get, 'STOP'):
-                self.pull(cursor, region)
-                time.sleep(0.5)
+            while True:
+
+                if heart:
+                    heart.beat()
+
+                try:
+                    cursor = queue.get(timeout=interval if heart else None)
+                except Empty:
+                    continue
+
+                if cursor == 'STOP':
+                    break
+
+                for target in self.get_targets(region) or [region]:
+                    self.pull(cursor, target)
+
+                if heart:
+                    heart.count()
+                    if heart.is_worn():
+                        break
 
         except KeyboardInterrupt:
             pass
         except:
             raise
 
-    def work_every_minute(self, queue, region):
+    def work_every_minute(self, queue, region, heart=None):
         """
         Handles data for one minute and for one region
 
-        :param queue: the minute ticks for a given day
+        :param queue: the current day, each time it changes
         :type queue: `Queue`
 
         :param region: the region to consider
         :type region: `str`
 
+        :param heart: signals to the supervisor, if any
+        :type heart: ``Heartbeat``
+
         This is ran as an independant process, so it works asynchronously
-        from the rest.
+        from the rest. Polls are scheduled by the worker itself, more often
+        when there is activity in the region, and less often otherwise.
+        Regions are polled at different moments, so that they do not all
+        call the API at the same time. Every account of the region has its
+        own schedule.
         """
 
+        targets = self.get_targets(region) or [region]
+
+        everything = sorted(self.engines.keys())
+        schedulers = {}
+        for target in targets:
+            index = everything.index(target) if target in everything else 0
+            phase = (self.settings.get('tick_min', 15)
+                     * index / float(max(1, len(everything))))
+            schedulers[target] = Scheduler.from_settings(self.settings,
+                                                         phase=phase)
+
+        if heart:  # the tail may have moved since the supervisor started
+            for target in targets:
+                self.restore_tail(target)
+
+        interval = self.settings.get('heartbeat', 30)
+
         try:
 
-            for cursor in iter(queue.get, 'STOP'):
-                self.tick(cursor, region)
-                time.sleep(0.5)
+            cursor = None
+            while True:
+
+                if heart:
+                    heart.beat()
+
+                try:
+                    delay = min([x.get_delay() for x in schedulers.values()])
+                    timeout = delay if cursor else None
+                    if heart:
+                        timeout = min(timeout, interval) if cursor else interval
+                    message = queue.get(timeout=timeout)
+                    if message == 'STOP':
+                        break
+
+                    cursor = message
+                    continue
+
+                except Empty:
+                    due = [x for x in targets
+                           if schedulers[x].get_delay() <= 0]
+                    if not due or cursor is None:
+                        continue  # heartbeat only
+
+                for target in due:
+                    activity = self.tick(cursor, target)
+                    delay = schedulers[target].advance(activity)
+                    logging.debug("- next tick for {} in {:.0f} seconds".format(
+                        target, delay))
+
+                if heart:
+                    heart.count()
+                    if heart.is_worn():
+                        break
 
         except KeyboardInterrupt:
             pass
@@ -349,59 +893,76 @@ class Pump(object):
         :param region: the target region, e.g., 'dd-eu'
         :type region: ``str``
 
-        """
-
-        try:
-
-            items = self.fetch_summary_usage(on, region)
-            self.update_summary_usage(items, region)
+        Reports flow through a pipeline of stages, that is: fetch from the
+        API, parse into batches, and store with updaters. Stages are joined
+        by bounded queues, so that the network and updaters are used at the
+        same time, and so that fetching slows down when updaters fall
+        behind. Every stage has its own threads, and this can
+        be set in the configuration file, like this::
 
-            items = self.fetch_detailed_usage(on, region)
-            self.update_detailed_usage(items, region)
+            pump = {
+                'pipeline_depth': 4,
+                'fetch_threads': 3,
+                'parse_threads': 1,
+                'store_threads': 2,
+            }
 
-            items = self.fetch_audit_log(on, region)
-            self.update_audit_log(items, region)
+        """
 
-        except socket.error as feedback:
-            logging.warning('Cannot access API endpoint for {}'.format(region))
-            logging.warning('- {}'.format(str(feedback)))
+        updaters = [x for x in self.updaters if x.get('active', False)]
+        if len(updaters) < 1:
+            logging.warning('No updater has been activated')
+            return
 
-        except Exception as feedback:
-            logging.error('Unable to pull for {}'.format(region))
-            logging.exception(feedback)
+        pipeline = Pipeline(depth=self.settings.get('pipeline_depth', 4),
+                            name=region)
 
-    def tick(self, on, region='dd-eu'):
-        """
-        Detects active servers over the past minute for a given region
+        pipeline.add_stage(
+            'fetch',
+            lambda label: self.fetch_stage(label, on, region),
+            self.settings.get('fetch_threads', 3))
 
-        :param on: the current day, e.g., date(2016, 11, 30)
-        :type on: ``date``
+        pipeline.add_stage(
+            'parse',
+            self.parse_stage,
+            self.settings.get('parse_threads', 1))
 
-        :param region: the target region, e.g., 'dd-eu'
-        :type region: ``str``
+        pipeline.add_stage(
+            'store',
+            lambda item: self.store_stage(item, updaters, region),
+            self.settings.get('store_threads', 2))
 
-        """
+        failures = pipeline.run(self.REPORTS)
 
-        try:
+        failed = set()
+        for stage, item in failures:
+            failed.add(item if isinstance(item, string_types) else item[0])
 
-            today = (on + timedelta(days=1))
-            raw = self.fetch_audit_log(today, region)
-            items = self.tail_audit_log(today, raw, region)
-            servers = self.list_active_servers(items, region)
-            self.on_servers(servers, region)
+        for label in self.REPORTS:
+            if label in failed:
+                logging.warning("- failed {} for {} on {}".format(
+                    label, region, on))
+                metrics.increment('mcp_errors_total',
+                                  region=region, task='pull')
 
-        except socket.error as feedback:
-            logging.warning('Cannot access API endpoint for {}'.format(region))
-            logging.warning('- {}'.format(str(feedback)))
+            elif self.checkpoint:
+                self.checkpoint.complete((region, on, label))
 
-        except Exception as feedback:
-            logging.error('Unable to tick for {}'.format(region))
-            logging.exception(feedback)
+        stats = pipeline.get_stats()
+        self.context.setdefault(region, {})['pipeline'] = stats
+        logging.debug("- pipeline for {}: {}, bottleneck is {}".format(
+            region, stats, pipeline.get_bottleneck()))
 
+        engine = self.engines[region]
+        logging.debug("- {} API calls for {}, {} ms on average".format(
+            engine.calls, region, int(engine.get_latency()*1000)))
 
-    def fetch_summary_usage(self, on, region='dd-eu'):
+    def fetch_stage(self, label, on, region='dd-eu'):
         """
-        Fetches and returns summary usage
+        Fetches one report, in chunks of records
+
+        :param label: the type of report, e.g., 'summary_usage'
+        :type label: ``str``
 
         :param on: the target day, e.g., date(2016, 11, 30)
         :type on: ``date``
@@ -409,161 +970,484 @@ class Pump(object):
         :param region: the target region, e.g., 'dd-eu'
         :type region: ``str``
 
-        """
-
-        logging.info("Fetching summary usage for {} on {}".format(
-            region, on.strftime("%Y-%m-%d")))
+        :return: the report, the column headers, and some records
+        :rtype: iterator of ``tuple``
 
-        start_date = (on - timedelta(days=1)).strftime("%Y-%m-%d")
-        end_date = on.strftime("%Y-%m-%d")
+        Records are read from the network only when the previous chunk has
+        been accepted by the next stage.
+        """
 
-        items = self.engines[region].summary_usage_report(
-            start_date,
-            end_date)
+        items = getattr(self, 'fetch_'+label)(on, region)
 
-        if len(items) > 0:
+        headers = next(items, None)
+        if headers is None:
+            return
 
-            first = ','.join(items[0])
+        size = self.settings.get('batch_size', 1000)
 
-            if len(first) < 1 or first.startswith(('<!DOCTYPE', '<?xml')):
-                logging.debug('Data could not be fetched')
-                logging.debug(items)
-                items = []
-                logging.warning("- no item could be found for {} on {}".format(
-                    region, end_date))
+        chunk = []
+        for item in items:
+            chunk.append(item)
 
-            else:
-                items.pop(-1)
-                logging.debug("- found {} items for {} on {}".format(
-                    len(items), region, end_date))
+            if len(chunk) >= size:
+                yield (label, headers, chunk)
+                chunk = []
 
-        return items
+        if len(chunk) > 0:
+            yield (label, headers, chunk)
 
-    def fetch_detailed_usage(self, on, region='dd-eu'):
+    def parse_stage(self, item):
         """
-        Fetches and returns detailed usage
+        Turns a chunk of records into a batch for updaters
 
-        :param on: the target day, e.g., date(2016, 11, 30)
-        :type on: ``date``
+        :param item: the report, the column headers, and some records
+        :type item: ``tuple``
 
-        :param region: the target region, e.g., 'dd-eu'
-        :type region: ``str``
+        :return: the report, and records with headers first
+        :rtype: iterator of ``tuple``
 
         """
 
-        logging.info("Fetching detailed usage for {} on {}".format(
-            region, on.strftime("%Y-%m-%d")))
-
-        start_date = (on - timedelta(days=1)).strftime("%Y-%m-%d")
-        end_date = on.strftime("%Y-%m-%d")
+        label, headers, chunk = item
+        yield (label, [headers] + chunk)
 
-        items = self.engines[region].detailed_usage_report(
-            start_date,
-            end_date)
+    def store_stage(self, item, updaters, region='dd-eu'):
+        """
+        Passes a batch of records to updaters
 
-        if len(items) > 0:
+        :param item: the report, and records with headers first
+        :type item: ``tuple``
 
-            first = ','.join(items[0])
+        :param updaters: the updaters to use
+        :type updaters: ``list`` of ``Updater``
 
-            if len(first) < 1 or first.startswith(('<!DOCTYPE', '<?xml')):
-                logging.debug('Data could not be fetched')
-                logging.debug(items)
-                items = []
-                logging.warning("- no item could be found for {} on {}".format(
-                    region, end_date))
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
 
-            else:
-                items.pop(-1)
-                logging.debug("- found {} items for {} on {}".format(
-                    len(items), region, end_date))
+        """
 
-        return items
+        label, batch = item
+        self.dispatch_batch('update_'+label, batch, updaters, region)
 
-    def fetch_audit_log(self, on, region='dd-eu'):
+    def pull_report(self, label, on, region='dd-eu'):
         """
-        Fetches and returns audit log records
+        Pulls one report for a given region
 
-        :param on: the target day, e.g., date(2016, 11, 30)
-        :type on: ``date``
+        :param label: the type of report, e.g., 'summary_usage'
+        :type label: ``str``
+
+        :param on: the target day, or the first and last days of a window
+        :type on: ``date`` or ``tuple``
 
         :param region: the target region, e.g., 'dd-eu'
         :type region: ``str``
 
-        """
+        :return: `True` on success, else `False`
+        :rtype: ``bool``
 
-        logging.info("Fetching audit log for {} on {}".format(
-            region, on.strftime("%Y-%m-%d")))
+        Usage reports are requested once for a window of days, and records
+        are passed to updaters day after day, as if they had been fetched
+        daily. This is used for backfills, and the size of windows, in days,
+        can be set in the configuration file, like this::
 
-        start_date = (on - timedelta(days=1)).strftime("%Y-%m-%d")
-        end_date = on.strftime("%Y-%m-%d")
+            pump = {
+                'backfill_window': 7,
+            }
 
-        items = self.engines[region].audit_log_report(
-            start_date,
-            end_date)
+        """
 
-        if len(items) > 0:
+        try:
 
-            first = ','.join(items[0])
+            if not isinstance(on, tuple):
+                items = getattr(self, 'fetch_'+label)(on, region)
+                getattr(self, 'update_'+label)(items, region)
 
-            if len(first) < 1 or first.startswith(('<!DOCTYPE', '<?xml')):
-                logging.debug('Data could not be fetched')
-                logging.debug(items)
-                items = []
-                logging.warning("- no item could be found for {} on {}".format(
-                    region, end_date))
+            elif label in ('summary_usage', 'detailed_usage'):
+                self.backfill_usage(label, on[0], on[1], region)
 
             else:
-                logging.debug("- found {} items for {} on {}".format(
-                    len(items), region, end_date))
+                cursor = on[0]
+                while cursor <= on[1]:
+                    items = getattr(self, 'fetch_'+label)(cursor, region)
+                    getattr(self, 'update_'+label)(items, region)
+                    cursor += timedelta(days=1)
 
-        return items
+            if self.checkpoint:
+                self.checkpoint.complete((region, on, label))
 
-    def tail_audit_log(self, on, raw=[], region='dd-eu'):
-        """
-        Considers only new records from the audit log
+            return True
 
-        :param on: the target day, e.g., date(2016, 11, 30)
-        :type on: ``date``
+        except socket.error as feedback:
+            logging.warning('Cannot access API endpoint for {}'.format(region))
+            logging.warning('- {}'.format(str(feedback)))
 
-        :param raw: raw records from the audit log
+        except Exception as feedback:
+            logging.error('Unable to pull for {}'.format(region))
+            logging.exception(feedback)
+
+        metrics.increment('mcp_errors_total', region=region, task='pull')
+        return False
+
+    def backfill_usage(self, label, first, last, region='dd-eu'):
+        """
+        Saves usage records over several days
+
+        :param label: the type of report, e.g., 'summary_usage'
+        :type label: ``str``
+
+        :param first: the first target day, e.g., date(2016, 11, 1)
+        :type first: ``date``
+
+        :param last: the last target day, e.g., date(2016, 11, 30)
+        :type last: ``date``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        If the API rejects the window, then days are fetched one at a time,
+        and this is remembered for some next windows of the same report and
+        region, before the API is given a new chance::
+
+            pump = {
+                'backfill_fallback': 10,
+            }
+
+        """
+
+        context = self.context.setdefault(region, {})
+        fallbacks = context.setdefault('daily_only', {})
+
+        if fallbacks.get(label, 0) > 0:
+            fallbacks[label] -= 1
+
+        else:
+
+            items = self.fetch_usage_window(label, first, last, region)
+
+            headers = next(items, None)
+            if headers is not None:
+                self.dispatch_by_day('update_'+label,
+                                     itertools.chain([headers], items),
+                                     region)
+                return
+
+            logging.warning("- falling back to daily windows for {}".format(
+                region))
+            fallbacks[label] = self.settings.get('backfill_fallback', 10)
+
+        on = first
+        while on <= last:
+            items = getattr(self, 'fetch_'+label)(on, region)
+            getattr(self, 'update_'+label)(items, region)
+            on += timedelta(days=1)
+
+    def tick(self, on, region='dd-eu'):
+        """
+        Detects active servers over the past minute for a given region
+
+        :param on: the current day, e.g., date(2016, 11, 30)
+        :type on: ``date``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :return: the number of active servers, or `None` on error
+        :rtype: ``int``
+
+        Backfill of the region gives way while the tick is in progress, for
+        some seconds at most, that can be set in the configuration file::
+
+            pump = {
+                'realtime_timeout': 60,
+            }
+
+        """
+
+        if region in self.engines:
+            self.engines[region].limiter.preempt(
+                self.settings.get('realtime_timeout', 60))
+
+        try:
+
+            engine = self.engines[region]
+            tail = self.get_tail(region)
+
+            today = (on + timedelta(days=1))
+
+            items = []
+            if tail.day is not None and tail.day < today:  # after midnight
+                logging.debug("- final poll of {} for {}".format(
+                    tail.day, region))
+                raw = list(self.fetch_audit_log(tail.day, region))
+                items = self.tail_audit_log(tail.day, raw, region)
+
+            raw = self.fetch_audit_log(today, region, changed_only=True)
+            if raw is None and len(items) < 1:
+                logging.debug("- audit log is unchanged for {}: {}".format(
+                    region, engine.get_poll_stats()))
+                return 0
+
+            if raw is not None:
+                items += self.tail_audit_log(today, list(raw), region)
+
+            servers = self.list_active_servers(items, region)
+            self.on_servers(servers, region)
+
+            if self.checkpoint and tail.stamp:
+                self.checkpoint.set_cursor(region, tail.get_state())
+
+            engine.nodes.save()
+            logging.debug("- node cache for {}: {}".format(
+                region, engine.nodes.get_stats()))
+            logging.debug("- audit log polls for {}: {}".format(
+                region, engine.get_poll_stats()))
+            logging.debug("- updaters: {}".format(self.get_updater_stats()))
+
+            return len(servers)
+
+        except socket.error as feedback:
+            logging.warning('Cannot access API endpoint for {}'.format(region))
+            logging.warning('- {}'.format(str(feedback)))
+
+        except Exception as feedback:
+            logging.error('Unable to tick for {}'.format(region))
+            logging.exception(feedback)
+
+        finally:
+            if region in self.engines:
+                self.engines[region].limiter.release()
+
+        metrics.increment('mcp_errors_total', region=region, task='tick')
+        return None
+
+
+    def fetch_summary_usage(self, on, region='dd-eu'):
+        """
+        Fetches and returns summary usage
+
+        :param on: the target day, e.g., date(2016, 11, 30)
+        :type on: ``date``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        """
+
+        logging.info("Fetching summary usage for {} on {}".format(
+            region, on.strftime("%Y-%m-%d")))
+
+        start_date = (on - timedelta(days=1)).strftime("%Y-%m-%d")
+        end_date = on.strftime("%Y-%m-%d")
+
+        items = self.engines[region].summary_usage_report(
+            start_date,
+            end_date)
+
+        return self.check_report(items, region, end_date, totals=True)
+
+    def fetch_detailed_usage(self, on, region='dd-eu'):
+        """
+        Fetches and returns detailed usage
+
+        :param on: the target day, e.g., date(2016, 11, 30)
+        :type on: ``date``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        """
+
+        logging.info("Fetching detailed usage for {} on {}".format(
+            region, on.strftime("%Y-%m-%d")))
+
+        start_date = (on - timedelta(days=1)).strftime("%Y-%m-%d")
+        end_date = on.strftime("%Y-%m-%d")
+
+        items = self.engines[region].detailed_usage_report(
+            start_date,
+            end_date)
+
+        return self.check_report(items, region, end_date, totals=True)
+
+    def fetch_usage_window(self, label, first, last, region='dd-eu'):
+        """
+        Fetches and returns usage over several days
+
+        :param label: the type of report, e.g., 'summary_usage'
+        :type label: ``str``
+
+        :param first: the first target day, e.g., date(2016, 11, 1)
+        :type first: ``date``
+
+        :param last: the last target day, e.g., date(2016, 11, 30)
+        :type last: ``date``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        """
+
+        logging.info("Fetching {} for {} from {} to {}".format(
+            label.replace('_', ' '), region,
+            first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")))
+
+        start_date = (first - timedelta(days=1)).strftime("%Y-%m-%d")
+        end_date = last.strftime("%Y-%m-%d")
+
+        report = getattr(self.engines[region], label+'_report')
+        items = report(start_date, end_date)
+
+        return self.check_report(items, region, end_date, totals=True)
+
+    def fetch_audit_log(self, on, region='dd-eu', changed_only=False):
+        """
+        Fetches and returns audit log records
+
+        :param on: the target day, e.g., date(2016, 11, 30)
+        :type on: ``date``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param changed_only: return `None` if the log has not changed
+            since previous call
+        :type changed_only: `True` or `False`
+
+        """
+
+        logging.info("Fetching audit log for {} on {}".format(
+            region, on.strftime("%Y-%m-%d")))
+
+        start_date = (on - timedelta(days=1)).strftime("%Y-%m-%d")
+        end_date = on.strftime("%Y-%m-%d")
+
+        items = self.engines[region].audit_log_report(
+            start_date,
+            end_date,
+            changed_only=changed_only)
+
+        if items is None:  # unchanged since previous call
+            return None
+
+        return self.check_report(items, region, end_date)
+
+    def check_report(self, items, region, on, totals=False):
+        """
+        Streams valid records of some report
+
+        :param items: raw records of the report
+        :type items: iterator of `list`
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param on: the target day, e.g., '2016-11-30'
+        :type on: ``str``
+
+        :param totals: drop the last record of the report
+        :type totals: `True` or `False`
+
+        The first record is expected to list column headers. If the API has
+        sent an error page instead of the report, then nothing is provided.
+        Records are streamed, so the report is never loaded in memory.
+
+        """
+
+        items = iter(items)
+
+        first = next(items, None)
+        line = ','.join(first) if first else ''
+
+        if len(line) < 1 or line.startswith(('<!DOCTYPE', '<?xml')):
+            logging.debug('Data could not be fetched')
+            logging.debug(first)
+            logging.warning("- no item could be found for {} on {}".format(
+                region, on))
+            return
+
+        yield first
+
+        count = 0
+        previous = None
+        for item in items:
+            if previous is not None:
+                count += 1
+                yield previous
+            previous = item
+
+        if previous is not None and not totals:
+            count += 1
+            yield previous
+
+        logging.debug("- found {} items for {} on {}".format(
+            count, region, on))
+
+    def get_tail(self, region='dd-eu'):
+        """
+        Provides the tail of the audit log of some region
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :return: the tail of the region
+        :rtype: ``AuditTail``
+
+        Records written late are looked for some seconds before the most
+        recent record, and this can be set in the configuration file::
+
+            pump = {
+                'audit_slack': 300,
+            }
+
+        """
+
+        context = self.context.setdefault(region, {})
+        if 'tail' not in context:
+            context['tail'] = AuditTail(
+                slack=self.settings.get('audit_slack', 300))
+
+        return context['tail']
+
+    def tail_audit_log(self, on, raw=[], region='dd-eu'):
+        """
+        Considers only new records from the audit log
+
+        :param on: the target day, e.g., date(2016, 11, 30)
+        :type on: ``date``
+
+        :param raw: raw records from the audit log, headers first
         :type raw: `list` of `list`
 
         :param region: the target region, e.g., 'dd-eu'
         :type region: ``str``
 
+        :return: records that have not been seen before
+        :rtype: `list` of `list`
+
+        The cost depends on the number of new records, and not on the size
+        of the audit log, since the tail seeks directly to its watermark.
         """
 
         if raw in ([], None):  # sanity check
             return []
 
-        cursor = self.context[region].get('cursor')
-        uid = self.context[region].get('uid')
+        headers = raw.pop(0)
+        column = headers.index('Time') if 'Time' in headers else 1
 
-        raw.pop(0)    # remove headers
-
-        if cursor == on and uid is not None:
-
-            index = 0
-            while index < len(raw):
-                if raw[index][0] == uid:
-                    break
-                index += 1
+        tail = self.get_tail(region)
+        if tail.day is None or on > tail.day:
+            tail.day = on
 
-            if index > 0 and index < len(raw):
-                del raw[:index+1]
-            elif len(raw) > 0 and raw[0][0] == uid:
-                del raw[0]
+        items = tail.tail(raw, column)
 
-        if len(raw) > 0:
-            self.context[region]['cursor'] = on
-            self.context[region]['uid'] = raw[-1][0]
-            logging.debug("- tail to {} for {}".format(raw[-1][0], region))
-            logging.debug("- {} new items have been found".format(len(raw)))
+        if len(items) > 0:
+            logging.debug("- tail to {} for {}".format(tail.stamp, region))
+            logging.debug("- {} new items have been found".format(len(items)))
 
         else:
             logging.debug("- nothing new at {}".format(region))
 
-        return raw
+        return items
 
     def list_active_servers(self, raw=[], region='dd-eu'):
         """
@@ -575,6 +1459,14 @@ class Pump(object):
         :param region: the target region, e.g., 'dd-eu'
         :type region: ``str``
 
+        When many servers are activated at once, a snapshot of the whole
+        inventory is taken instead of looking up servers one by one. The
+        threshold can be set in the configuration file, like this::
+
+            pump = {
+                'inventory_threshold': 5,
+            }
+
         """
 
         servers = []
@@ -583,15 +1475,35 @@ class Pump(object):
 
         nodes = {}
 
+        activations = []
+
         # process every record from the audit log
         #
         for item in raw:
 
+            # public addresses of servers may have changed
+            #
+            if 'nat rule' in item[8].lower():
+                self.engines[region].forget_nat_rules()
+
             # we are interested only into completed actions on servers
             #
             if item[6] != 'SERVER':
                 continue
 
+            # extract name and unique id of the server
+            #
+            matches = re.match(name_and_id, item[7])
+            if matches is None:
+                continue
+            name = matches.group(1)
+            id = matches.group(3)
+
+            # cached attributes are outdated, except on reboot
+            #
+            if item[8].lower() != 'reboot server':
+                self.engines[region].forget_node(id)
+
             # we are not interested into OEC_SYSTEM
             #
             if item[2] == 'OEC_SYSTEM':
@@ -606,11 +1518,27 @@ class Pump(object):
                                        'reboot server'):
                 continue
 
-            # extract name and unique id of the server
-            #
-            matches = re.match(name_and_id, item[7])
-            name = matches.group(1)
-            id = matches.group(3)
+            activations.append((item, name, id))
+
+        # one listing of the inventory may be cheaper than many lookups
+        #
+        engine = self.engines[region]
+        missing = set([id for item, name, id in activations
+                       if id not in engine.nodes])
+
+        threshold = self.settings.get('inventory_threshold', 5)
+        if len(missing) >= max(threshold, engine.pages):
+            logging.debug('Listing servers for {}'.format(region))
+            try:
+                engine.list_servers()
+
+            except Exception as feedback:
+                logging.warning('Unable to list servers for {}'.format(region))
+                logging.debug(feedback)
+
+        # build a record for every activated server
+        #
+        for item, name, id in activations:
 
             # catch any real-time problem
             #
@@ -618,7 +1546,7 @@ class Pump(object):
 
                 # retrieve node information
                 #
-                node = self.engines[region].get_node_by_id(id=id)
+                node = engine.get_node_by_id(id=id)
                 if node is None:
                     continue
 
@@ -632,7 +1560,9 @@ class Pump(object):
 
                 server['actor'] = actor.title()
                 server['action'] = item[8]
-                server['region'] = region
+                account, server['region'] = self.split_target(region)
+                if account:
+                    server['account'] = account
 
                 # extend the raw list of activated servers
                 #
@@ -662,10 +1592,140 @@ class Pump(object):
 
         self.updaters.append(updater)
 
-    def open_updaters(self, horizon):
+    def set_updaters(self):
+        """
+        Adds updaters as per configuration
+
+        Every updater has its own section in the configuration file, and
+        is used only if it has been activated, like this::
+
+            elastic = {
+                'active': True,
+                'host': 'localhost:9200',
+            }
+
+        """
+
+        # log data in files as per configuration
+        #
+        try:
+            settings = config.files
+
+            from models.files import FilesUpdater
+            updater = FilesUpdater(settings)
+
+            if updater.get('active', False):
+                logging.info("Storing data in files")
+                self.add_updater(updater)
+
+            else:
+                logging.debug("The files module has not been activated")
+
+        except AttributeError:
+            logging.debug("No configuration for file storage")
+
+        # add an elasticsearch updater as per configuration
+        #
+        try:
+            settings = config.elastic
+
+            from models.elastic import ElasticUpdater
+            updater = ElasticUpdater(settings)
+
+            if updater.get('active', False):
+                logging.info("Storing data in Elasticsearch")
+                self.add_updater(updater)
+
+            else:
+                logging.debug("The Elasticsearch module has not been activated")
+
+        except AttributeError:
+            logging.debug("No configuration for Elasticsearch")
+
+        # add an influxdb updater as per configuration
+        #
+        try:
+            settings = config.influxdb
+
+            from models.influx import InfluxdbUpdater
+            updater = InfluxdbUpdater(settings)
+
+            if updater.get('active', False):
+                logging.info("Storing data in InfluxDB")
+                self.add_updater(updater)
+
+            else:
+                logging.debug("The InfluxDB module has not been activated")
+
+        except AttributeError:
+            logging.debug("No configuration for InfluxDB")
+
+        # add a qualys updater as per configuration
+        #
+        try:
+            settings = config.qualys
+
+            from models.qualys import QualysUpdater
+            updater = QualysUpdater(settings)
+
+            if updater.get('active', False):
+                logging.info("Using Qualys service")
+                self.add_updater(updater)
+
+            else:
+                logging.debug("The Qualys module has not been activated")
+
+        except AttributeError:
+            logging.debug("No configuration for Qualys")
+
+        # add a Cisco Spark room as per configuration
+        #
+        try:
+            settings = config.spark
+
+            from models.spark import SparkUpdater
+            updater = SparkUpdater(settings)
+
+            if updater.get('active', False):
+                logging.info("Using Cisco Spark service")
+                self.add_updater(updater)
+
+            else:
+                logging.debug("The Cisco Spark module has not been activated")
+
+        except AttributeError:
+            logging.debug("No configuration for Cisco Spark")
+
+        if len(self.updaters) < 1:
+            logging.warning('No updater has been activated, check config.py')
+
+    def open_updaters(self, horizon, resume=False):
         """
         Signals the beginning of the job to updaters
+
+        :param horizon: the beginning date of a new pump, or `None`
+        :type horizon: ``date``
+
+        :param resume: keep stores and the checkpoint on a new horizon
+        :type resume: `True` or `False`
+
+        Stores are reset on a new horizon, and the checkpoint is cleared,
+        so that nothing is pumped twice in stores. With ``--resume`` on the
+        command line, stores are kept, and only tasks that have not been
+        done before are pulled.
         """
+
+        if horizon and self.checkpoint:
+            if resume and not self.checkpoint.is_empty():
+                logging.info("Resuming from checkpoint {}".format(
+                    self.checkpoint.path))
+                horizon = None
+
+            else:
+                logging.info("Clearing checkpoint {}".format(
+                    self.checkpoint.path))
+                self.checkpoint.reset()
+
         for updater in self.updaters:
             try:
                 if horizon:
@@ -689,92 +1749,452 @@ class Pump(object):
                 logging.error('- unable to close updater')
                 logging.debug(feedback)
 
-    def update_summary_usage(self, items, region='dd-eu'):
+    def dispatch(self, label, items, region='dd-eu'):
         """
-        Saves records of summary usage
+        Streams records of some report to active updaters
 
-        :param items: to be recorded in database
-        :type items: ``list`` of ``dict``
+        :param label: the function of updaters, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param items: to be recorded in database, headers first
+        :type items: iterator of ``list``
 
         :param region: the target region, e.g., 'dd-eu'
         :type region: ``str``
 
+        Records are passed in batches, and every batch starts with
+        column headers. The size of batches can be set in the
+        configuration file, like this::
+
+            pump = {
+                'batch_size': 1000,
+            }
+
         """
 
-        avoided = 0
-        for updater in self.updaters:
+        items = iter(items)
 
-            if not updater.get('active', False):
-                avoided += 1
-                continue
+        headers = next(items, None)
+        if headers is None:
+            return
 
-            try:
-                updater.update_summary_usage(list(items), region)
+        updaters = [x for x in self.updaters if x.get('active', False)]
+        if len(updaters) < 1:
+            logging.warning('No updater has been activated')
+            return
+
+        size = self.settings.get('batch_size', 1000)
+
+        batch = [headers]
+        for item in items:
+            batch.append(item)
+
+            if len(batch) > size:
+                self.dispatch_batch(label, batch, updaters, region)
+                batch = [headers]
 
-            except IndexError:
-                logging.error('Invalid index in provided data')
-                logging.error(items)
+        if len(batch) > 1:
+            self.dispatch_batch(label, batch, updaters, region)
+
+    def dispatch_by_day(self, label, items, region='dd-eu'):
+        """
+        Streams records of a report over several days to active updaters
+
+        :param label: the function of updaters, e.g., 'update_summary_usage'
+        :type label: ``str``
+
+        :param items: to be recorded in database, headers first
+        :type items: iterator of ``list``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
 
-        if avoided == len(self.updaters) and len(items) > 0:
+        Records are split by day, based on the column 'DAY' or 'End Time',
+        and a batch never mixes records from different days. Records that
+        have no date, e.g., sub-totals, stay with the previous record.
+        """
+
+        items = iter(items)
+
+        headers = next(items, None)
+        if headers is None:
+            return
+
+        updaters = [x for x in self.updaters if x.get('active', False)]
+        if len(updaters) < 1:
             logging.warning('No updater has been activated')
+            return
 
-    def update_detailed_usage(self, items, region='dd-eu'):
+        column = None
+        for name in self.DAY_COLUMNS:
+            if name in headers:
+                column = headers.index(name)
+                break
+
+        size = self.settings.get('batch_size', 1000)
+
+        batches = {}
+        day = ''
+        for item in items:
+            if column is not None and column < len(item):
+                stamp = item[column][:10]
+                if re.match(r'\d{4}-\d{2}-\d{2}$', stamp):
+                    day = stamp
+
+            batch = batches.setdefault(day, [headers])
+            batch.append(item)
+
+            if len(batch) > size:
+                self.dispatch_batch(label, batch, updaters, region)
+                batches[day] = [headers]
+
+        for day in sorted(batches.keys()):
+            if len(batches[day]) > 1:
+                self.dispatch_batch(label, batches[day], updaters, region)
+
+    def dispatch_batch(self, label, batch, updaters, region='dd-eu'):
         """
-        Saves records of detailed usage
+        Passes a batch of records to updaters
 
-        :param items: to be recorded in database
-        :type items: ``list`` of ``dict``
+        :param label: the function of updaters, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param batch: to be recorded in database, headers first
+        :type batch: ``list`` of ``list``
+
+        :param updaters: the updaters to use
+        :type updaters: ``list`` of ``Updater``
 
         :param region: the target region, e.g., 'dd-eu'
         :type region: ``str``
 
+        In the backfill lane, the batch waits while the region is polled
+        in real time, so that stores serve real-time updates first.
+
+        An exception is raised if some updater that is waited for has
+        failed, or has timed out, so that the report is not recorded as
+        done in the checkpoint.
         """
 
-        avoided = 0
-        for updater in self.updaters:
+        engine = self.engines.get(region)
+        if engine is not None and engine.lane == 'backfill':
+            waited = engine.limiter.give_way()
+            if waited > 0:
+                logging.debug("- backfill of {} waited {:.1f} seconds".format(
+                    region, waited))
+
+        if not self.fan_out(label, batch, updaters, region):
+            raise RuntimeError("Unable to store {} for {}".format(
+                label, region))
+
+    def fan_out(self, label, items, updaters, region='dd-eu'):
+        """
+        Passes data to updaters concurrently
+
+        :param label: the function of updaters, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param items: the data passed to every updater
+        :type items: ``list``
+
+        :param updaters: the updaters to use
+        :type updaters: ``list`` of ``Updater``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :return: `True` if updaters that are waited for have succeeded
+        :rtype: ``bool``
+
+        Every updater gets its own copy of data, and runs in a separate
+        thread, so that a slow updater does not delay others. The pump
+        waits for each updater until its timeout, except for updaters
+        that have ``'wait': False`` in their settings. These are waited
+        for anyway when they have too many calls in progress. Threads and
+        pending calls are bounded, and this can be set in the configuration
+        file::
+
+            pump = {
+                'updater_threads': 8,
+                'updater_timeout': 60,
+                'updater_backlog': 10,
+            }
+
+        A thread that has timed out is not interrupted, and keeps its
+        place in the pool until the updater returns.
+        """
+
+        pool = self.get_fan_out_pool()
+
+        backlog = self.settings.get('updater_backlog', 10)
 
-            if not updater.get('active', False):
-                avoided += 1
+        start = time.time()
+        results = []
+        for updater in updaters:
+            waited = updater.get('wait', True)
+            if self.add_backlog(updater, 1) > backlog:
+                waited = True  # do not pile up calls
+
+            result = pool.apply_async(self.call_updater,
+                                      (updater, label, items, region))
+            results.append((updater, result, waited))
+
+        succeeded = True
+        default = self.settings.get('updater_timeout', 60)
+        for updater, result, waited in results:
+
+            if not waited:
                 continue
 
+            timeout = updater.get('timeout', default)
             try:
-                updater.update_detailed_usage(list(items), region)
+                if not result.get(max(0.0, start + timeout - time.time())):
+                    succeeded = False
 
-            except IndexError:
-                logging.error('Invalid index in provided data')
-                logging.error(items)
+            except TimeoutError:
+                name = updater.__class__.__name__
+                logging.warning("- {} has timed out on {}".format(
+                    name, label))
+                self.count_updater(name, timeouts=1)
+                succeeded = False
 
-        if avoided == len(self.updaters) and len(items) > 0:
-            logging.warning('No updater has been activated')
+        return succeeded
 
-    def update_audit_log(self, items, region='dd-eu'):
+    def add_backlog(self, updater, count):
         """
-        Saves records of audit log
+        Counts calls of some updater that are not done yet
 
-        :param items: to be recorded in database
-        :type items: ``list`` of ``dict``
+        :param updater: the updater to consider
+        :type updater: ``Updater``
+
+        :param count: calls added, or removed if negative
+        :type count: ``int``
+
+        :return: calls of the updater that are not done yet
+        :rtype: ``int``
+
+        """
+
+        with self._stats_lock:
+            total = self._backlogs.get(id(updater), 0) + count
+            self._backlogs[id(updater)] = total
+            return total
+
+    def get_updater_lock(self, updater, label):
+        """
+        Provides the lock of some updater for some report
+
+        :param updater: the updater to consider
+        :type updater: ``Updater``
+
+        :param label: the function of the updater, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :return: a lock, so that batches of a report are stored one at a time
+        :rtype: ``threading.Lock``
+
+        """
+
+        with self._stats_lock:
+            key = (id(updater), label)
+            if key not in self._updater_locks:
+                self._updater_locks[key] = threading.Lock()
+            return self._updater_locks[key]
+
+    def get_fan_out_pool(self):
+        """
+        Provides threads to run updaters
+
+        :return: a pool of threads for the current process
+        :rtype: ``ThreadPool``
+
+        """
+
+        if self._fan_out is None or self._fan_out_pid != os.getpid():
+            self._fan_out = ThreadPool(self.settings.get('updater_threads', 8))
+            self._fan_out_pid = os.getpid()
+
+        return self._fan_out
+
+    def call_updater(self, updater, label, items, region='dd-eu'):
+        """
+        Runs one updater and measures it
+
+        :param updater: the updater to use
+        :type updater: ``Updater``
+
+        :param label: the function of the updater, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param items: the data passed to the updater
+        :type items: ``list``
 
         :param region: the target region, e.g., 'dd-eu'
         :type region: ``str``
 
+        :return: `True` if data has been stored, or kept in the spool
+        :rtype: ``bool``
+
+        Errors are logged, so that the failure of an updater has no effect
+        on other updaters. Data that the updater could not save in its
+        store is kept in its spool. Batches of the same report are passed
+        to an updater one at a time, so that they are not mixed in stores
+        like files.
+        """
+
+        name = updater.__class__.__name__
+
+        report = label.replace('update_', '')
+        records = len(items)
+        if label != 'on_servers':
+            records -= 1  # headers
+
+        start = time.time()
+        try:
+            account, area = self.split_target(region)
+            with self.get_updater_lock(updater, label):
+                delivered = updater.deliver(label, list(items), area, account)
+
+            if delivered:
+                self.count_updater(name, elapsed=time.time()-start)
+                metrics.increment('mcp_records_written_total', records,
+                                  updater=name, report=report)
+            else:
+                self.count_updater(name, elapsed=time.time()-start,
+                                   spooled=1)
+
+            return True
+
+        except IndexError:
+            logging.error('Invalid index in provided data')
+            logging.error(items)
+            self.count_updater(name, elapsed=time.time()-start, failures=1)
+
+        except Exception as feedback:
+            logging.warning("- {} has failed on {}".format(name, label))
+            logging.exception(feedback)
+            self.count_updater(name, elapsed=time.time()-start, failures=1)
+
+        finally:
+            self.add_backlog(updater, -1)
+
+        return False
+
+    def count_updater(self, name, elapsed=None, failures=0, timeouts=0,
+                      spooled=0):
         """
+        Updates statistics of some updater
+
+        :param name: the name of the updater, e.g., 'ElasticUpdater'
+        :type name: ``str``
+
+        :param elapsed: the duration of a call, in seconds, if any
+        :type elapsed: ``float``
+
+        :param failures: calls that have failed
+        :type failures: ``int``
+
+        :param timeouts: calls that have timed out
+        :type timeouts: ``int``
+
+        :param spooled: calls that have been saved in the spool
+        :type spooled: ``int``
+
+        """
+
+        with self._stats_lock:
+            stats = self.updater_stats.setdefault(name, {
+                'calls': 0,
+                'failures': 0,
+                'timeouts': 0,
+                'spooled': 0,
+                'elapsed': 0.0,
+            })
+
+            if elapsed is not None:
+                stats['calls'] += 1
+                stats['elapsed'] += elapsed
+
+            stats['failures'] += failures
+            stats['timeouts'] += timeouts
+            stats['spooled'] += spooled
+
+        if elapsed is not None:
+            metrics.observe('mcp_write_seconds', elapsed, updater=name)
+
+        for kind, count in (('failure', failures),
+                            ('timeout', timeouts),
+                            ('spooled', spooled)):
+            if count:
+                metrics.increment('mcp_updater_errors_total', count,
+                                  updater=name, kind=kind)
+
+    def get_updater_stats(self):
+        """
+        Reports on updaters
+
+        :return: calls, failures, timeouts, spooled calls, and average
+            latency in milliseconds, per updater, and the state of spools
+        :rtype: ``dict``
+        """
+
+        with self._stats_lock:
+            report = {}
+            for name, stats in self.updater_stats.items():
+                report[name] = dict(stats)
+                report[name]['latency'] = int(
+                    1000 * stats['elapsed'] / max(1, stats['calls']))
+                del report[name]['elapsed']
 
-        avoided = 0
         for updater in self.updaters:
+            spool = updater.get_spool_stats()
+            if spool is not None:
+                name = updater.__class__.__name__
+                report.setdefault(name, {})['spool'] = spool
 
-            if not updater.get('active', False):
-                avoided += 1
-                continue
+        return report
 
-            try:
-                updater.update_audit_log(list(items), region)
+    def update_summary_usage(self, items, region='dd-eu'):
+        """
+        Saves records of summary usage
 
-            except IndexError:
-                logging.error('Invalid index in provided data')
-                logging.error(items)
+        :param items: to be recorded in database
+        :type items: iterator of ``list``
 
-        if avoided == len(self.updaters) and len(items) > 0:
-            logging.warning('No updater has been activated')
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        """
+
+        self.dispatch('update_summary_usage', items, region)
+
+    def update_detailed_usage(self, items, region='dd-eu'):
+        """
+        Saves records of detailed usage
+
+        :param items: to be recorded in database
+        :type items: iterator of ``list``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        """
+
+        self.dispatch('update_detailed_usage', items, region)
+
+    def update_audit_log(self, items, region='dd-eu'):
+        """
+        Saves records of audit log
+
+        :param items: to be recorded in database
+        :type items: iterator of ``list``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        """
+
+        self.dispatch('update_audit_log', items, region)
 
     def on_servers(self, updates, region='dd-eu'):
         """
@@ -788,22 +2208,13 @@ class Pump(object):
 
         """
 
-        avoided = 0
-        for updater in self.updaters:
-
-            if not updater.get('active', False):
-                avoided += 1
-                continue
-
-            try:
-                updater.on_servers(list(updates), region)
-
-            except Exception as feedback:
-                logging.warning('Unable to update on active servers')
-                logging.exception(feedback)
+        updaters = [x for x in self.updaters if x.get('active', False)]
+        if len(updaters) < 1:
+            if len(updates) > 0:
+                logging.warning('No updater has been activated')
+            return
 
-        if avoided == len(self.updaters) and len(items) > 0:
-            logging.warning('No updater has been activated')
+        self.fan_out('on_servers', updates, updaters, region)
 
 # when the program is launched from the command line
 #
@@ -843,122 +2254,44 @@ if __name__ == "__main__":
 
     # get args
     #
+    args = sys.argv[1:]
+
+    if '--profile' in args:
+        args.remove('--profile')
+        pump.settings['profile'] = pump.settings.get('profile') or True
+
+    resume = '--resume' in args
+    if resume:
+        args.remove('--resume')
+
     horizon = None
-    if len(sys.argv) > 1:
-        horizon = sys.argv[1]
+    if len(args) > 0:
+        horizon = args[0]
 
         if horizon[-1] not in ('d', 'm', 'y'):
-            print('usage: pump [<horizon>]')
+            print('usage: pump [--profile] [--resume] [<horizon>]')
             print('examples:')
             print('pump')
             print('pump 90d')
             print('pump 3m')
             print('pump 12m')
             print('pump 1y')
+            print('pump --profile 3m')
+            print('pump --resume 12m')
             sys.exit(1)
 
         horizon = pump.get_date(horizon)
         logging.info('Pumping since {}'.format(horizon))
 
-    # log data in files as per configuration
-    #
-    try:
-        settings = config.files
-
-        from models.files import FilesUpdater
-        updater = FilesUpdater(settings)
-
-        if updater.get('active', False):
-            logging.info("Storing data in files")
-            pump.add_updater(updater)
-
-        else:
-            logging.debug("The files module has not been activated")
-
-    except AttributeError:
-        logging.debug("No configuration for file storage")
-
-    # add an elasticsearch updater as per configuration
-    #
-    try:
-        settings = config.elastic
-
-        from models.elastic import ElasticUpdater
-        updater = ElasticUpdater(settings)
-
-        if updater.get('active', False):
-            logging.info("Storing data in Elasticsearch")
-            pump.add_updater(updater)
-
-        else:
-            logging.debug("The Elasticsearch module has not been activated")
-
-    except AttributeError:
-        logging.debug("No configuration for Elasticsearch")
-
-    # add an influxdb updater as per configuration
-    #
-    try:
-        settings = config.influxdb
-
-        from models.influx import InfluxdbUpdater
-        updater = InfluxdbUpdater(settings)
-
-        if updater.get('active', False):
-            logging.info("Storing data in InfluxDB")
-            pump.add_updater(updater)
-
-        else:
-            logging.debug("The InfluxDB module has not been activated")
-
-    except AttributeError:
-        logging.debug("No configuration for InfluxDB")
-
-    # add a qualys updater as per configuration
-    #
-    try:
-        settings = config.qualys
-
-        from models.qualys import QualysUpdater
-        updater = QualysUpdater(settings)
-
-        if updater.get('active', False):
-            logging.info("Using Qualys service")
-            pump.add_updater(updater)
-
-        else:
-            logging.debug("The Qualys module has not been activated")
-
-    except AttributeError:
-        logging.debug("No configuration for Qualys")
-
-    # add a Cisco Spark room as per configuration
-    #
-    try:
-        settings = config.spark
-
-        from models.spark import SparkUpdater
-        updater = SparkUpdater(settings)
-
-        if updater.get('active', False):
-            logging.info("Using Cisco Spark service")
-            pump.add_updater(updater)
-
-        else:
-            logging.debug("The Cisco Spark module has not been activated")
-
-    except AttributeError:
-        logging.debug("No configuration for Cisco Spark")
-
-    # sanity check
+    # add updaters as per configuration
     #
-    if len(pump.updaters) < 1:
-        logging.warning('No updater has been activated, check config.py')
+    pump.set_updaters()
 
     # fetch and dispatch data
     #
-    pump.open_updaters(horizon)
+    pump.open_updaters(horizon, resume)
     try:
+        pump.serve_metrics()
         pump.set_endpoints()
         pump.set_workers()
         pump.pump(since=horizon)
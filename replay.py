@@ -0,0 +1,545 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import argparse
+import ast
+import logging
+import os
+import re
+
+import config
+from pump import Pump
+from spool import Spool
+
+
+class Replay(object):
+    """
+    Re-ingests records from local archives, without calling the API
+
+    Records are read from files written by ``FilesUpdater``, one Python
+    list per line, or from the spool of an updater. They are filtered by
+    date and by region, and passed in batches to updaters of the pump, so
+    that a store can be rebuilt at local speed.
+
+    Files written by ``FilesUpdater`` have no headers and no region. Column
+    headers are rebuilt from the size of records, and the region is derived
+    from the content of every record: the location of usage records, e.g.,
+    'EU6' for 'dd-eu', or the name of the object in the audit log, e.g.,
+    'node[dd-eu_1234]' or 'node [EU6_1234]'. Records that are not bound to a
+    region, like global usage of cloud files, are always replayed. Records
+    of data centers that are not known are counted, and not replayed.
+
+    When several accounts are pumped, ``FilesUpdater`` writes the records of
+    every account to its own files, and one account is replayed at a time.
+    Batches of the spool are replayed with their own account.
+    """
+
+    SUMMARY_USAGE_HEADERS = [
+        'DAY', 'Location', 'CPU Hours', 'High Performance CPU Hours',
+        'RAM Hours', 'Storage Hours', 'High Performance Storage Hours',
+        'Economy Storage Hours', 'Bandwidth In', 'Bandwidth Out',
+        'Sub-Admin Hours', 'Network Hours', 'Essentials Network Domain Hours',
+        'Advanced Network Domain Hours', 'VLAN Hours', 'Public IP Hours',
+        'Cloud Files Account Hours', 'Cloud Files (GB Days)',
+        'Software Units', 'Essentials Client Days', 'Advanced Client Days',
+        'Enterprise Client Days', 'Essentials Backups (GB)',
+        'Advanced Backups (GB)', 'Enterprise Backups (GB)',
+        'Essentials Monitoring Hours', 'Advanced Monitoring Hours']
+
+    # columns of detailed usage, before and after tags set by users
+    #
+    DETAILED_USAGE_HEAD = [
+        'Name', 'UUID', 'Type', 'Location', 'Private IP Address', 'Status']
+
+    DETAILED_USAGE_TAIL = [
+        'Start Time', 'End Time', 'Duration (Hours)', 'CPU Type',
+        'CPU Count', 'RAM (GB)', 'Storage (GB)',
+        'High Performance Storage (GB)', 'Economy Storage (GB)', 'CPU Hours',
+        'High Performance CPU Hours', 'RAM Hours', 'Storage Hours',
+        'High Performance Storage Hours', 'Economy Storage Hours',
+        'Bandwidth-In (GB)', 'Bandwidth-Out (GB)', 'Subadmin Hours',
+        'Network Hours', 'Essentials Network Domain Hours',
+        'Advanced Network Domain Hours', 'VLAN Hours', 'Public IP Hours',
+        'Cloud Files Account Hours', 'Cloud Storage (GB)']
+
+    AUDIT_LOG_HEADERS = [
+        'UUID', 'Time', 'Create User', 'Department', 'Customer Defined 1',
+        'Customer Defined 2', 'Type', 'Name', 'Action', 'Details',
+        'Response Code']
+
+    DAY_COLUMNS = ('DAY', 'End Time', 'Time')  # dates of records
+
+    # regions of data centers, from the prefix of their code, e.g., 'EU6'
+    #
+    DATACENTERS = {
+        'AF': 'dd-af',
+        'AP': 'dd-ap',
+        'AU': 'dd-au',
+        'CA': 'dd-na',
+        'EU': 'dd-eu',
+        'NA': 'dd-na',
+    }
+
+    def __init__(self, pump, first=None, last=None, regions=None,
+                 account=None):
+        """
+        Sets a new replay
+
+        :param pump: the pump that has the updaters
+        :type pump: ``Pump``
+
+        :param first: the first day to replay, e.g., '2017-01-01'
+        :type first: ``str`` or `None`
+
+        :param last: the last day to replay, e.g., '2017-03-31'
+        :type last: ``str`` or `None`
+
+        :param regions: regions to replay, e.g., ['dd-eu'], or `None` for all
+        :type regions: ``list`` of ``str``
+
+        :param account: the account of files to replay, or `None` if there
+            is only one
+        :type account: ``str``
+
+        """
+
+        self.pump = pump
+        self.first = first
+        self.last = last
+        self.regions = regions
+        self.account = account
+
+        self.read = 0
+        self.replayed = 0
+        self.skipped = 0
+        self.invalid = 0
+        self.unknown = 0
+
+    def from_files(self, settings={}):
+        """
+        Replays files written by ``FilesUpdater``
+
+        :param settings: the parameters of files, e.g., ``config.files``
+        :type settings: ``dict``
+
+        Files are the ones set in the configuration file, like this::
+
+            files = {
+                'summary_usage': './logs/summary_usage.log',
+                'detailed_usage': './logs/detailed_usage.log',
+                'audit_log': './logs/audit_log.log',
+            }
+
+        """
+
+        from models.files import FilesUpdater
+        updater = FilesUpdater(settings)
+
+        for report in Pump.REPORTS:
+            path = updater.get_file(report, './logs/{}.log'.format(report),
+                                    self.account)
+            self.replay_file('update_'+report, path)
+
+    def replay_file(self, label, path):
+        """
+        Replays one file written by ``FilesUpdater``
+
+        :param label: the function of updaters, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param path: the file to read
+        :type path: ``str``
+
+        Records are grouped by region, and by headers, since the number of
+        tag columns of detailed usage can change over time.
+        """
+
+        if not os.path.exists(path):
+            logging.debug("- no file {}".format(path))
+            return
+
+        logging.info("Replaying {}".format(path))
+
+        size = self.pump.settings.get('batch_size', 1000)
+
+        batches = {}
+        for item in self.read_file(path):
+            self.read += 1
+
+            headers = self.get_headers(label, item)
+            if headers is None:
+                self.invalid += 1
+                continue
+
+            region = self.get_region(label, item)
+            if region is None:
+                self.unknown += 1
+                continue
+
+            if not self.is_selected(headers, item, region):
+                self.skipped += 1
+                continue
+
+            region = self.pump.get_target(region or self.get_default_region(),
+                                          self.account)
+
+            key = (region, len(headers))
+            batch = batches.setdefault(key, [headers])
+            batch.append(item)
+
+            if len(batch) > size:
+                self.dispatch(label, batch, region)
+                batches[key] = [headers]
+
+        for key in sorted(batches.keys()):
+            if len(batches[key]) > 1:
+                self.dispatch(label, batches[key], key[0])
+
+    def read_file(self, path):
+        """
+        Reads records of some file written by ``FilesUpdater``
+
+        :param path: the file to read
+        :type path: ``str``
+
+        :return: records, one at a time
+        :rtype: iterator of ``list``
+
+        """
+
+        with open(path, 'r') as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+
+                try:
+                    item = ast.literal_eval(line)
+
+                except (ValueError, SyntaxError):
+                    logging.debug("- invalid line in {}".format(path))
+                    self.invalid += 1
+                    continue
+
+                if isinstance(item, (list, tuple)):
+                    yield list(item)
+                else:
+                    self.invalid += 1
+
+    def from_spool(self, path):
+        """
+        Replays batches kept in the spool of some updater
+
+        :param path: the spool file, e.g., './cache/spool-elastic.jsonl.gz'
+        :type path: ``str``
+
+        The spool is only read, and it is left as it is.
+        """
+
+        if not os.path.exists(path):
+            logging.warning("- no spool {}".format(path))
+            return
+
+        logging.info("Replaying {}".format(path))
+
+        for record in Spool(path).read(path):
+            label = record.get('label')
+            region = record.get('region')
+            target = self.pump.get_target(region, record.get('account'))
+            items = record.get('items') or []
+
+            if label == 'on_servers':
+                headers, batch = None, []
+            elif len(items) > 1:
+                headers, items = items[0], items[1:]
+                batch = [headers]
+            else:
+                continue
+
+            for item in items:
+                self.read += 1
+                if self.is_selected(headers, item, region):
+                    batch.append(item)
+                else:
+                    self.skipped += 1
+
+            if len(batch) > (0 if headers is None else 1):
+                self.dispatch(label, batch, target)
+
+    def get_headers(self, label, item):
+        """
+        Rebuilds column headers of some record
+
+        :param label: the function of updaters, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param item: a record of the report
+        :type item: ``list``
+
+        :return: column headers, or `None` if the record is not valid
+        :rtype: ``list`` of ``str``
+        """
+
+        if label == 'update_summary_usage':
+            if len(item) == len(self.SUMMARY_USAGE_HEADERS):
+                return self.SUMMARY_USAGE_HEADERS
+
+        elif label == 'update_detailed_usage':
+            tags = (len(item) - len(self.DETAILED_USAGE_HEAD)
+                    - len(self.DETAILED_USAGE_TAIL))
+            if tags >= 0:
+                return (self.DETAILED_USAGE_HEAD
+                        + ['"user: tag {}"'.format(x) for x in range(tags)]
+                        + self.DETAILED_USAGE_TAIL)
+
+        elif label == 'update_audit_log':
+            if len(item) == len(self.AUDIT_LOG_HEADERS):
+                return self.AUDIT_LOG_HEADERS
+
+        return None
+
+    def get_region(self, label, item):
+        """
+        Finds the region of some record
+
+        :param label: the function of updaters, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param item: a record of the report
+        :type item: ``list``
+
+        :return: the region, e.g., 'dd-eu', or '' if the record is not bound
+            to a region, or `None` if the region is not known
+        :rtype: ``str``
+        """
+
+        if label == 'update_audit_log':
+            matches = re.match(r'.*\[([^\[\]_]+)_[^\[\]]*\]\s*$', item[7])
+            if matches is None:
+                return ''
+
+            location = matches.group(1)
+            if location in self.DATACENTERS.values():
+                return location
+
+        elif label == 'update_summary_usage':
+            location = item[1]
+
+        else:
+            location = item[3]
+
+        if not location.strip():
+            return ''
+
+        return self.get_datacenter_region(location)
+
+    def get_datacenter_region(self, location):
+        """
+        Finds the region of some data center
+
+        :param location: the code of the data center, e.g., 'EU6'
+        :type location: ``str``
+
+        :return: the region, e.g., 'dd-eu', or `None` if it is not known
+        :rtype: ``str``
+        """
+
+        matches = re.match(r'([A-Za-z]+)\d+$', location.strip())
+        if matches is None:
+            return None
+
+        return self.DATACENTERS.get(matches.group(1).upper())
+
+    def get_default_region(self):
+        """
+        Provides the region of records that are not bound to a region
+        """
+
+        if self.regions:
+            return self.regions[0]
+
+        return 'dd-eu'
+
+    def is_selected(self, headers, item, region):
+        """
+        Checks that some record should be replayed
+
+        :param headers: column headers, or `None` for server updates
+        :type headers: ``list`` of ``str``
+
+        :param item: a record
+        :type item: ``list`` or ``dict``
+
+        :param region: the region of the record, or '' if it is not bound
+            to a region
+        :type region: ``str``
+
+        :return: `True` if the record is in the selected dates and regions
+        :rtype: ``bool``
+        """
+
+        if self.regions and region and region not in self.regions:
+            return False
+
+        if self.first is None and self.last is None:
+            return True
+
+        day = self.get_day(headers, item)
+        if day is None:
+            return False
+
+        if self.first and day < self.first:
+            return False
+
+        if self.last and day > self.last:
+            return False
+
+        return True
+
+    def get_day(self, headers, item):
+        """
+        Finds the day of some record
+
+        :return: the day, e.g., '2017-01-31', or `None` if it is not known
+        :rtype: ``str``
+        """
+
+        if headers is None:  # server update
+            stamp = item.get('stamp') or ''
+
+        else:
+            stamp = ''
+            for name in self.DAY_COLUMNS:
+                if name in headers:
+                    column = headers.index(name)
+                    if column < len(item):
+                        stamp = item[column]
+                    break
+
+        day = stamp[:10]
+        if re.match(r'\d{4}-\d{2}-\d{2}$', day):
+            return day
+
+        return None
+
+    def dispatch(self, label, batch, region):
+        """
+        Passes a batch of records to active updaters
+
+        :param label: the function of updaters, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param batch: records, headers first except for server updates
+        :type batch: ``list``
+
+        :param region: the target region, e.g., 'dd-eu' or 'acme@dd-eu'
+        :type region: ``str``
+
+        """
+
+        updaters = [x for x in self.pump.updaters if x.get('active', False)]
+        if len(updaters) < 1:
+            return
+
+        try:
+            self.pump.dispatch_batch(label, batch, updaters, region)
+
+        except RuntimeError as feedback:
+            logging.warning("- {}".format(str(feedback)))
+            return
+
+        count = len(batch)
+        if label != 'on_servers':
+            count -= 1  # headers
+        self.replayed += count
+
+    def get_stats(self):
+        """
+        Reports on the replay
+
+        :return: records read, replayed, skipped by filters, invalid, and
+            of unknown data centers
+        :rtype: ``dict``
+        """
+
+        return {
+            'read': self.read,
+            'replayed': self.replayed,
+            'skipped': self.skipped,
+            'invalid': self.invalid,
+            'unknown': self.unknown,
+        }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(
+        description='Re-ingests records from local archives')
+    parser.add_argument('spools', nargs='*',
+                        help='spool files to replay, instead of log files')
+    parser.add_argument('--since', help='first day, e.g., 2017-01-01')
+    parser.add_argument('--until', help='last day, e.g., 2017-03-31')
+    parser.add_argument('--region', action='append', dest='regions',
+                        help='region to replay, e.g., dd-eu')
+    parser.add_argument('--account',
+                        help='account of log files to replay, e.g., acme')
+    parser.add_argument('--reset', action='store_true',
+                        help='empty stores before replay')
+    args = parser.parse_args()
+
+    # no checkpoint, since the API is not used
+    #
+    try:
+        settings = dict(config.pump)
+    except:
+        settings = {}
+    settings.pop('checkpoint', None)
+
+    pump = Pump(settings)
+    pump.set_updaters()
+
+    # do not write log files that are being read
+    #
+    if not args.spools:
+        from models.files import FilesUpdater
+        pump.updaters = [x for x in pump.updaters
+                         if not isinstance(x, FilesUpdater)]
+
+    replay = Replay(pump,
+                    first=args.since,
+                    last=args.until,
+                    regions=args.regions,
+                    account=args.account)
+
+    pump.open_updaters(args.reset)
+    try:
+        if args.spools:
+            for path in args.spools:
+                replay.from_spool(path)
+
+        else:
+            try:
+                replay.from_files(config.files)
+            except AttributeError:
+                replay.from_files()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        pump.close_updaters()
+
+    logging.info("Replay: {}".format(replay.get_stats()))
@@ -0,0 +1,213 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import ctypes
+import ctypes.util
+import logging
+import sys
+import time
+
+
+def get_monotonic():
+    """
+    Provides a clock that is not changed by adjustments of the system time
+
+    :return: a function that gives seconds from some fixed point
+    :rtype: ``callable``
+
+    Python 2 has no ``time.monotonic()``, and ``clock_gettime()`` is called
+    from the C library under Linux. Elsewhere, the wall clock is used, and
+    it is only prevented from going backwards, so that a step of the system
+    time does not move deadlines back. A step forward still makes polls
+    late, and they are skipped by ``Scheduler.advance()``.
+    """
+
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+
+    if sys.platform.startswith('linux'):
+        try:
+            return get_clock_gettime(1)  # CLOCK_MONOTONIC
+
+        except (AttributeError, OSError, TypeError) as feedback:
+            logging.debug("- no monotonic clock: {}".format(feedback))
+
+    return get_steady(time.time)
+
+
+def get_clock_gettime(clock):
+    """
+    Binds to ``clock_gettime()`` of the C library
+
+    :param clock: the identifier of the clock, e.g., 1 for CLOCK_MONOTONIC
+    :type clock: ``int``
+
+    :return: a function that gives seconds of the clock
+    :rtype: ``callable``
+
+    """
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    name = ctypes.util.find_library('rt') or ctypes.util.find_library('c')
+    library = ctypes.CDLL(name, use_errno=True)
+    function = library.clock_gettime
+    function.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    def clock_gettime():
+        value = timespec()
+        if function(clock, ctypes.byref(value)) != 0:
+            raise OSError(ctypes.get_errno(), 'clock_gettime() has failed')
+        return value.tv_sec + value.tv_nsec * 1e-9
+
+    clock_gettime()  # fails here if the clock is not available
+    return clock_gettime
+
+
+def get_steady(clock):
+    """
+    Prevents some clock from going backwards
+
+    :param clock: a function that gives seconds, e.g., ``time.time``
+    :type clock: ``callable``
+
+    :return: a function that never gives less than it has given before
+    :rtype: ``callable``
+
+    """
+
+    state = {'last': clock()}
+
+    def steady():
+        state['last'] = max(state['last'], clock())
+        return state['last']
+
+    return steady
+
+
+# a clock that is not changed by adjustments of the system time
+#
+monotonic = get_monotonic()
+
+
+class Scheduler(object):
+    """
+    Paces the real-time polling of one region
+
+    Deadlines are computed from the previous deadline, and not from the end
+    of the previous poll, so that time spent polling does not make the
+    schedule drift. The interval between polls is reset to its minimum
+    when some activity is found, and grows progressively up to its maximum
+    while nothing happens.
+    """
+
+    def __init__(self, interval=60, minimum=15, maximum=300, growth=1.5,
+                 phase=0.0):
+        """
+        Sets a new schedule
+
+        :param interval: initial seconds between polls
+        :type interval: ``float``
+
+        :param minimum: seconds between polls when there is activity
+        :type minimum: ``float``
+
+        :param maximum: seconds between polls when nothing happens
+        :type maximum: ``float``
+
+        :param growth: factor applied to the interval after an idle poll
+        :type growth: ``float``
+
+        :param phase: seconds before the first poll
+        :type phase: ``float``
+
+        """
+
+        assert 0 < minimum <= maximum
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+
+        self.interval = min(self.maximum, max(self.minimum, float(interval)))
+        self.growth = float(growth)
+
+        self.deadline = monotonic() + phase
+
+    @classmethod
+    def from_settings(cls, settings={}, phase=0.0):
+        """
+        Builds a schedule out of the configuration file
+
+        :param settings: the parameters of the pump, e.g., ``config.pump``
+        :type settings: ``dict``
+
+        :param phase: seconds before the first poll
+        :type phase: ``float``
+
+        :return: a new schedule
+        :rtype: ``Scheduler``
+
+        Intervals between polls can be set like this::
+
+            pump = {
+                'tick_interval': 60,
+                'tick_min': 15,
+                'tick_max': 300,
+            }
+
+        """
+
+        return cls(interval=settings.get('tick_interval', 60),
+                   minimum=settings.get('tick_min', 15),
+                   maximum=settings.get('tick_max', 300),
+                   phase=phase)
+
+    def get_delay(self):
+        """
+        Computes the time before next poll
+
+        :return: seconds to wait, or 0 if the poll is due
+        :rtype: ``float``
+        """
+
+        return max(0.0, self.deadline - monotonic())
+
+    def advance(self, activity=None):
+        """
+        Sets the deadline of next poll
+
+        :param activity: the number of events found by last poll, or `None`
+            if the poll has failed
+        :type activity: ``int`` or `None`
+
+        :return: seconds before next poll
+        :rtype: ``float``
+        """
+
+        if activity:
+            self.interval = self.minimum
+
+        elif activity is not None:
+            self.interval = min(self.maximum, self.interval * self.growth)
+
+        self.deadline += self.interval
+
+        now = monotonic()
+        if self.deadline < now:  # late, skip missed polls
+            logging.debug("- poll is late by {:.1f} seconds".format(
+                now - self.deadline))
+            self.deadline = now
+
+        return self.deadline - now
@@ -0,0 +1,275 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import errno
+import fcntl
+import gzip
+import io
+import json
+import logging
+import os
+import time
+import zlib
+
+
+class Spool(object):
+    """
+    Keeps batches on disk while a store is not available
+
+    Batches are appended to a file of JSON lines, compressed with gzip, one
+    gzip member per batch, so that the file is never rewritten. A lock on
+    the file is taken on every append, and several processes can use the
+    same spool.
+
+    To drain the spool, the file is first renamed, so that new batches go
+    to a fresh file, then batches are replayed in order. A batch that fails
+    is kept, with all batches after it, for next attempt. Only one process
+    drains the spool at a time.
+    """
+
+    CHUNK_SIZE = 65536
+
+    def __init__(self, path):
+        """
+        Sets a new spool
+
+        :param path: the spool file, e.g., './cache/spool-elastic.jsonl.gz'
+        :type path: ``str``
+
+        """
+
+        self.path = path
+        self.draining = path + '.draining'
+
+        self.appended = 0
+        self.drained = 0
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            try:
+                os.makedirs(folder)
+            except OSError as feedback:  # prevent race condition
+                if feedback.errno != errno.EEXIST:
+                    raise
+
+    def append(self, label, items, region='dd-eu', account=None):
+        """
+        Saves a batch in the spool
+
+        :param label: the function of updaters, e.g., 'update_audit_log'
+        :type label: ``str``
+
+        :param items: the data passed to the updater
+        :type items: ``list``
+
+        :param region: the target region, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param account: the MCP account, or `None` if there is only one
+        :type account: ``str``
+
+        """
+
+        record = {'label': label,
+                  'region': region,
+                  'items': items,
+                  'stamp': time.time()}
+        if account:
+            record['account'] = account
+
+        data = self.encode(record)
+
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            with open(self.path, 'ab') as handle:
+                handle.write(data)
+
+        self.appended += 1
+
+    def encode(self, record):
+        """
+        Compresses one batch
+
+        :param record: the batch, with label, items, region and stamp
+        :type record: ``dict``
+
+        :return: a gzip member with one JSON line
+        :rtype: ``bytes``
+        """
+
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb') as handle:
+            handle.write((json.dumps(record) + '\n').encode('utf-8'))
+
+        return buffer.getvalue()
+
+    def read(self, path):
+        """
+        Reads batches of some spool file
+
+        :param path: the file to read
+        :type path: ``str``
+
+        :return: batches, in the order of the spool
+        :rtype: iterator of ``dict``
+
+        Members are decompressed one after the other, so that a batch that
+        has been cut by a crash does not hide the batches before it.
+        """
+
+        if not os.path.exists(path):
+            return
+
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        pending = b''
+        with open(path, 'rb') as handle:
+            while True:
+                data = handle.read(self.CHUNK_SIZE)
+                if not data:
+                    break
+
+                while data:
+                    try:
+                        pending += decompressor.decompress(data)
+                    except zlib.error as feedback:
+                        logging.warning("- corrupted spool {}".format(path))
+                        logging.debug(feedback)
+                        return
+
+                    data = decompressor.unused_data
+                    if data:  # next member
+                        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+                    while b'\n' in pending:
+                        line, pending = pending.split(b'\n', 1)
+                        yield json.loads(line.decode('utf-8'))
+
+        if pending:
+            logging.warning("- truncated spool {}".format(path))
+
+    def drain(self, handler, rate=10.0):
+        """
+        Replays batches of the spool
+
+        :param handler: the function called for every batch, with label,
+            items, region and account if any, that returns `False` on failure
+        :type handler: ``callable``
+
+        :param rate: batches per second
+        :type rate: ``float``
+
+        :return: the number of batches replayed
+        :rtype: ``int``
+
+        """
+
+        guard = open(self.path + '.drain', 'a')
+        try:
+            try:
+                fcntl.flock(guard, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:  # drained by another process
+                return 0
+
+            if not os.path.exists(self.draining):
+                with open(self.path + '.lock', 'a') as lock:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    if not os.path.exists(self.path):
+                        return 0
+                    os.rename(self.path, self.draining)
+
+            count = 0
+            records = self.read(self.draining)
+            for record in records:
+                start = time.time()
+                tags = {}
+                if record.get('account'):
+                    tags['account'] = record['account']
+
+                if handler(record['label'],
+                           record['items'],
+                           record['region'],
+                           **tags) is False:
+                    self.keep([record], records)
+                    break
+
+                count += 1
+                time.sleep(max(0.0, 1.0 / rate - (time.time() - start)))
+
+            else:
+                os.remove(self.draining)
+
+            self.drained += count
+            if count:
+                logging.info("- replayed {} batches from {}".format(
+                    count, self.path))
+            return count
+
+        finally:
+            guard.close()
+
+    def keep(self, *records):
+        """
+        Replaces the draining file with batches that have not been replayed
+
+        :param records: iterators of batches to keep
+        :type records: ``list`` of iterators
+
+        """
+
+        path = self.draining + '.tmp'
+        with open(path, 'wb') as handle:
+            for batch in records:
+                for record in batch:
+                    handle.write(self.encode(record))
+
+        os.rename(path, self.draining)
+
+    def is_empty(self):
+        """
+        Tells if there is nothing to drain
+
+        :return: `True` if the spool is empty
+        :rtype: ``bool``
+        """
+
+        return not (os.path.exists(self.path)
+                    or os.path.exists(self.draining))
+
+    def get_stats(self):
+        """
+        Reports on the spool
+
+        :return: the size on disk in bytes, the age of the oldest batch in
+            seconds, and batches appended and replayed by this process
+        :rtype: ``dict``
+        """
+
+        size = 0
+        age = 0
+        for path in (self.draining, self.path):
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                continue
+
+            if not age:
+                for record in self.read(path):
+                    age = int(time.time() - record['stamp'])
+                    break
+
+        return {'bytes': size,
+                'age': age,
+                'appended': self.appended,
+                'drained': self.drained}
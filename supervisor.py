@@ -0,0 +1,476 @@
+# Licensed to the Apache Software Foundation (ASF) under one or more
+# contributor license agreements.  See the NOTICE file distributed with
+# this work for additional information regarding copyright ownership.
+# The ASF licenses this file to You under the Apache License, Version 2.0
+# (the "License"); you may not use this file except in compliance with
+# the License.  You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+from multiprocessing import Process, Queue, Value
+import os
+import resource
+import time
+
+
+class Heartbeat(object):
+    """
+    Tells the supervisor that a worker is alive, and when it is worn out
+
+    The heartbeat is shared between the supervisor and the process of the
+    worker, and it is kept across restarts of the worker.
+    """
+
+    def __init__(self, tasks=1000, rss=512):
+        """
+        Sets a new heartbeat
+
+        :param tasks: tasks done before the process is recycled, or 0
+        :type tasks: ``int``
+
+        :param rss: megabytes of resident memory before the process is
+            recycled, or 0
+        :type rss: ``int``
+
+        """
+
+        self.max_tasks = tasks
+        self.max_rss = rss
+
+        self.stamp = Value('d', time.time())
+        self.tasks = Value('i', 0)  # tasks done by the current process
+        self.taken = Value('i', 0)  # messages got by the current process
+
+    def beat(self):
+        """
+        Signals that the worker is alive
+        """
+
+        self.stamp.value = time.time()
+
+    def count(self):
+        """
+        Signals that the worker has done one more task
+        """
+
+        self.tasks.value += 1
+        self.beat()
+
+    def take(self):
+        """
+        Signals that the worker has got one more message
+        """
+
+        self.taken.value += 1
+
+    def reset(self):
+        """
+        Restarts counters for a new process
+        """
+
+        self.tasks.value = 0
+        self.taken.value = 0
+        self.beat()
+
+    def get_silence(self):
+        """
+        Measures the time since the last heartbeat
+
+        :return: seconds since the worker has been seen alive
+        :rtype: ``float``
+        """
+
+        return time.time() - self.stamp.value
+
+    @staticmethod
+    def get_rss():
+        """
+        Measures the resident memory of the current process
+
+        :return: megabytes of resident memory
+        :rtype: ``float``
+
+        The peak of resident memory is used where /proc is not available.
+        """
+
+        try:
+            with open('/proc/self/statm') as handle:
+                pages = int(handle.read().split()[1])
+            return pages * resource.getpagesize() / 1048576.0
+
+        except (IOError, OSError, IndexError, ValueError):
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return peak / 1024.0  # in kilobytes under linux
+
+    def is_worn(self):
+        """
+        Tells if the process of the worker should be recycled
+
+        :return: `True` if the process has done enough tasks, or if it uses
+            too much memory
+        :rtype: ``bool``
+        """
+
+        if self.max_tasks and self.tasks.value >= self.max_tasks:
+            logging.info("- recycling worker {} after {} tasks".format(
+                os.getpid(), self.tasks.value))
+            return True
+
+        if self.max_rss:
+            rss = self.get_rss()
+            if rss > self.max_rss:
+                logging.info("- recycling worker {} at {:.0f} MB".format(
+                    os.getpid(), rss))
+                return True
+
+        return False
+
+
+class Inbox(object):
+    """
+    Passes messages to a worker, and counts messages that it has got
+
+    The supervisor knows from the count which messages have not been got
+    by the process, and sends them again to the next process if this one
+    dies.
+    """
+
+    def __init__(self, queue, heart):
+        """
+        Sets a new inbox
+
+        :param queue: the queue of the current process of the worker
+        :type queue: ``multiprocessing.Queue``
+
+        :param heart: the heartbeat of the worker
+        :type heart: ``Heartbeat``
+
+        """
+
+        self.queue = queue
+        self.heart = heart
+
+    def get(self, block=True, timeout=None):
+        """
+        Gets next message, like ``Queue.get()``
+        """
+
+        message = self.queue.get(block, timeout)
+        self.heart.take()
+        return message
+
+    def put(self, message):
+        """
+        Adds a message, like ``Queue.put()``
+        """
+
+        self.queue.put(message)
+
+
+class Worker(object):
+    """
+    Describes a worker and the process that runs it
+    """
+
+    def __init__(self, kind, region, target, heart, sticky=False):
+        """
+        Sets a new worker
+
+        :param kind: the type of worker, e.g., 'day' or 'minute'
+        :type kind: ``str``
+
+        :param region: the region handled by this worker, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param target: the function ran by the process, with queue, region
+            and heartbeat as parameters
+        :type target: ``callable``
+
+        :param heart: the heartbeat of the worker
+        :type heart: ``Heartbeat``
+
+        :param sticky: if the last message is sent again after a restart
+        :type sticky: ``bool``
+
+        """
+
+        self.kind = kind
+        self.region = region
+        self.target = target
+        self.heart = heart
+        self.sticky = sticky
+
+        self.queue = None   # a new one for every process
+        self.retired = None  # the queue of the previous process
+        self.process = None
+        self.last = None
+        self.pending = []   # messages put in the queue, maybe not got yet
+        self.forgotten = 0  # messages got by the process and dropped
+
+        self.started = 0.0
+        self.failures = 0   # consecutive abnormal ends
+        self.restarts = 0   # abnormal ends
+        self.recycles = 0   # normal ends
+        self.next_start = 0.0
+
+
+class Supervisor(object):
+    """
+    Keeps workers running
+
+    Every worker is a process that handles one region. The supervisor
+    checks periodically that every process is alive and has given a sign
+    of life recently. A process that has died, e.g., from an uncaught
+    exception or from an out-of-memory kill, or that has been silent for too
+    long, is started again, after some delay that grows exponentially with
+    consecutive failures. A process that has ended by itself, because it
+    was worn out, is started again immediately.
+
+    This can be set in the configuration file, like this::
+
+        pump = {
+            'worker_timeout': 3600,
+            'worker_backoff': 1.0,
+            'worker_backoff_max': 300.0,
+            'worker_tasks': 1000,
+            'worker_rss': 512,
+            'heartbeat': 30,
+        }
+
+    """
+
+    def __init__(self, settings={}):
+        """
+        Sets a new supervisor
+
+        :param settings: the parameters of the pump, e.g., ``config.pump``
+        :type settings: ``dict``
+
+        """
+
+        self.settings = settings
+
+        self.timeout = settings.get('worker_timeout', 3600)
+        self.backoff = float(settings.get('worker_backoff', 1.0))
+        self.backoff_max = float(settings.get('worker_backoff_max', 300.0))
+
+        self.workers = []
+
+    def add(self, kind, region, target, sticky=False):
+        """
+        Starts a new worker
+
+        :param kind: the type of worker, e.g., 'day' or 'minute'
+        :type kind: ``str``
+
+        :param region: the region handled by this worker, e.g., 'dd-eu'
+        :type region: ``str``
+
+        :param target: the function ran by the process, with queue, region
+            and heartbeat as parameters
+        :type target: ``callable``
+
+        :param sticky: if the last message is sent again after a restart
+        :type sticky: ``bool``
+
+        :return: the new worker
+        :rtype: ``Worker``
+
+        """
+
+        heart = Heartbeat(tasks=self.settings.get('worker_tasks', 1000),
+                          rss=self.settings.get('worker_rss', 512))
+
+        worker = Worker(kind, region, target, heart, sticky)
+        self.workers.append(worker)
+        self.start(worker)
+        return worker
+
+    def start(self, worker):
+        """
+        Starts the process of a worker
+
+        :param worker: the worker to start
+        :type worker: ``Worker``
+
+        A process that has been killed while it was waiting for a message
+        may still hold the lock of its queue, and no other process could
+        ever get messages from it. Therefore every process has its own
+        queue, and messages that have not been got from the previous queue
+        are sent again in the new one.
+        """
+
+        self.forget(worker)
+        messages = list(worker.pending)
+        if worker.sticky and worker.last is not None and not messages:
+            messages = [worker.last]
+
+        if worker.retired is not None:  # its messages have been flushed
+            worker.retired.close()
+
+        worker.retired = worker.queue  # kept until it has been flushed
+        if worker.retired is not None:  # do not wait for a dead reader
+            worker.retired.cancel_join_thread()
+
+        worker.heart.reset()
+        worker.forgotten = 0
+
+        worker.queue = Queue()
+        worker.pending = []
+        for message in messages:
+            worker.pending.append(message)
+            worker.queue.put(message)
+
+        worker.process = Process(target=worker.target,
+                                 args=(Inbox(worker.queue, worker.heart),
+                                       worker.region,
+                                       worker.heart))
+        worker.process.daemon = True
+        worker.process.start()
+        worker.started = time.time()
+
+    def send(self, kind, message):
+        """
+        Passes a message to workers of some type
+
+        :param kind: the type of worker, e.g., 'day' or 'minute'
+        :type kind: ``str``
+
+        :param message: the message, e.g., a day to process
+        :type message: ``object``
+
+        """
+
+        for worker in self.workers:
+            if worker.kind == kind:
+                worker.last = message
+                self.forget(worker)
+                worker.pending.append(message)
+                worker.queue.put(message)
+
+    def recycle(self, region):
+        """
+        Asks workers of some region to end, so that they are started again
+
+        :param region: the region of workers, e.g., 'dd-eu'
+        :type region: ``str``
+
+        Workers end after messages that have been sent before, and are
+        started again by ``check()``, e.g., to use new endpoints.
+        """
+
+        for worker in self.workers:
+            if worker.region == region:
+                self.forget(worker)
+                worker.pending.append('STOP')
+                worker.queue.put('STOP')
+
+    def forget(self, worker):
+        """
+        Drops messages that the process of a worker has got
+
+        :param worker: the worker to consider
+        :type worker: ``Worker``
+
+        """
+
+        taken = worker.heart.taken.value
+        del worker.pending[:taken - worker.forgotten]
+        worker.forgotten = taken
+
+    def check(self):
+        """
+        Restarts workers that have died, hung, or been recycled
+
+        :return: the number of workers that have been started again
+        :rtype: ``int``
+        """
+
+        now = time.time()
+        started = 0
+        for worker in self.workers:
+
+            process = worker.process
+            if process is not None and process.is_alive():
+
+                if worker.heart.get_silence() < self.timeout:
+                    continue
+
+                logging.warning("- {} worker for {} is silent, "
+                                "terminating it".format(
+                                    worker.kind, worker.region))
+                process.terminate()
+                process.join(5)
+
+            if process is not None:
+                worker.process = None
+
+                if process.exitcode == 0:
+                    worker.recycles += 1
+                    worker.next_start = now
+
+                else:
+                    if now - worker.started > self.timeout:  # was stable
+                        worker.failures = 0
+
+                    worker.failures += 1
+                    worker.restarts += 1
+                    delay = min(self.backoff_max,
+                                self.backoff * 2 ** (worker.failures - 1))
+                    worker.next_start = now + delay
+
+                    logging.warning("- {} worker for {} has ended with code "
+                                    "{}, restarting in {:.0f} seconds".format(
+                                        worker.kind, worker.region,
+                                        process.exitcode, delay))
+
+            if worker.next_start <= now:
+                self.start(worker)
+                started += 1
+
+        return started
+
+    def stop(self, timeout=10):
+        """
+        Stops all workers
+
+        :param timeout: seconds given to every worker to stop by itself
+        :type timeout: ``float``
+
+        """
+
+        for worker in self.workers:
+            worker.queue.put('STOP')
+
+        for worker in self.workers:
+            if worker.process is not None:
+                worker.process.join(timeout)
+                if worker.process.is_alive():
+                    worker.process.terminate()
+
+    def get_stats(self):
+        """
+        Reports on workers
+
+        :return: restarts after failures and recycles, per region
+        :rtype: ``dict``
+        """
+
+        report = {}
+        for worker in self.workers:
+            stats = report.setdefault(worker.region, {'restarts': 0,
+                                                      'recycles': 0,
+                                                      'alive': 0})
+            stats['restarts'] += worker.restarts
+            stats['recycles'] += worker.recycles
+            if worker.process is not None and worker.process.is_alive():
+                stats['alive'] += 1
+
+        return report
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.abspath('..'))
+
+try:
+    import asyncio
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from async_endpoint import AsyncEndpoint, collect
+
+except (ImportError, SyntaxError):  # python 2, or no aiohttp
+    AsyncEndpoint = None
+    BaseHTTPRequestHandler = object
+
+from test.test_endpoint import node_1_body, node_1_dict
+from test.test_endpoint import node_2_body, node_2_dict
+from test.test_endpoint import nat_rules_page_1
+
+
+audit_log = (b'UUID,Time,Create User,Details\r\n'
+             b'1,2017-05-01 07:05:12,foo.bar,"Server, with a comma"\r\n'
+             b'2,2017-05-01 07:05:13,foo.bar,plain\r\n')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Mimics the API of the MCP
+    """
+
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+
+        if self.path == '/oec/0.9/myaccount':
+            body = b'<ns3:orgId>abcd-1234</ns3:orgId>'
+
+        elif self.path.startswith('/oec/0.9/abcd-1234/auditlog?'):
+            body = audit_log
+
+        elif self.path.startswith('/caas/2.5/abcd-1234/network/natRule?'):
+            body = nat_rules_page_1.encode('utf-8')
+
+        elif self.path.startswith('/caas/2.5/abcd-1234/server/server/'):
+            id = self.path.split('/')[-1]
+            if id == node_1_dict['id']:
+                body = node_1_body.encode('utf-8')
+            elif id == node_2_dict['id']:
+                body = node_2_body.encode('utf-8')
+            else:
+                self.send_error(404)
+                return
+
+        else:
+            self.send_error(400)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@unittest.skipIf(AsyncEndpoint is None, 'requires python 3 and aiohttp')
+class AsyncEndpointTests(unittest.TestCase):
+
+    def setUp(self):
+        StubHandler.requests = []
+        self.server = HTTPServer(('127.0.0.1', 0), StubHandler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_audit_log(self):
+
+        print('***** Test async audit log ***')
+
+        handle = AsyncEndpoint(key='k', secret='s', region='dd-eu',
+                               endpoint=self.url)
+
+        try:
+            rows = self.loop.run_until_complete(collect(
+                handle.audit_log_report('2017-04-30', '2017-05-01')))
+        finally:
+            self.loop.run_until_complete(handle.close())
+
+        self.assertEqual(rows, [
+            ['UUID', 'Time', 'Create User', 'Details'],
+            ['1', '2017-05-01 07:05:12', 'foo.bar', 'Server, with a comma'],
+            ['2', '2017-05-01 07:05:13', 'foo.bar', 'plain']])
+
+        self.assertEqual(handle.orgId, 'abcd-1234')
+        self.assertEqual(handle.calls, 2)
+
+    def test_nodes(self):
+
+        print('***** Test async nodes ***')
+
+        handle = AsyncEndpoint(key='k', secret='s', region='dd-eu',
+                               endpoint=self.url, orgId='abcd-1234',
+                               settings={'concurrency': 2})
+
+        ids = [node_1_dict['id'], node_2_dict['id'], 'unknown'] * 3
+
+        try:
+            nodes = self.loop.run_until_complete(asyncio.gather(
+                *[handle.get_node_by_id(id) for id in ids]))
+        finally:
+            self.loop.run_until_complete(handle.close())
+
+        expected = dict(node_1_dict)
+        expected['public_ip'] = '168.128.13.201'
+        self.assertEqual(nodes[0], expected)
+        self.assertEqual(nodes[1], node_2_dict)
+        self.assertEqual(nodes[2], None)
+
+        nat_calls = [x for x in StubHandler.requests if 'natRule' in x]
+        self.assertEqual(len(nat_calls), 2)  # one listing per domain
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
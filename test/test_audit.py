@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from audit import AuditTail
+
+
+def record(uid, stamp):
+    return [uid, '2017-05-01 '+stamp, 'foo.bar']
+
+
+class AuditTailTests(unittest.TestCase):
+
+    def test_tail(self):
+
+        print('***** Test audit tail ***')
+
+        tail = AuditTail(slack=60)
+
+        rows = [record('a', '07:00:00'), record('b', '07:05:00')]
+        self.assertEqual(tail.tail(rows), rows)
+        self.assertEqual(tail.tail(rows), [])
+        self.assertEqual(tail.stamp, '2017-05-01 07:05:00')
+        self.assertEqual(tail.floor, '2017-05-01 07:04:00')
+        self.assertEqual(list(tail.uids.keys()), ['b'])  # a is out of slack
+
+        rows = [record('a', '07:00:00'),
+                record('c', '07:04:30'),  # written late
+                record('b', '07:05:00'),
+                record('d', '07:05:00'),
+                record('e', '07:06:00')]
+        self.assertEqual(tail.tail(rows), [rows[1], rows[3], rows[4]])
+        self.assertEqual(tail.tail(rows), [])
+
+    def test_seek(self):
+
+        print('***** Test audit seek ***')
+
+        tail = AuditTail()
+        rows = [record(str(index), '07:{:02d}:00'.format(index))
+                for index in range(60)]
+
+        self.assertEqual(tail.seek(rows, 1, '2017-05-01 00:00:00'), 0)
+        self.assertEqual(tail.seek(rows, 1, '2017-05-01 07:30:00'), 30)
+        self.assertEqual(tail.seek(rows, 1, '2017-05-01 07:30:30'), 31)
+        self.assertEqual(tail.seek(rows, 1, '2017-05-01 09:00:00'), 60)
+
+    def test_state(self):
+
+        print('***** Test audit state ***')
+
+        tail = AuditTail()
+        tail.tail([record('a', '07:00:00'),
+                   record('b', '07:05:00'),
+                   record('c', '07:05:00')])
+
+        state = tail.get_state()
+        self.assertEqual(state['stamp'], '2017-05-01 07:05:00')
+        self.assertEqual(state['uids'], ['b', 'c'])
+
+        tail = AuditTail()
+        tail.set_state(state)
+
+        rows = [record('a', '07:00:00'),
+                record('b', '07:05:00'),
+                record('c', '07:05:00'),
+                record('d', '07:05:00'),
+                record('e', '07:06:00')]
+        self.assertEqual(tail.tail(rows), rows[3:])
+
+    def test_size(self):
+
+        print('***** Test audit index size ***')
+
+        tail = AuditTail(size=10)
+        tail.tail([record(str(index), '07:00:00') for index in range(50)])
+        self.assertEqual(len(tail.uids), 10)
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import mock
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from breaker import CircuitBreaker
+
+
+class BreakerTests(unittest.TestCase):
+
+    def test_breaker(self):
+
+        print('***** Test circuit breaker ***')
+
+        with mock.patch('breaker.time.time', return_value=1000.0) as clock:
+
+            breaker = CircuitBreaker(failures=2, reset=30)
+            self.assertTrue(breaker.allow())
+
+            breaker.fail()
+            self.assertTrue(breaker.is_closed())
+            breaker.succeed()  # consecutive failures only
+            breaker.fail()
+            self.assertTrue(breaker.allow())
+            breaker.fail()
+            self.assertEqual(breaker.state, 'open')
+            self.assertFalse(breaker.allow())
+
+            clock.return_value = 1030.0
+            self.assertTrue(breaker.allow())  # one probe
+            self.assertFalse(breaker.allow())
+            breaker.fail()
+            self.assertEqual(breaker.state, 'open')
+
+            clock.return_value = 1060.0
+            self.assertTrue(breaker.allow())
+            breaker.succeed()
+            self.assertTrue(breaker.is_closed())
+            self.assertTrue(breaker.allow())
+
+            self.assertEqual(breaker.trips, 1)
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from cache import Cache
+
+
+class CacheTests(unittest.TestCase):
+
+    def test_lru(self):
+
+        print('***** Test lru ***')
+
+        cache = Cache(size=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)  # b is now least recently used
+
+        cache.put('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('c'), 3)
+
+        cache.forget('c')
+        self.assertEqual(cache.get('c', '*default'), '*default')
+
+        self.assertEqual(cache.get_stats(),
+                         {'hits': 2, 'misses': 2, 'evictions': 1, 'size': 1})
+
+    def test_ttl(self):
+
+        print('***** Test ttl ***')
+
+        cache = Cache(ttl=-1)
+        cache.put('a', 1)
+        self.assertEqual(cache.get('a'), None)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_persistence(self):
+
+        print('***** Test persistence ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, 'sub', 'nodes.json')
+
+            cache = Cache(path=path)
+            cache.put('a', {'name': 'web'})
+            cache.put('b', [1, 2])
+            cache.save()
+            self.assertFalse(cache.dirty)
+
+            cache = Cache(path=path)
+            cache.load()
+            self.assertEqual(cache.get('a'), {'name': 'web'})
+            self.assertEqual(cache.get('b'), [1, 2])
+
+            with open(path, 'w') as handle:
+                handle.write('*corrupted')
+
+            cache = Cache(path=path)
+            cache.load()
+            self.assertEqual(len(cache), 0)
+
+        finally:
+            shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+from datetime import date
+import unittest
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from checkpoint import Checkpoint
+
+
+class CheckpointTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'sub', 'checkpoint.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_tasks(self):
+
+        print('***** Test checkpoint tasks ***')
+
+        store = Checkpoint(self.path)
+        self.assertTrue(store.is_empty())
+        self.assertEqual(store.get_last_day(), None)
+
+        window = (date(2017, 5, 1), date(2017, 5, 7))
+        tasks = [('dd-eu', window, 'summary_usage'),
+                 ('dd-eu', date(2017, 5, 1), 'audit_log'),
+                 ('dd-na', date(2017, 5, 1), 'audit_log')]
+        store.add_tasks(tasks)
+
+        store.complete(tasks[0])
+        store.add_tasks(tasks)  # done tasks are not pending again
+
+        store = Checkpoint(self.path)  # as after a restart
+        self.assertFalse(store.is_empty())
+        self.assertEqual(store.get_pending(), tasks[1:])
+        self.assertEqual(store.get_last_day(), date(2017, 5, 7))
+
+    def test_reset(self):
+
+        print('***** Test checkpoint reset ***')
+
+        store = Checkpoint(self.path)
+        window = (date(2017, 5, 1), date(2017, 5, 7))
+        store.add_tasks([('dd-eu', window, 'summary_usage'),
+                         ('dd-eu', date(2017, 5, 8), 'audit_log')])
+        store.complete(('dd-eu', window, 'summary_usage'))
+        store.set_cursor('dd-eu', {'stamp': '2017-05-01 07:05:12'})
+
+        self.assertEqual(store.get_done(),
+                         set([('dd-eu', window, 'summary_usage')]))
+
+        store.reset()
+        self.assertTrue(store.is_empty())
+        self.assertEqual(store.get_pending(), [])
+        self.assertEqual(store.get_cursor('dd-eu'), None)
+
+    def test_cursor(self):
+
+        print('***** Test checkpoint cursor ***')
+
+        store = Checkpoint(self.path)
+        self.assertEqual(store.get_cursor('dd-eu'), None)
+
+        store.set_cursor('dd-eu', {'stamp': '2017-05-01 07:05:12'})
+        store.set_cursor('dd-eu', {'stamp': '2017-05-02 07:05:13'})
+
+        store = Checkpoint(self.path)
+        self.assertEqual(store.get_cursor('dd-eu'),
+                         {'stamp': '2017-05-02 07:05:13'})
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 
 import unittest
+import errno
 import logging
 import os
 import random
+import socket
 import sys
 import time
 import mock
@@ -135,8 +137,246 @@ node_4_dict = {
     'virtualHardware': None
 }
 
+nat_rules_page_1 = """<?xml version="1.0" encoding="UTF-8"?><natRules xmlns="urn:didata.com:api:cloud:types" pageNumber="1" pageCount="2" totalCount="3" pageSize="2"><natRule id="2169a38e-5692-497e-a22a-701a838a6539" datacenterId="EU6"><networkDomainId>*domain</networkDomainId><internalIp>10.0.0.8</internalIp><externalIp>168.128.13.201</externalIp><state>NORMAL</state></natRule><natRule id="2169a38e-5692-497e-a22a-701a838a6540" datacenterId="EU6"><networkDomainId>*domain</networkDomainId><internalIp>10.0.0.9</internalIp><externalIp>168.128.13.202</externalIp><state>NORMAL</state></natRule></natRules>"""
+
+nat_rules_page_2 = """<?xml version="1.0" encoding="UTF-8"?><natRules xmlns="urn:didata.com:api:cloud:types" pageNumber="2" pageCount="1" totalCount="3" pageSize="2"><natRule id="2169a38e-5692-497e-a22a-701a838a6541" datacenterId="EU6"><networkDomainId>*domain</networkDomainId><internalIp>10.0.0.10</internalIp><externalIp>168.128.13.203</externalIp><state>NORMAL</state></natRule></natRules>"""
+
 class EndpointTests(unittest.TestCase):
 
+    def test_session(self):
+
+        print('***** Test session ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org',
+                          settings={'pool_size': 3, 'timeout': 5})
+
+        session = handle.get_session()
+        self.assertEqual(session.auth, ('k', 's'))
+        self.assertEqual(session.get_adapter('https://x')._pool_maxsize, 3)
+        self.assertTrue(handle.get_session() is session)
+
+        handle._pid = -1  # as if we were in a forked worker
+        self.assertFalse(handle.get_session() is session)
+
+        response = mock.Mock(status_code=200)
+        with mock.patch.object(handle.get_session(), 'get',
+                               return_value=response) as mocked:
+
+            self.assertEqual(handle.get('https://x/y'), response)
+            mocked.assert_called_once_with('https://x/y', timeout=5)
+
+        self.assertEqual(handle.calls, 1)
+        self.assertTrue(handle.get_latency() >= 0.0)
+
+    def test_accounts(self):
+
+        print('***** Test accounts ***')
+
+        limiter = mock.Mock()
+        acme = Endpoint(key='a', secret='s', region='dd-eu', orgId='*acme',
+                        settings={'pool_size': 4}, account='acme',
+                        limiter=limiter)
+        globex = Endpoint(key='g', secret='s', region='dd-eu',
+                          orgId='*globex', settings={'pool_size': 4},
+                          account='globex', limiter=limiter)
+
+        self.assertEqual(acme.account, 'acme')
+        self.assertTrue(acme.limiter is globex.limiter)
+
+        self.assertEqual(acme.get_session().auth, ('a', 's'))
+        self.assertEqual(globex.get_session().auth, ('g', 's'))
+        self.assertTrue(acme.get_session().get_adapter('https://x') is
+                        globex.get_session().get_adapter('https://x'))
+
+    def test_retries(self):
+
+        print('***** Test retries ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org',
+                          settings={'api_retries': 2, 'api_backoff': 0.01})
+
+        busy = mock.Mock(status_code=429, headers={'Retry-After': '0.01'})
+        down = mock.Mock(status_code=503, headers={})
+        ok = mock.Mock(status_code=200)
+
+        with mock.patch.object(handle.get_session(), 'get',
+                               side_effect=[busy, socket.error('*reset'),
+                                            ok]):
+            self.assertEqual(handle.get('https://x/y'), ok)
+
+        self.assertEqual(handle.calls, 3)
+        self.assertEqual(handle.retries, 2)
+        self.assertTrue(busy.close.called)
+        self.assertEqual(handle.limiter.failures.value, 0)
+
+        with mock.patch.object(handle.get_session(), 'get',
+                               side_effect=[down, down, down]):
+            self.assertEqual(handle.get('https://x/y'), down)
+
+        with mock.patch.object(handle.get_session(), 'get',
+                               side_effect=socket.error('*reset')):
+            with self.assertRaises(socket.error):
+                handle.get('https://x/y')
+
+    def test_interrupted(self):
+
+        print('***** Test calls interrupted by signals ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org',
+                          settings={'api_retries': 2})
+
+        interrupted = socket.error(errno.EINTR, 'Interrupted system call')
+        wrapped = ConnectionError(ValueError('*pool', interrupted))
+        self.assertTrue(Endpoint.is_interrupted(wrapped))
+        self.assertFalse(Endpoint.is_interrupted(socket.error('*reset')))
+
+        ok = mock.Mock(status_code=200)
+        with mock.patch.object(handle.get_session(), 'get',
+                               side_effect=[wrapped, ok]), \
+                mock.patch.object(handle.limiter, 'fail') as fail:
+            self.assertEqual(handle.get('https://x/y'), ok)
+            self.assertFalse(fail.called)
+
+        self.assertEqual(handle.retries, 0)
+
+    def test_metrics(self):
+
+        print('***** Test metrics of endpoint ***')
+
+        from metrics import registry
+
+        self.assertEqual(Endpoint.get_resource(
+            'https://x/caas/2.5/*org/server/server/'
+            'adb0125b-e10c-4776-ac19-608169c7546c'), '/server/server/:id')
+        self.assertEqual(Endpoint.get_resource(
+            'https://x/oec/0.9/*org/report/usage?startDate=2017-05-01'),
+            '/report/usage')
+        self.assertEqual(Endpoint.get_resource(
+            'https://x/oec/0.9/myaccount'), '/myaccount')
+
+        handle = Endpoint(key='k', secret='s', region='dd-mx',
+                          endpoint='https://x', orgId='*org')
+
+        ok = mock.Mock(status_code=200)
+        with mock.patch.object(handle.get_session(), 'get', return_value=ok):
+            handle.get('https://x/oec/0.9/*org/auditlog?startDate=1')
+
+        rows = list(handle.parse_rows([b'a,b', b'1,2', b'']))
+        self.assertEqual(len(rows), 2)
+
+        key = ('mcp_api_calls_total', (('region', 'dd-mx'),
+                                       ('resource', '/auditlog'),
+                                       ('status', 200)))
+        self.assertEqual(registry.counters[key], 1)
+        self.assertEqual(registry.counters[
+            ('mcp_rows_parsed_total', (('region', 'dd-mx'),))], 2)
+
+    def test_rows(self):
+
+        print('***** Test get_rows ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org')
+
+        response = mock.Mock()
+        response.encoding = 'utf-8'
+        response.iter_lines.return_value = iter([
+            b'UUID,Time,Details',
+            b'',
+            b'1,2017-05-01 07:05:12,"Server, with a comma"',
+            b'2,2017-05-01 07:05:13,plain'])
+
+        with mock.patch.object(handle, 'get', return_value=response):
+
+            rows = handle.audit_log_report('2017-04-30', '2017-05-01')
+            self.assertFalse(response.close.called)  # streamed lazily
+
+            self.assertEqual(list(rows), [
+                ['UUID', 'Time', 'Details'],
+                ['1', '2017-05-01 07:05:12', 'Server, with a comma'],
+                ['2', '2017-05-01 07:05:13', 'plain']])
+
+            self.assertTrue(response.close.called)
+
+    def test_changed_rows(self):
+
+        print('***** Test get_changed_rows ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org')
+
+        body = b'UUID,Time,Details\r\n1,2017-05-01 07:05:12,plain\r\n'
+        first = mock.Mock(status_code=200, content=body, encoding=None,
+                          headers={'ETag': '"v1"'})
+        same = mock.Mock(status_code=200, content=body, encoding=None,
+                         headers={'ETag': '"v1"'})
+        unmodified = mock.Mock(status_code=304, content=b'', headers={})
+        longer = mock.Mock(status_code=200, encoding=None, headers={},
+                           content=body+b'2,2017-05-01 07:05:13,plain\r\n')
+
+        with mock.patch.object(handle, 'get',
+                               side_effect=[first, same, unmodified, longer]):
+
+            rows = handle.audit_log_report('2017-04-30', '2017-05-01',
+                                           changed_only=True)
+            self.assertEqual(rows, [['UUID', 'Time', 'Details'],
+                                    ['1', '2017-05-01 07:05:12', 'plain']])
+
+            for index in range(2):
+                rows = handle.audit_log_report('2017-04-30', '2017-05-01',
+                                               changed_only=True)
+                self.assertEqual(rows, None)
+
+            headers = handle.get.call_args[1]['headers']
+            self.assertEqual(headers, {'If-None-Match': '"v1"'})
+
+            rows = handle.audit_log_report('2017-04-30', '2017-05-01',
+                                           changed_only=True)
+            self.assertEqual(rows, [['UUID', 'Time', 'Details'],  # new only
+                                    ['2', '2017-05-01 07:05:13', 'plain']])
+
+        self.assertEqual(handle.get_poll_stats(),
+                         {'skipped': 2, 'processed': 2})
+
+    def test_changed_rows_appended(self):
+
+        print('***** Test get_changed_rows on appended lines ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org')
+
+        headers = b'UUID,Time,Details\r\n'
+        one = b'1,2017-05-01 07:05:12,plain\r\n'
+        two = b'2,2017-05-01 07:05:13,"with, comma"\r\n'
+        late = b'0,2017-05-01 07:05:11,late\r\n'
+
+        def reply(content):
+            return mock.Mock(status_code=200, content=content, encoding=None,
+                             headers={})
+
+        with mock.patch.object(handle, 'get',
+                               side_effect=[reply(headers + one),
+                                            reply(headers + one + two),
+                                            reply(headers + late + one + two)]):
+
+            rows = handle.audit_log_report('2017-04-30', '2017-05-01',
+                                           changed_only=True)
+            self.assertEqual(len(rows), 2)
+
+            with mock.patch.object(handle, 'parse_rows',
+                                   wraps=handle.parse_rows) as parsed:
+                rows = handle.audit_log_report('2017-04-30', '2017-05-01',
+                                               changed_only=True)
+                self.assertEqual(list(parsed.call_args[0][0]), [two.strip()])
+
+            self.assertEqual(rows, [['UUID', 'Time', 'Details'],
+                                    ['2', '2017-05-01 07:05:13',
+                                     'with, comma']])
+
+            rows = handle.audit_log_report(  # not appended, parsed again
+                '2017-04-30', '2017-05-01', changed_only=True)
+            self.assertEqual(len(rows), 4)
+
+        self.assertEqual(handle.get_poll_stats(),
+                         {'skipped': 0, 'processed': 3})
+
     def test_node(self):
 
         print('***** Test get_node_by_id ***')
@@ -155,6 +395,93 @@ class EndpointTests(unittest.TestCase):
         node = handle.get_node_by_id(body=node_4_body)
         self.assertEqual(node, node_4_dict)
 
+    def test_node_cache(self):
+
+        print('***** Test node cache ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org')
+
+        def get(url):
+            if '/natRule' in url:
+                return mock.Mock(status_code=200, text=nat_rules_page_2)
+            return mock.Mock(status_code=200, text=node_2_body)
+
+        with mock.patch.object(handle, 'get', side_effect=get) as mocked:
+
+            node = handle.get_node_by_id(id=node_2_dict['id'])
+            self.assertEqual(node['name'], 'master-01')
+            self.assertEqual(mocked.call_count, 2)  # server and nat rules
+
+            node = handle.get_node_by_id(id=node_2_dict['id'])
+            self.assertEqual(node['name'], 'master-01')
+            self.assertEqual(mocked.call_count, 2)
+
+            handle.forget_node(node_2_dict['id'])
+            handle.get_node_by_id(id=node_2_dict['id'])
+            self.assertEqual(mocked.call_count, 3)  # nat rules are cached
+
+        self.assertEqual(handle.nodes.hits, 1)
+
+    def test_nat_rules(self):
+
+        print('***** Test nat rules ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org',
+                          settings={'page_size': 2})
+
+        page_1 = mock.Mock(status_code=200, text=nat_rules_page_1)
+        page_2 = mock.Mock(status_code=200, text=nat_rules_page_2)
+
+        with mock.patch.object(handle, 'get',
+                               side_effect=[page_1, page_2]) as mocked:
+
+            self.assertEqual(handle.get_public_ip('*domain', '10.0.0.8'),
+                             '168.128.13.201')
+            self.assertEqual(handle.get_public_ip('*domain', '10.0.0.9'),
+                             '168.128.13.202')
+            self.assertEqual(handle.get_public_ip('*domain', '10.0.0.10'),
+                             '168.128.13.203')
+            self.assertEqual(handle.get_public_ip('*domain', '10.0.0.11'),
+                             None)
+            self.assertEqual(mocked.call_count, 2)
+
+        handle.forget_nat_rules()
+        self.assertEqual(len(handle.nat_rules), 0)
+
+    def test_list_servers(self):
+
+        print('***** Test list_servers ***')
+
+        handle = Endpoint(key='k', secret='s', region='dd-eu', orgId='*org')
+
+        def server(body):
+            return body[body.index('<server '):]
+
+        servers = ('<?xml version="1.0" encoding="UTF-8"?>'
+                   '<servers xmlns="urn:didata.com:api:cloud:types"'
+                   ' pageNumber="1" pageCount="2" totalCount="2"'
+                   ' pageSize="250">'
+                   + server(node_1_body) + server(node_2_body)
+                   + '</servers>')
+
+        def get(url):
+            if '/natRule' in url:
+                return mock.Mock(status_code=200, text=nat_rules_page_1)
+            return mock.Mock(status_code=200, text=servers)
+
+        with mock.patch.object(handle, 'get', side_effect=get) as mocked:
+
+            nodes = handle.list_servers()
+            self.assertEqual(mocked.call_count, 3)  # 1 page, 2 domains
+
+            expected = dict(node_1_dict)
+            expected['public_ip'] = '168.128.13.201'
+            self.assertEqual(nodes, [expected, node_2_dict])
+
+            node = handle.get_node_by_id(id=node_2_dict['id'])
+            self.assertEqual(node, node_2_dict)
+            self.assertEqual(mocked.call_count, 3)
+
 if __name__ == '__main__':
     logging.getLogger('').setLevel(logging.DEBUG)
     sys.exit(unittest.main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+from datetime import date
+from collections import deque
+import unittest
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from executor import Executor
+
+
+class FakePump(object):
+
+    lane = 'realtime'
+
+    def set_lane(self, lane, region=None):
+        self.lane = lane
+
+    def pull_report(self, label, on, region):
+        assert self.lane == 'backfill'
+        if region == 'dd-ap' and label == 'audit_log':
+            os._exit(1)  # the process dies
+        return region != 'dd-af'  # this region fails
+
+
+class ExecutorTests(unittest.TestCase):
+
+    def test_tasks(self):
+
+        print('***** Test executor tasks ***')
+
+        executor = Executor(None, {'backfill_window': 7})
+        done = set([('dd-eu', date(2017, 5, 3), 'detailed_usage')])
+        tasks = executor.get_tasks(date(2017, 4, 30), date(2017, 5, 8),
+                                   ['dd-eu'], done)
+
+        week = [date(2017, 5, day) for day in range(1, 8)]  # Monday first
+        self.assertEqual(tasks, [
+            ('dd-eu', date(2017, 4, 30), 'summary_usage'),
+            ('dd-eu', date(2017, 4, 30), 'detailed_usage'),
+            ('dd-eu', date(2017, 4, 30), 'audit_log'),
+            ('dd-eu', (week[0], week[-1]), 'summary_usage')]
+            + [('dd-eu', day, 'detailed_usage') for day in week]
+            + [('dd-eu', day, 'audit_log') for day in week]
+            + [('dd-eu', date(2017, 5, 8), 'summary_usage'),
+               ('dd-eu', date(2017, 5, 8), 'detailed_usage'),
+               ('dd-eu', date(2017, 5, 8), 'audit_log')])
+
+        self.assertEqual(  # the same windows when the horizon moves
+            executor.get_tasks(date(2017, 4, 29), date(2017, 5, 9),
+                               ['dd-eu'], done)[6],
+            ('dd-eu', (week[0], week[-1]), 'summary_usage'))
+
+    def test_next_region(self):
+
+        print('***** Test executor next region ***')
+
+        executor = Executor(None, {'backfill_per_region': 1})
+
+        pending = {'dd-eu': deque([1, 2, 3]), 'dd-na': deque([1]),
+                   'dd-au': deque()}
+        running = {'dd-eu': 0, 'dd-na': 0, 'dd-au': 0}
+        self.assertEqual(executor.next_region(pending, running), 'dd-eu')
+
+        running['dd-eu'] = 1  # capped
+        self.assertEqual(executor.next_region(pending, running), 'dd-na')
+
+        running['dd-na'] = 1
+        self.assertEqual(executor.next_region(pending, running), None)
+
+        pending = {'acme@dd-eu': deque([1, 2]), 'dd-eu': deque([1]),
+                   'acme@dd-na': deque([1])}
+        running = {'dd-eu': 1, 'dd-na': 0}  # all accounts of the region
+        self.assertEqual(executor.next_region(pending, running),
+                         'acme@dd-na')
+
+    def test_run(self):
+
+        print('***** Test executor run ***')
+
+        executor = Executor(FakePump(), {'backfill_workers': 2,
+                                         'backfill_per_region': 1})
+
+        tasks = executor.get_tasks(date(2017, 5, 1), date(2017, 5, 10),
+                                   ['dd-af', 'dd-eu', 'dd-na'])
+        self.assertEqual(len(tasks), 3 * (2 + 2*3 + 10))
+
+        self.assertEqual(executor.run(tasks), 2 * 18)
+        self.assertEqual(executor.failed, 18)
+
+    def test_dead_process(self):
+
+        print('***** Test executor with dead processes ***')
+
+        executor = Executor(FakePump(), {'backfill_workers': 2,
+                                         'backfill_timeout': 1})
+
+        tasks = executor.get_tasks(date(2017, 5, 1), date(2017, 5, 1),
+                                   ['dd-ap', 'acme@dd-eu'])
+
+        self.assertEqual(executor.run(tasks), 5)
+        self.assertEqual(executor.failed, 1)
+        self.assertEqual(executor.pool, None)
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from extractor import extract_nodes, extract_nat_rules
+
+from test.test_endpoint import node_1_body, node_2_body, node_3_body
+from test.test_endpoint import node_2_dict, node_3_dict
+from test.test_endpoint import nat_rules_page_1
+
+
+def server(body):
+    return body.split('?>', 1)[1]  # drop the XML declaration
+
+
+class ExtractorTests(unittest.TestCase):
+
+    def test_nodes(self):
+
+        print('***** Test extract nodes ***')
+
+        text = (u'<?xml version="1.0" encoding="UTF-8"?>'
+                + u'<servers xmlns="urn:didata.com:api:cloud:types"'
+                + u' pageNumber="1" pageCount="2" totalCount="5" pageSize="2">'
+                + server(node_2_body) + server(node_3_body)
+                + u'</servers>')
+
+        total, nodes = extract_nodes(text)
+        self.assertEqual(total, 5)
+
+        expected = []
+        for item in (node_2_dict, node_3_dict):
+            item = dict(item)
+            del item['public_ip']
+            expected.append(item)
+        self.assertEqual(nodes, expected)
+
+        total, nodes = extract_nodes(node_1_body.encode('utf-8'))
+        self.assertEqual(total, 1)
+        self.assertEqual(len(nodes), 1)
+        self.assertEqual(nodes[0]['disks'], ['20'])
+
+        total, nodes = extract_nodes(
+            '<servers totalCount="0" pageSize="250"/>')
+        self.assertEqual((total, nodes), (0, []))
+
+        with self.assertRaises(Exception):
+            extract_nodes('*not xml')
+
+    def test_nat_rules(self):
+
+        print('***** Test extract NAT rules ***')
+
+        total, rules = extract_nat_rules(nat_rules_page_1)
+        self.assertEqual(total, 3)
+        self.assertEqual(rules, {'10.0.0.8': '168.128.13.201',
+                                 '10.0.0.9': '168.128.13.202'})
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+from multiprocessing import Process
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from limiter import RateLimiter
+
+
+class RateLimiterTests(unittest.TestCase):
+
+    def test_bucket(self):
+
+        print('***** Test token bucket ***')
+
+        limiter = RateLimiter(rate=20.0, burst=2)
+        self.assertEqual(limiter.acquire(), 0.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+
+        start = time.time()
+        limiter.acquire()
+        self.assertTrue(time.time() - start >= 0.04)
+
+    def test_shared(self):
+
+        print('***** Test sharing across processes ***')
+
+        limiter = RateLimiter(rate=1.0, burst=3)
+
+        worker = Process(target=limiter.acquire)
+        worker.start()
+        worker.join()
+
+        limiter.acquire()
+        self.assertTrue(limiter.tokens.value < 1.1)  # 2 tokens consumed
+
+    def test_backoff(self):
+
+        print('***** Test backoff ***')
+
+        limiter = RateLimiter(backoff=1.0, backoff_max=3.0)
+
+        delays = [limiter.fail() for index in range(4)]
+        self.assertTrue(0.5 <= delays[0] <= 1.0)
+        self.assertTrue(1.0 <= delays[1] <= 2.0)
+        self.assertTrue(1.5 <= delays[3] <= 3.0)
+        self.assertEqual(limiter.failures.value, 4)
+        self.assertTrue(limiter.paused.value > time.time())
+
+        self.assertEqual(limiter.fail(delay=0.0), 0.0)  # from Retry-After
+
+        limiter.succeed()
+        self.assertEqual(limiter.failures.value, 0)
+
+    def test_lanes(self):
+
+        print('***** Test lanes ***')
+
+        limiter = RateLimiter(rate=20.0, burst=4, share=0.25)
+        self.assertEqual(limiter.acquire('backfill'), 0.0)
+
+        start = time.time()
+        limiter.acquire('backfill')  # a quarter of the rate
+        self.assertTrue(time.time() - start >= 0.15)
+
+        self.assertEqual(limiter.acquire('realtime'), 0.0)
+        self.assertEqual(limiter.acquire(), 0.0)
+
+    def test_preempt(self):
+
+        print('***** Test preemption of backfill ***')
+
+        limiter = RateLimiter(rate=20.0, burst=4)
+        self.assertEqual(limiter.give_way(), 0.0)
+
+        limiter.preempt(timeout=0.2)
+        self.assertEqual(limiter.acquire('realtime'), 0.0)
+
+        start = time.time()
+        limiter.acquire('backfill')
+        self.assertTrue(time.time() - start >= 0.15)
+
+        limiter.preempt(timeout=10.0)
+        worker = Process(target=limiter.release)  # across processes
+        worker.start()
+        worker.join()
+        self.assertEqual(limiter.give_way(), 0.0)
+        self.assertEqual(limiter.acquire('backfill'), 0.0)
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
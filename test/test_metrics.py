@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+from multiprocessing import Process
+import os
+from six.moves.urllib.request import urlopen
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from metrics import Registry
+
+
+def record(registry):
+    registry.increment('calls_total', 3, region='dd-na')
+    registry.observe('api_seconds', 0.2, region='dd-na')
+    time.sleep(0.3)  # until the flush
+
+
+class MetricsTests(unittest.TestCase):
+
+    def test_render(self):
+
+        print('***** Test metrics rendering ***')
+
+        registry = Registry()
+        registry.describe('calls_total', 'Some calls')
+        registry.increment('calls_total', region='dd-eu', status=200)
+        registry.increment('calls_total', 2, region='dd-eu', status=200)
+        registry.set_gauge('depth', 4, stage='store')
+        registry.observe('api_seconds', 0.02, region='dd-eu')
+        registry.observe('api_seconds', 0.3, region='dd-eu')
+        registry.observe('api_seconds', 120.0, region='dd-eu')
+
+        text = registry.render()
+        self.assertIn(u'# HELP calls_total Some calls\n', text)
+        self.assertIn(u'# TYPE calls_total counter\n', text)
+        self.assertIn(u'calls_total{region="dd-eu",status="200"} 3\n', text)
+        self.assertIn(u'# TYPE depth gauge\n', text)
+        self.assertIn(u'depth{stage="store"} 4\n', text)
+        self.assertIn(u'# TYPE api_seconds histogram\n', text)
+        self.assertIn(u'api_seconds_bucket{region="dd-eu",le="0.01"} 0\n',
+                      text)
+        self.assertIn(u'api_seconds_bucket{region="dd-eu",le="0.025"} 1\n',
+                      text)
+        self.assertIn(u'api_seconds_bucket{region="dd-eu",le="60.0"} 2\n',
+                      text)
+        self.assertIn(u'api_seconds_bucket{region="dd-eu",le="+Inf"} 3\n',
+                      text)
+        self.assertIn(u'api_seconds_count{region="dd-eu"} 3\n', text)
+
+        registry.increment('odd_total', text='say "hi"\n')
+        self.assertIn(u'odd_total{text="say \\"hi\\"\\n"} 1\n',
+                      registry.render())
+
+    def test_processes(self):
+
+        print('***** Test metrics of processes ***')
+
+        registry = Registry()
+        registry.increment('calls_total', region='dd-eu')
+        registry.share(interval=0.1)
+
+        process = Process(target=record, args=(registry,))
+        process.start()
+        process.join()
+
+        key = ('calls_total', (('region', 'dd-na'),))
+        for count in range(20):  # until received by the collector
+            if key in registry.counters:
+                break
+            time.sleep(0.1)
+
+        self.assertEqual(registry.counters[('calls_total',
+                                            (('region', 'dd-eu'),))], 1)
+        self.assertEqual(registry.counters[key], 3)
+        self.assertEqual(registry.histograms[('api_seconds',
+                                              (('region', 'dd-na'),))][2], 1)
+
+    def test_serve(self):
+
+        print('***** Test metrics server ***')
+
+        registry = Registry()
+        registry.increment('calls_total', region='dd-eu')
+
+        server = registry.serve(port=0)
+        try:
+            url = 'http://127.0.0.1:{}/metrics'.format(server.server_port)
+            text = urlopen(url).read().decode('utf-8')
+            self.assertIn(u'calls_total{region="dd-eu"} 1\n', text)
+
+        finally:
+            server.shutdown()
+            server.server_close()
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -4,7 +4,9 @@ import unittest
 import logging
 import os
 import random
+import shutil
 import sys
+import tempfile
 import time
 import mock
 from requests import ConnectionError
@@ -14,7 +16,7 @@ import vcr
 
 sys.path.insert(0, os.path.abspath('..'))
 
-from models.base import Updater
+from models.base import StoreError, Updater
 from models.files import FilesUpdater
 from models.elastic import ElasticUpdater
 from models.influx import InfluxdbUpdater
@@ -40,6 +42,49 @@ class ModelsTests(unittest.TestCase):
         updater.on_servers()
         updater.close_store()
 
+    def test_deliver(self):
+
+        print('***** Test delivery to spool ***')
+
+        from models.base import StoreError
+
+        folder = tempfile.mkdtemp()
+        try:
+            updater = Updater({'breaker_failures': 2,
+                               'breaker_reset': 3600,
+                               'spool': os.path.join(folder, 'spool.gz'),
+                               'spool_rate': 1000})
+
+            items = [['a', 'b'], ['1', '2'], ['3', '4']]
+            with mock.patch.object(updater, 'update_audit_log',
+                                   side_effect=StoreError('*down')):
+                self.assertFalse(updater.deliver('update_audit_log',
+                                                 items, 'dd-eu'))
+                self.assertFalse(updater.deliver('update_audit_log',
+                                                 items, 'dd-na'))
+                self.assertEqual(updater.breaker.state, 'open')
+
+            with mock.patch.object(updater, 'update_audit_log') as mocked:
+                self.assertFalse(updater.deliver('update_audit_log',
+                                                 items, 'dd-af'))
+                self.assertFalse(mocked.called)  # store is left alone
+
+                stats = updater.get_spool_stats()
+                self.assertEqual(stats['appended'], 3)
+                self.assertEqual(stats['breaker'], 'open')
+
+                updater.breaker.opened = 0.0  # store is back
+                self.assertTrue(updater.deliver('update_audit_log',
+                                                items, 'dd-ap'))
+                updater._drainer.join()
+
+                self.assertEqual([x[0][1] for x in mocked.call_args_list],
+                                 ['dd-ap', 'dd-eu', 'dd-na', 'dd-af'])
+                self.assertTrue(updater.get_spool().is_empty())
+
+        finally:
+            shutil.rmtree(folder)
+
     def test_files(self):
 
         print('***** Test files ***')
@@ -56,6 +101,9 @@ class ModelsTests(unittest.TestCase):
         self.assertEqual(updater.get_audit_log_file(),
                          './logs/audit_log.log')
 
+        self.assertEqual(updater.get_audit_log_file('acme'),
+                         './logs/audit_log-acme.log')
+
         try:
             settings = config.files
         except:
@@ -73,6 +121,60 @@ class ModelsTests(unittest.TestCase):
 
         updater.update_audit_log()
 
+    def test_files_reset(self):
+
+        print('***** Test reset of files ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            settings = {
+                'summary_usage': os.path.join(folder, 'summary_usage.log'),
+                'detailed_usage': os.path.join(folder, 'detailed_usage.log'),
+                'audit_log': os.path.join(folder, 'audit_log.log'),
+            }
+            updater = FilesUpdater(settings)
+
+            item = ['*uid', '2017-02-01 10:00:00']
+            updater.update_audit_log([['headers'], item])
+            updater.update_audit_log([['headers'], item], account='acme')
+            updater.update_summary_usage([['headers'], item], account='acme')
+
+            self.assertEqual(updater.get_files('audit_log', None), [
+                settings['audit_log'],
+                os.path.join(folder, 'audit_log-acme.log')])
+
+            updater.reset_store()
+
+            for name in sorted(os.listdir(folder)):
+                path = os.path.join(folder, name)
+                self.assertEqual(os.path.getsize(path), 0, name)
+
+            self.assertTrue(os.path.exists(
+                os.path.join(folder, 'summary_usage-acme.log')))
+
+        finally:
+            shutil.rmtree(folder)
+
+    def test_files_append(self):
+
+        print('***** Test append to files ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            path = os.path.join(folder, 'audit_log.log')
+            updater = FilesUpdater({'audit_log': path})
+
+            updater.update_audit_log([['headers'], ['a'], ['b']])
+            updater.update_audit_log([['headers']])
+            updater.update_audit_log([['headers'], ['c']])
+
+            with open(path) as handle:
+                self.assertEqual(handle.read(),
+                                 "['a']\n['b']\n['c']\n")
+
+        finally:
+            shutil.rmtree(folder)
+
     def test_elastic(self):
 
         print('***** Test elastic ***')
@@ -87,6 +189,57 @@ class ModelsTests(unittest.TestCase):
 
         updater = ElasticUpdater(settings)
 
+    def test_accounts(self):
+
+        print('***** Test accounts ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            updater = ElasticUpdater({'breaker_failures': 1,
+                                      'breaker_reset': 3600,
+                                      'spool': os.path.join(folder, 'spool.gz')})
+            updater.db = mock.Mock()
+
+            items = [['UUID', 'Time', 'Create User', 'Department', 'C1', 'C2',
+                      'Type', 'Name', 'Action', 'Details', 'Response'],
+                     ['*a', '2017-05-01 10:00:00', 'foo.bar', '', '', '',
+                      'SERVER', 'web', 'Start Server', '', 'OK']]
+
+            self.assertTrue(updater.deliver('update_audit_log', items,
+                                            'dd-eu', 'acme'))
+            body = updater.db.index.call_args[1]['body']
+            self.assertEqual(body['account'], 'acme')
+            self.assertEqual(body['region'], 'dd-eu')
+
+            self.assertTrue(updater.deliver('update_audit_log', items,
+                                            'dd-eu'))
+            body = updater.db.index.call_args[1]['body']
+            self.assertFalse('account' in body)
+
+            with mock.patch.object(updater, 'update_audit_log',
+                                   side_effect=StoreError('*down')):
+                self.assertFalse(updater.deliver('update_audit_log', items,
+                                                 'dd-na', 'acme'))
+
+            replayed = []
+            updater.get_spool().drain(
+                lambda label, items, region, **tags: replayed.append(
+                    (region, tags)))
+            self.assertEqual(replayed, [('dd-na', {'account': 'acme'})])
+
+        finally:
+            shutil.rmtree(folder)
+
+        updater = InfluxdbUpdater({})
+        updater.db = mock.Mock()
+        updater.update_summary_usage(
+            [['headers'], ['2017-05-01', 'EU6'] + ['1'] * 25], 'dd-eu',
+            account='acme')
+        points = updater.db.write_points.call_args[0][0]
+        self.assertEqual(points[0]['tags'],
+                         {'region': 'dd-eu', 'location': 'EU6',
+                          'account': 'acme'})
+
     def test_influxdb(self):
 
         print('***** Test influxdb ***')
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from pipeline import Pipeline
+
+
+class PipelineTests(unittest.TestCase):
+
+    def test_run(self):
+
+        print('***** Test pipeline run ***')
+
+        stored = []
+        lock = threading.Lock()
+
+        def store(item):
+            with lock:
+                stored.append(item)
+
+        pipeline = Pipeline(depth=2)
+        pipeline.add_stage('fetch', lambda x: range(x), workers=2)
+        pipeline.add_stage('parse', lambda x: [x * 10], workers=3)
+        pipeline.add_stage('store', store)
+
+        failures = pipeline.run([3, 4])
+        self.assertEqual(failures, [])
+        self.assertEqual(sorted(stored), [0, 0, 10, 10, 20, 20, 30])
+
+        stats = pipeline.get_stats()
+        self.assertEqual(stats['fetch']['received'], 2)
+        self.assertEqual(stats['fetch']['provided'], 7)
+        self.assertEqual(stats['store']['received'], 7)
+        self.assertEqual(stats['store']['provided'], 0)
+        self.assertEqual(stats['store']['depth'], 0)
+
+    def test_backpressure(self):
+
+        print('***** Test pipeline backpressure ***')
+
+        def store(item):
+            time.sleep(0.01)
+
+        pipeline = Pipeline(depth=3)
+        pipeline.add_stage('fetch', lambda x: range(x))
+        pipeline.add_stage('store', store)
+        pipeline.run([50])
+
+        stats = pipeline.get_stats()
+        self.assertTrue(stats['store']['deepest'] <= 3)
+        self.assertEqual(stats['store']['received'], 50)
+        self.assertEqual(pipeline.get_bottleneck(), 'store')
+
+    def test_failures(self):
+
+        print('***** Test pipeline failures ***')
+
+        def parse(item):
+            if item == 'bad':
+                raise ValueError('*bad')
+            return [item]
+
+        pipeline = Pipeline()
+        pipeline.add_stage('parse', parse, workers=2)
+        pipeline.add_stage('store', lambda x: None)
+
+        failures = pipeline.run(['good', 'bad', 'fine'])
+        self.assertEqual(failures, [('parse', 'bad')])
+
+        stats = pipeline.get_stats()
+        self.assertEqual(stats['parse']['errors'], 1)
+        self.assertEqual(stats['store']['received'], 2)
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
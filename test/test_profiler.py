@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+import pstats
+import shutil
+import signal
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from profiler import Profiler, tracemalloc
+
+
+def work(queue, region, heart=None):
+    queue.append([str(x) for x in range(10000)])
+    os.kill(os.getpid(), signal.SIGUSR1)
+    time.sleep(0.05)
+    return region
+
+
+class ProfilerTests(unittest.TestCase):
+
+    def test_run(self):
+
+        print('***** Test profiler ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            self.assertEqual(Profiler.from_settings({}), None)
+            profiler = Profiler.from_settings({'profile': folder,
+                                               'profile_interval': 0})
+
+            profiled = profiler.wrap('day', work)
+            self.assertEqual(profiled([], 'dd-eu', None), 'dd-eu')
+
+            name = 'day-dd-eu-{}'.format(os.getpid())
+            stats = pstats.Stats(os.path.join(folder, name + '.pstats'))
+            self.assertTrue(any(function[2] == 'work'
+                                for function in stats.stats.keys()))
+
+            snapshots = [x for x in os.listdir(folder) if x.endswith('.txt')]
+            if tracemalloc is not None:  # one on signal, one at the end
+                self.assertEqual(len(snapshots), 2)
+            else:
+                self.assertEqual(snapshots, [])
+
+        finally:
+            shutil.rmtree(folder)
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -6,7 +6,9 @@ import unittest
 import logging
 import os
 import random
+import shutil
 import sys
+import tempfile
 import time
 import mock
 from requests import ConnectionError
@@ -61,6 +63,709 @@ class PumpTests(unittest.TestCase):
         self.assertEqual(pump.settings.get('unknown'), None)
 
 
+    def test_set_endpoints(self):
+
+        print('***** Test set endpoints ***')
+
+        folder = tempfile.mkdtemp()
+        settings = {
+            'MCP_USER': 'foo.bar',
+            'MCP_PASSWORD': 'WhatsUpDoc',
+            'regions': ['dd-af', 'dd-eu', 'dd-na'],
+            'regions_cache': os.path.join(folder, 'regions.json'),
+            'prune_regions': True,
+            }
+
+        footprints = ['dd-eu']
+
+        def bind(key, secret, region, settings, orgId=None, account=None,
+                 limiter=None):
+            if region == 'dd-af':
+                raise RuntimeError('Unable to get orgId from API')
+
+            engine = mock.Mock()
+            engine.orgId = orgId if orgId else '*org'
+            engine.has_footprint.return_value = (region in footprints)
+            return engine
+
+        try:
+            with mock.patch('pump.Endpoint', side_effect=bind) as mocked:
+
+                pump = Pump(settings)
+                pump.set_endpoints()
+                self.assertEqual(sorted(pump.engines.keys()), ['dd-eu'])
+                self.assertEqual(mocked.call_count, 3)
+
+                mocked.reset_mock()
+                pump = Pump(settings)
+                pump.set_endpoints()
+                self.assertEqual(sorted(pump.engines.keys()), ['dd-eu'])
+
+                # dd-af is tried again, dd-eu is bound from the cache
+                self.assertEqual(sorted([x[1]['region']
+                                         for x in mocked.call_args_list]),
+                                 ['dd-af', 'dd-eu'])
+                for args, kwargs in mocked.call_args_list:
+                    if kwargs['region'] == 'dd-eu':
+                        self.assertEqual(kwargs['orgId'], '*org')
+
+                self.assertEqual(pump.check_regions(), [])  # not yet
+                pump.pruned_at -= 86400
+                self.assertEqual(pump.check_regions(), [])  # still empty
+
+                footprints.append('dd-na')  # first server in the region
+                pump.pruned_at -= 86400
+                self.assertEqual(pump.check_regions(), ['dd-na'])
+                self.assertEqual(sorted(pump.engines.keys()),
+                                 ['dd-eu', 'dd-na'])
+                self.assertEqual(pump.pruned, {})
+
+                pump.supervisor = mock.Mock()
+                pump.supervisor.workers = [mock.Mock(region='dd-eu')]
+                pump.add_target('dd-na')
+                self.assertEqual(pump.supervisor.add.call_count, 2)
+                pump.add_target('acme@dd-eu')
+                pump.supervisor.recycle.assert_called_once_with('dd-eu')
+
+                footprints.remove('dd-na')
+                pump = Pump({'MCP_USER': 'foo.bar',
+                             'MCP_PASSWORD': 'WhatsUpDoc',
+                             'regions': ['dd-eu', 'dd-na']})
+                pump.set_endpoints()
+                self.assertEqual(sorted(pump.engines.keys()),
+                                 ['dd-eu', 'dd-na'])  # no pruning by default
+
+        finally:
+            shutil.rmtree(folder)
+
+    def test_accounts(self):
+
+        print('***** Test accounts ***')
+
+        settings = {
+            'regions': ['dd-eu', 'dd-na'],
+            'accounts': [
+                {'name': 'acme',
+                 'MCP_USER': 'acme.watch',
+                 'MCP_PASSWORD': '$ACME_PASSWORD'},
+                {'name': 'globex',
+                 'MCP_USER': 'globex.watch',
+                 'MCP_PASSWORD': 'WhatsUpDoc',
+                 'regions': ['dd-eu']},
+                {'name': 'initech',
+                 'MCP_USER': 'initech.watch'},  # no password
+            ],
+        }
+
+        def bind(key, secret, region, settings, orgId=None, account=None,
+                 limiter=None):
+            engine = mock.Mock()
+            engine.orgId = '*' + account
+            engine.limiter = limiter
+            engine.has_footprint.return_value = True
+            return engine
+
+        with mock.patch.dict(os.environ, {'ACME_PASSWORD': 'Secret'}):
+            with mock.patch('pump.Endpoint', side_effect=bind) as mocked:
+                pump = Pump(settings)
+                pump.set_endpoints()
+
+        self.assertEqual(sorted(pump.engines.keys()),
+                         ['acme@dd-eu', 'acme@dd-na', 'globex@dd-eu'])
+        self.assertEqual(pump.engines['acme@dd-eu'].orgId, '*acme')
+        self.assertTrue(pump.engines['acme@dd-eu'].limiter is
+                        pump.engines['globex@dd-eu'].limiter)
+        self.assertFalse(pump.engines['acme@dd-eu'].limiter is
+                         pump.engines['acme@dd-na'].limiter)
+
+        for args, kwargs in mocked.call_args_list:
+            if kwargs['account'] == 'acme':
+                self.assertEqual((kwargs['key'], kwargs['secret']),
+                                 ('acme.watch', 'Secret'))
+
+        self.assertEqual(pump.get_targets('dd-eu'),
+                         ['acme@dd-eu', 'globex@dd-eu'])
+        self.assertEqual(pump.split_target('acme@dd-eu'), ('acme', 'dd-eu'))
+        self.assertEqual(pump.split_target('dd-eu'), (None, 'dd-eu'))
+
+        # records carry the account
+        updater = Updater({'active': True})
+        pump.add_updater(updater)
+        with mock.patch.object(updater, 'update_audit_log') as mocked:
+            pump.update_audit_log(iter([['a'], ['1']]), 'acme@dd-eu')
+            mocked.assert_called_once_with([['a'], ['1']], 'dd-eu',
+                                           account='acme')
+
+        # one minute worker polls all accounts of its region
+        from six.moves.queue import Queue
+        queue = Queue()
+        queue.put(date(2017, 5, 1))
+
+        pump.settings.update({'tick_interval': 0.01, 'tick_min': 0.01,
+                              'tick_max': 0.05})
+        polled = set()
+
+        def tick(on, region):
+            polled.add(region)
+            if len(polled) == 2:
+                queue.put('STOP')
+            return 0
+
+        with mock.patch.object(pump, 'tick', side_effect=tick):
+            pump.work_every_minute(queue, 'dd-eu')
+
+        self.assertEqual(sorted(polled), ['acme@dd-eu', 'globex@dd-eu'])
+
+    def test_check_report(self):
+
+        print('***** Test check report ***')
+
+        pump = Pump()
+
+        items = [['a', 'b'], ['1', '2'], ['3', '4'], ['', 'total']]
+        self.assertEqual(list(pump.check_report(iter(items), 'dd-eu', '*day')),
+                         items)
+        self.assertEqual(list(pump.check_report(iter(items), 'dd-eu', '*day',
+                                                totals=True)),
+                         items[:-1])
+
+        items = [['<?xml version="1.0"?>'], ['<error/>']]
+        self.assertEqual(list(pump.check_report(iter(items), 'dd-eu', '*day')),
+                         [])
+
+        self.assertEqual(list(pump.check_report(iter([]), 'dd-eu', '*day')),
+                         [])
+
+    def test_dispatch(self):
+
+        print('***** Test dispatch ***')
+
+        pump = Pump({'batch_size': 2})
+
+        updater = Updater({'active': True})
+        pump.add_updater(updater)
+        pump.add_updater(Updater({'active': False}))
+
+        items = [['a', 'b'], ['1', '2'], ['3', '4'], ['5', '6']]
+        with mock.patch.object(updater,
+                               'update_audit_log',
+                               return_value=None) as mocked:
+
+            pump.update_audit_log(iter(items), 'dd-na')
+
+            self.assertEqual(mocked.call_args_list, [
+                mock.call([['a', 'b'], ['1', '2'], ['3', '4']], 'dd-na'),
+                mock.call([['a', 'b'], ['5', '6']], 'dd-na')])
+
+    def test_pull(self):
+
+        print('***** Test pull through pipeline ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            pump = Pump({'batch_size': 2,
+                         'checkpoint': os.path.join(folder, 'checkpoint.db')})
+
+            updater = Updater({'active': True})
+            pump.add_updater(updater)
+
+            engine = mock.Mock()
+            engine.calls = 0
+            engine.get_latency.return_value = 0.0
+            engine.pages = 1
+            engine.nodes = {'*known': {}}
+            engine.summary_usage_report.return_value = iter([
+                ['DAY', 'Location', 'CPU Hours'],
+                ['2017-04-30', 'EU6', '24'],
+                ['2017-04-30', 'EU7', '48'],
+                ['2017-04-30', 'EU8', '12'],
+                ['', 'Total', '84']])
+            engine.detailed_usage_report.side_effect = ValueError('*broken')
+            engine.audit_log_report.return_value = iter([
+                ['UID', 'Time', 'User', 'Department', 'IP', 'Type', 'Kind',
+                 'Name', 'Action', 'Details', 'Status'],
+                ['*uid1', '2017-04-30 07:00:00', 'foo', '', '', '', 'SERVER',
+                 'web[dd-eu_*new]', 'Deploy Server', '', 'OK'],
+                ['*uid2', '2017-04-30 07:01:00', 'foo', '', '', '', 'SERVER',
+                 'db[dd-eu_*known]', 'Start Server', '', 'OK']])
+            pump.engines['dd-eu'] = engine
+
+            with mock.patch.object(updater, 'update_summary_usage') as summary, \
+                    mock.patch.object(updater, 'update_audit_log') as audit:
+
+                pump.pull(date(2017, 4, 30), 'dd-eu')
+
+                self.assertEqual(sorted(summary.call_args_list), [
+                    mock.call([['DAY', 'Location', 'CPU Hours'],
+                               ['2017-04-30', 'EU6', '24'],
+                               ['2017-04-30', 'EU7', '48']], 'dd-eu'),
+                    mock.call([['DAY', 'Location', 'CPU Hours'],
+                               ['2017-04-30', 'EU8', '12']], 'dd-eu')])
+                self.assertEqual(audit.call_count, 1)
+
+            self.assertFalse(engine.get_node_by_id.called)  # no API call
+
+            self.assertEqual(pump.checkpoint.get_pending(), [])
+            self.assertFalse(pump.checkpoint.is_empty())
+            self.assertEqual(pump.checkpoint.get_connection().execute(
+                "SELECT label FROM tasks ORDER BY label").fetchall(),
+                [('audit_log',), ('summary_usage',)])
+
+            stats = pump.context['dd-eu']['pipeline']
+            self.assertEqual(stats['fetch']['errors'], 1)
+            self.assertEqual(stats['store']['received'], 3)
+
+        finally:
+            shutil.rmtree(folder)
+
+    def test_pull_failed_updater(self):
+
+        print('***** Test pull with a failed updater ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            pump = Pump({'checkpoint': os.path.join(folder, 'checkpoint.db')})
+
+            updater = Updater({'active': True})
+            pump.add_updater(updater)
+
+            engine = mock.Mock()
+            engine.calls = 0
+            engine.get_latency.return_value = 0.0
+            engine.summary_usage_report.side_effect = lambda *args: iter([
+                ['DAY', 'Location', 'CPU Hours'],
+                ['2017-04-30', 'EU6', '24'],
+                ['', 'Total', '24']])
+            engine.detailed_usage_report.return_value = iter([])
+            engine.audit_log_report.return_value = iter([])
+            pump.engines['dd-eu'] = engine
+
+            with mock.patch.object(updater, 'update_summary_usage',
+                                   side_effect=ValueError('*broken')):
+                pump.pull(date(2017, 4, 30), 'dd-eu')
+
+                self.assertFalse(pump.pull_report(
+                    'summary_usage', (date(2017, 4, 30), date(2017, 4, 30)),
+                    'dd-eu'))
+
+            self.assertEqual(pump.checkpoint.get_connection().execute(
+                "SELECT label FROM tasks ORDER BY label").fetchall(),
+                [('audit_log',), ('detailed_usage',)])  # summary is pending
+
+        finally:
+            shutil.rmtree(folder)
+
+    def test_pull_window(self):
+
+        print('***** Test pull window ***')
+
+        pump = Pump({'backfill_fallback': 1})
+
+        updater = Updater({'active': True})
+        pump.add_updater(updater)
+
+        engine = mock.Mock()
+        engine.calls = 0
+        engine.get_latency.return_value = 0.0
+        engine.summary_usage_report.return_value = iter([
+            ['DAY', 'Location', 'CPU Hours'],
+            ['2017-04-30', 'EU6', '24'],
+            ['2017-05-01', 'EU6', '12'],
+            ['2017-04-30', 'EU7', '48'],
+            ['', 'Total', '84']])
+        engine.detailed_usage_report.return_value = iter([
+            ['<?xml version="1.0"?>'], ['<error/>']])
+        engine.audit_log_report.return_value = iter([])
+        pump.engines['dd-eu'] = engine
+
+        with mock.patch.object(updater, 'update_summary_usage') as summary, \
+                mock.patch.object(pump, 'fetch_detailed_usage',
+                                  return_value=iter([])) as daily:
+
+            for label in Pump.REPORTS:
+                pump.pull_report(label, (date(2017, 5, 1), date(2017, 5, 2)),
+                                 'dd-eu')
+
+            self.assertEqual(summary.call_args_list, [
+                mock.call([['DAY', 'Location', 'CPU Hours'],
+                           ['2017-04-30', 'EU6', '24'],
+                           ['2017-04-30', 'EU7', '48']], 'dd-eu'),
+                mock.call([['DAY', 'Location', 'CPU Hours'],
+                           ['2017-05-01', 'EU6', '12']], 'dd-eu')])
+
+            engine.summary_usage_report.assert_called_once_with(
+                '2017-04-30', '2017-05-02')
+
+            # the API has rejected the window of detailed usage
+            self.assertEqual(daily.call_args_list, [
+                mock.call(date(2017, 5, 1), 'dd-eu'),
+                mock.call(date(2017, 5, 2), 'dd-eu')])
+            self.assertEqual(pump.context['dd-eu']['daily_only'],
+                             {'detailed_usage': 1})
+
+            # next window is fetched day by day, then the API is tried again
+            window = (date(2017, 5, 3), date(2017, 5, 3))
+            pump.pull_report('detailed_usage', window, 'dd-eu')
+            self.assertEqual(engine.detailed_usage_report.call_count, 1)
+            self.assertEqual(daily.call_count, 3)
+
+            engine.detailed_usage_report.return_value = iter([
+                ['DAY', 'Location', 'CPU Hours'],
+                ['2017-05-04', 'EU6', '12'],
+                ['', 'Total', '12']])
+            window = (date(2017, 5, 4), date(2017, 5, 4))
+            pump.pull_report('detailed_usage', window, 'dd-eu')
+            self.assertEqual(engine.detailed_usage_report.call_count, 2)
+            self.assertEqual(daily.call_count, 3)
+
+        self.assertEqual(engine.audit_log_report.call_count, 2)
+
+    def get_days(self, tasks):
+        days = []
+        for region, on, label in tasks:
+            day, last = on if isinstance(on, tuple) else (on, on)
+            while day <= last:
+                days.append((region, day, label))
+                day += timedelta(days=1)
+        return sorted(days, key=lambda x: (x[1], x[0], x[2]))
+
+    def test_horizons(self):
+
+        print('***** Test pumps with shifted horizons ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            settings = {'checkpoint': os.path.join(folder, 'checkpoint.db'),
+                        'backfill_window': 7}
+
+            pulled = []
+
+            def run(tasks):  # as if every task had succeeded
+                pulled.extend(self.get_days(tasks))
+                for task in tasks:
+                    pump.checkpoint.complete(task)
+
+            updater = Updater({'active': True})
+            today = date.today()
+            for days, resume in ((30, False), (33, True), (45, True)):
+                pump = Pump(settings)
+                pump.engines['dd-eu'] = mock.Mock()
+                pump.add_updater(updater)
+
+                since = today - timedelta(days=days)
+                with mock.patch.object(updater, 'reset_store') as mocked:
+                    pump.open_updaters(since, resume=resume)
+                    self.assertEqual(mocked.called, not resume)
+
+                with mock.patch('pump.Executor.run', side_effect=run):
+                    pump.pump(since=since, forever=False)
+
+                for label in Pump.REPORTS:  # as if pulled day after day
+                    pump.checkpoint.complete(
+                        ('dd-eu', today - timedelta(days=40), label))
+
+            self.assertEqual(len(pulled), len(set(pulled)))  # no duplicate
+            self.assertEqual(len(pulled), 45 * 3 - 3)
+
+            pump = Pump(settings)  # a new horizon starts from scratch
+            with mock.patch.object(updater, 'reset_store') as mocked:
+                pump.add_updater(updater)
+                pump.open_updaters(today - timedelta(days=10))
+                self.assertTrue(mocked.called)
+            self.assertTrue(pump.checkpoint.is_empty())
+
+        finally:
+            shutil.rmtree(folder)
+
+    def test_resume(self):
+
+        print('***** Test resume from checkpoint ***')
+
+        folder = tempfile.mkdtemp()
+        try:
+            settings = {'checkpoint': os.path.join(folder, 'checkpoint.db')}
+
+            pump = Pump(settings)
+            pump.engines['dd-eu'] = mock.Mock()
+            yesterday = date.today() - timedelta(days=1)
+            pump.checkpoint.add_tasks([
+                ('dd-eu', yesterday - timedelta(days=3), 'audit_log'),
+                ('dd-af', yesterday - timedelta(days=3), 'audit_log')])
+            pump.checkpoint.complete(
+                ('dd-eu', yesterday - timedelta(days=2), 'audit_log'))
+            cursor = {'day': '2017-05-02',
+                      'stamp': '2017-05-01 07:05:12',
+                      'uids': ['*uid']}
+            pump.checkpoint.set_cursor('dd-eu', cursor)
+
+            pump = Pump(settings)
+            pump.engines['dd-eu'] = mock.Mock()
+
+            updater = Updater({'active': True})
+            pump.add_updater(updater)
+            with mock.patch.object(updater, 'reset_store') as mocked:
+                pump.open_updaters(date(2017, 1, 1), resume=True)
+                self.assertFalse(mocked.called)
+
+            with mock.patch('pump.Executor.run') as mocked:
+                pump.pump(forever=False)
+
+                before = yesterday - timedelta(days=1)
+                self.assertEqual(self.get_days(mocked.call_args[0][0]), [
+                    ('dd-eu', yesterday - timedelta(days=3), 'audit_log'),
+                    ('dd-eu', before, 'audit_log'),
+                    ('dd-eu', before, 'detailed_usage'),
+                    ('dd-eu', before, 'summary_usage'),
+                    ('dd-eu', yesterday, 'audit_log'),
+                    ('dd-eu', yesterday, 'detailed_usage'),
+                    ('dd-eu', yesterday, 'summary_usage')])
+
+            with mock.patch('pump.Supervisor'):
+                pump.set_workers()
+                self.assertEqual(pump.get_tail('dd-eu').get_state(), cursor)
+
+        finally:
+            shutil.rmtree(folder)
+
+    def test_tick(self):
+
+        print('***** Test tick ***')
+
+        pump = Pump()
+
+        engine = mock.Mock()
+        pump.engines['dd-eu'] = engine
+
+        headers = ['UUID', 'Time', 'Details']
+        logs = {
+            '2017-05-01': [headers,
+                           ['a', '2017-05-01 23:58:00', '*'],
+                           ['b', '2017-05-01 23:59:00', '*']],
+            '2017-05-02': [headers,
+                           ['c', '2017-05-02 00:00:10', '*']],
+        }
+
+        def report(start_date, end_date, changed_only=False):
+            return iter([list(x) for x in logs[start_date]])
+
+        engine.audit_log_report.side_effect = report
+
+        with mock.patch.object(pump, 'list_active_servers',
+                               return_value=[]) as mocked:
+
+            pump.tick(date(2017, 5, 1), 'dd-eu')
+            self.assertEqual([x[0] for x in mocked.call_args[0][0]],
+                             ['a', 'b'])
+
+            pump.tick(date(2017, 5, 1), 'dd-eu')
+            self.assertEqual(mocked.call_args[0][0], [])
+
+            # a record is written just before midnight, and seen after
+            logs['2017-05-01'].append(['d', '2017-05-01 23:59:59', '*'])
+            pump.tick(date(2017, 5, 2), 'dd-eu')
+            self.assertEqual([x[0] for x in mocked.call_args[0][0]],
+                             ['d', 'c'])
+
+            pump.tick(date(2017, 5, 2), 'dd-eu')
+            self.assertEqual(mocked.call_args[0][0], [])
+
+    def test_lanes(self):
+
+        print('***** Test lanes ***')
+
+        from limiter import RateLimiter
+
+        pump = Pump({'realtime_timeout': 0.2})
+        for region in ('dd-eu', 'dd-na'):
+            pump.engines[region] = mock.Mock(lane='realtime',
+                                             limiter=RateLimiter())
+
+        pump.set_lane('backfill', 'dd-eu')
+        self.assertEqual(pump.engines['dd-eu'].lane, 'backfill')
+        self.assertEqual(pump.engines['dd-na'].lane, 'realtime')
+
+        limiter = pump.engines['dd-eu'].limiter
+
+        def report(start_date, end_date, changed_only=False):
+            self.assertTrue(limiter.urgent.value > time.time())
+            return None
+
+        pump.engines['dd-eu'].audit_log_report.side_effect = report
+        self.assertEqual(pump.tick(date(2017, 5, 1), 'dd-eu'), 0)
+        self.assertEqual(limiter.urgent.value, 0.0)  # released
+
+        updater = Updater({'active': True})
+        with mock.patch.object(pump, 'fan_out') as mocked:
+            limiter.preempt(0.2)
+            start = time.time()
+            pump.dispatch_batch('update_audit_log', [['a']], [updater],
+                                'dd-eu')
+            self.assertTrue(time.time() - start >= 0.15)  # backfill waits
+
+            limiter.preempt(10.0)
+            pump.dispatch_batch('update_audit_log', [['a']], [updater],
+                                'dd-na')  # real-time lane does not wait
+
+        self.assertEqual(mocked.call_count, 2)
+
+    def test_work_every_day(self):
+
+        print('***** Test work every day ***')
+
+        pump = Pump({'heartbeat': 0.01})
+
+        from six.moves.queue import Queue
+        from supervisor import Heartbeat
+        queue = Queue()
+        queue.put(date(2017, 5, 1))
+        queue.put(date(2017, 5, 2))
+
+        heart = Heartbeat(tasks=1)
+        with mock.patch.object(pump, 'pull') as mocked:
+            pump.work_every_day(queue, 'dd-eu', heart)  # recycled
+
+        mocked.assert_called_once_with(date(2017, 5, 1), 'dd-eu')
+        self.assertEqual(heart.tasks.value, 1)
+        self.assertEqual(queue.get(), date(2017, 5, 2))
+
+    def test_work_every_minute(self):
+
+        print('***** Test work every minute ***')
+
+        pump = Pump({'tick_interval': 0.01, 'tick_min': 0.01,
+                     'tick_max': 0.05})
+        pump.engines = {'dd-eu': mock.Mock(), 'dd-na': mock.Mock()}
+
+        from six.moves.queue import Queue
+        queue = Queue()
+        queue.put(date(2017, 5, 1))
+
+        activities = [0, 2, None, 0]
+
+        def tick(on, region):
+            if len(activities) == 1:
+                queue.put('STOP')
+            return activities.pop(0)
+
+        with mock.patch.object(pump, 'tick', side_effect=tick) as mocked:
+            pump.work_every_minute(queue, 'dd-na')
+
+        self.assertEqual(mocked.call_args_list,
+                         [mock.call(date(2017, 5, 1), 'dd-na')] * 4)
+
+    def test_fan_out(self):
+
+        print('***** Test fan out ***')
+
+        pump = Pump({'updater_timeout': 0.2})
+
+        class Slow(Updater):
+            def on_servers(self, updates=[], region='dd-eu'):
+                time.sleep(1.0)
+
+        class Broken(Updater):
+            def on_servers(self, updates=[], region='dd-eu'):
+                raise ValueError('*broken')
+
+        class Fast(Updater):
+            received = []
+            def on_servers(self, updates=[], region='dd-eu'):
+                updates.append('*changed')  # on its own copy
+                self.received.append(updates)
+
+        pump.add_updater(Slow({'active': True}))
+        pump.add_updater(Slow({'active': True, 'wait': False}))
+        pump.add_updater(Broken({'active': True}))
+        pump.add_updater(Fast({'active': True}))
+
+        updates = [{'id': '*id'}]
+        start = time.time()
+        pump.on_servers(updates, 'dd-eu')
+        self.assertTrue(time.time() - start < 0.9)
+
+        self.assertEqual(updates, [{'id': '*id'}])
+        self.assertEqual(Fast.received, [[{'id': '*id'}, '*changed']])
+
+        stats = pump.get_updater_stats()
+        self.assertEqual(stats['Slow']['timeouts'], 1)
+        self.assertEqual(stats['Broken']['failures'], 1)
+        self.assertEqual(stats['Fast']['calls'], 1)
+
+    def test_fan_out_one_at_a_time(self):
+
+        print('***** Test fan out one at a time ***')
+
+        pump = Pump({'updater_backlog': 1})
+
+        class Counted(Updater):
+            running = 0
+            highest = 0
+            def update_audit_log(self, items=[], region='dd-eu'):
+                Counted.running += 1
+                Counted.highest = max(Counted.highest, Counted.running)
+                time.sleep(0.1)
+                Counted.running -= 1
+
+        updater = Counted({'active': True, 'wait': False})
+        pump.add_updater(updater)
+
+        import threading
+        threads = [threading.Thread(target=pump.fan_out,
+                                    args=('update_audit_log', [['a'], ['b']],
+                                          [updater], 'dd-eu'))
+                   for index in range(3)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Counted.highest, 1)  # batches are not mixed
+        self.assertTrue(time.time() - start >= 0.25)  # backlog is capped
+        self.assertEqual(pump.add_backlog(updater, 0), 0)
+
+    def test_list_active_servers(self):
+
+        print('***** Test list active servers ***')
+
+        pump = Pump({'inventory_threshold': 2})
+
+        engine = mock.Mock()
+        engine.nodes = {}
+        engine.pages = 1
+        engine.get_node_by_id.side_effect = lambda id: {'id': id}
+        pump.engines['dd-eu'] = engine
+
+        def record(action, id, caller='foo.bar'):
+            return ['*uid', '2017-05-01 07:05:12', caller, '', '', '',
+                    'SERVER', 'web [EU6_{}]'.format(id), action, '', '']
+
+        raw = [
+            record('Deploy Server', 'a'),
+            record('Reboot Server', 'b'),
+            record('Start Server', 'c', caller='OEC_SYSTEM'),
+            record('Delete Server', 'd'),
+            ]
+
+        servers = pump.list_active_servers(raw, 'dd-eu')
+        self.assertEqual([x['id'] for x in servers], ['a', 'b'])
+        self.assertEqual(servers[0]['actor'], 'Foo Bar')
+        self.assertEqual(servers[0]['region'], 'dd-eu')
+        self.assertFalse('account' in servers[0])
+
+        self.assertEqual(engine.forget_node.call_args_list,
+                         [mock.call('a'), mock.call('c'), mock.call('d')])
+        self.assertTrue(engine.list_servers.called)
+
+        engine.list_servers.reset_mock()
+        pump.list_active_servers(raw[:1], 'dd-eu')
+        self.assertFalse(engine.list_servers.called)
+
+        pump.engines['acme@dd-eu'] = engine
+        servers = pump.list_active_servers(raw, 'acme@dd-eu')
+        self.assertEqual(servers[0]['region'], 'dd-eu')
+        self.assertEqual(servers[0]['account'], 'acme')
+
     @vcr.use_cassette(
         os.path.abspath(os.path.dirname(__file__))+'/fixtures/mcp.yaml')
     def test_mcp(self):
@@ -72,7 +777,7 @@ class PumpTests(unittest.TestCase):
 
         print('***** Test fetch summary usage ***')
 
-        items = pump.fetch_summary_usage(on=someday)
+        items = list(pump.fetch_summary_usage(on=someday))
         items.pop(0)
 
         name = 'fixtures/summary-usage-dd-eu.yaml'
@@ -88,7 +793,7 @@ class PumpTests(unittest.TestCase):
 
         print('***** Test fetch detailed usage ***')
 
-        items = pump.fetch_detailed_usage(on=someday)
+        items = list(pump.fetch_detailed_usage(on=someday))
         items.pop(0)
 
         name = 'fixtures/detailed-usage-dd-eu.yaml'
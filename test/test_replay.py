@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from models.base import Updater
+from models.files import FilesUpdater
+from pump import Pump
+from replay import Replay
+from spool import Spool
+
+
+class Recorder(Updater):
+
+    def __init__(self, settings={}):
+        Updater.__init__(self, settings)
+        self.calls = []
+
+    def update_summary_usage(self, items=[], region='dd-eu'):
+        self.calls.append(('update_summary_usage', items, region))
+
+    def update_detailed_usage(self, items=[], region='dd-eu'):
+        self.calls.append(('update_detailed_usage', items, region))
+
+    def update_audit_log(self, items=[], region='dd-eu', account=None):
+        if account:
+            self.calls.append(('update_audit_log', items, region, account))
+        else:
+            self.calls.append(('update_audit_log', items, region))
+
+    def on_servers(self, updates=[], region='dd-eu'):
+        self.calls.append(('on_servers', updates, region))
+
+
+summary = [
+    ['2017-01-31', 'EU6'] + ['1'] * 25,
+    ['2017-02-01', 'EU6'] + ['2'] * 25,
+    ['2017-02-01', 'NA9'] + ['3'] * 25,
+]
+
+detailed = [
+    ['node-1', '*uuid1', 'Server', 'EU7', '10.0.0.1', 'NORMAL',
+     'tag, a', 'tag b', '2017-02-01 00:00:00', '2017-02-01 23:59:59',
+     '24.00', 'STANDARD', '2'] + ['4'] * 20,
+    ['files', '*uuid2', 'Cloud Files Account', '', '', 'NORMAL',
+     '', '', '2017-02-01 00:00:00', '2017-02-01 23:59:59',
+     '24.00', '', '0'] + ['0'] * 20,
+    ['node-3', '*uuid3', 'Server', 'AU9', '10.0.0.3', 'NORMAL',
+     '2017-02-01 00:00:00', '2017-02-01 23:59:59',
+     '24.00', 'STANDARD', '1'] + ['4'] * 20,
+]
+
+audit = [
+    ['*a1', '2017-02-01 10:00:00', 'foo.bar', 'IT', '', '', 'SERVER',
+     'node-1[dd-eu_*uuid1]', 'Start Server', '', 'OK'],
+    ['*a2', '2017-02-02 10:00:00', 'foo.bar', 'IT', '', '', 'SERVER',
+     'node-4[dd-na_*uuid4]', 'Deploy Server', '', 'OK'],
+]
+
+
+class ReplayTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.settings = {
+            'summary_usage': os.path.join(self.folder, 'summary_usage.log'),
+            'detailed_usage': os.path.join(self.folder, 'detailed_usage.log'),
+            'audit_log': os.path.join(self.folder, 'audit_log.log'),
+        }
+
+        updater = FilesUpdater(self.settings)
+        updater.update_summary_usage([['headers']] + summary)
+        updater.update_detailed_usage([['headers']] + detailed)
+        updater.update_audit_log([['headers']] + audit)
+
+        self.pump = Pump({})
+        self.recorder = Recorder({'active': True})
+        self.pump.add_updater(self.recorder)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def get_records(self, label):
+        records = []
+        for name, items, region in self.recorder.calls:
+            if name == label:
+                records.extend((region, item) for item in items[1:])
+        return sorted(records)
+
+    def test_files(self):
+
+        print('***** Test replay of files ***')
+
+        replay = Replay(self.pump)
+        replay.from_files(self.settings)
+
+        self.assertEqual(self.get_records('update_summary_usage'), [
+            ('dd-eu', summary[0]), ('dd-eu', summary[1]),
+            ('dd-na', summary[2])])
+
+        self.assertEqual(self.get_records('update_audit_log'), [
+            ('dd-eu', audit[0]), ('dd-na', audit[1])])
+
+        self.assertEqual(len(self.get_records('update_detailed_usage')), 3)
+
+        cpus = {}  # headers are rebuilt for every number of tags
+        for name, items, region in self.recorder.calls:
+            if name == 'update_detailed_usage':
+                headers = items[0]
+                for item in items[1:]:
+                    self.assertEqual(len(item), len(headers))
+                    cpus[item[0]] = item[headers.index('CPU Count')]
+
+        self.assertEqual(cpus, {'node-1': '2', 'files': '0', 'node-3': '1'})
+
+        self.assertEqual(replay.get_stats(), {
+            'read': 8, 'replayed': 8, 'skipped': 0, 'invalid': 0,
+            'unknown': 0})
+
+    def test_filters(self):
+
+        print('***** Test replay filters ***')
+
+        replay = Replay(self.pump,
+                        first='2017-02-01',
+                        last='2017-02-01',
+                        regions=['dd-eu'])
+        replay.from_files(self.settings)
+
+        self.assertEqual(self.get_records('update_summary_usage'), [
+            ('dd-eu', summary[1])])
+
+        self.assertEqual(self.get_records('update_audit_log'), [
+            ('dd-eu', audit[0])])
+
+        self.assertEqual(  # global records are kept
+            [item[0] for region, item
+             in self.get_records('update_detailed_usage')],
+            ['files', 'node-1'])
+
+        self.assertEqual(replay.get_stats(), {
+            'read': 8, 'replayed': 4, 'skipped': 4, 'invalid': 0,
+            'unknown': 0})
+
+    def test_invalid(self):
+
+        print('***** Test replay of invalid lines ***')
+
+        with open(self.settings['audit_log'], 'a') as handle:
+            handle.write("['too', 'short']\n")
+            handle.write("not python\n")
+
+        replay = Replay(self.pump)
+        replay.from_files(self.settings)
+
+        self.assertEqual(len(self.get_records('update_audit_log')), 2)
+        self.assertEqual(replay.get_stats()['invalid'], 2)
+
+    def test_datacenters(self):
+
+        print('***** Test regions of data centers ***')
+
+        more = [
+            ['*a3', '2017-02-01 11:00:00', 'foo.bar', 'IT', '', '', 'SERVER',
+             'web [EU6_*uuid5]', 'Deploy Server', '', 'OK'],
+            ['*a4', '2017-02-01 12:00:00', 'foo.bar', 'IT', '', '', 'SERVER',
+             'web [CA2_*uuid6]', 'Deploy Server', '', 'OK'],
+            ['*a5', '2017-02-01 13:00:00', 'foo.bar', 'IT', '', '', 'SERVER',
+             'web [XY1_*uuid7]', 'Deploy Server', '', 'OK'],
+            ['*a6', '2017-02-01 14:00:00', 'foo.bar', 'IT', '', '', 'USER',
+             'foo.bar', 'Login', '', 'OK'],
+        ]
+        FilesUpdater(self.settings).update_audit_log([['headers']] + more)
+
+        replay = Replay(self.pump, regions=['dd-na'])
+        self.assertEqual(replay.get_region('update_summary_usage',
+                                           ['2017-02-01', 'CA2']), 'dd-na')
+        self.assertEqual(replay.get_region('update_summary_usage',
+                                           ['2017-02-01', 'XY1']), None)
+
+        replay.from_files(self.settings)
+
+        self.assertEqual(self.get_records('update_audit_log'), [
+            ('dd-na', audit[1]),
+            ('dd-na', more[1]),
+            ('dd-na', more[3])])  # not bound to a region
+
+        stats = replay.get_stats()
+        self.assertEqual(stats['unknown'], 1)
+        self.assertEqual(stats['skipped'], 6)
+
+    def test_account(self):
+
+        print('***** Test replay of an account ***')
+
+        FilesUpdater(self.settings).update_audit_log(
+            [['headers']] + audit[:1], account='acme')
+
+        replay = Replay(self.pump, account='acme')
+        replay.from_files(self.settings)
+
+        self.assertEqual(self.recorder.calls, [
+            ('update_audit_log', [Replay.AUDIT_LOG_HEADERS] + audit[:1],
+             'dd-eu', 'acme')])
+
+    def test_spool(self):
+
+        print('***** Test replay of spool ***')
+
+        path = os.path.join(self.folder, 'spool.jsonl.gz')
+        spool = Spool(path)
+        spool.append('update_audit_log', [Replay.AUDIT_LOG_HEADERS] + audit,
+                     'dd-eu')
+        spool.append('on_servers', [{'id': '*id', 'stamp': '2017-01-01'}],
+                     'dd-eu')
+        spool.append('on_servers', [{'id': '*id', 'stamp': '2017-02-01'}],
+                     'dd-na')
+
+        replay = Replay(self.pump, first='2017-02-01')
+        replay.from_spool(path)
+
+        self.assertEqual(self.recorder.calls, [
+            ('update_audit_log', [Replay.AUDIT_LOG_HEADERS] + audit, 'dd-eu'),
+            ('on_servers', [{'id': '*id', 'stamp': '2017-02-01'}], 'dd-na'),
+        ])
+
+        self.assertFalse(spool.is_empty())  # spool is only read
+
+
+if __name__ == '__main__':
+
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
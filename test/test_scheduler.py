@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import mock
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from scheduler import (Scheduler, get_clock_gettime, get_monotonic,
+                       get_steady)
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def test_adaptive(self):
+
+        print('***** Test adaptive schedule ***')
+
+        with mock.patch('scheduler.monotonic', return_value=1000.0):
+
+            scheduler = Scheduler(interval=60, minimum=15, maximum=100,
+                                  growth=2, phase=5)
+            self.assertEqual(scheduler.get_delay(), 5.0)
+
+            self.assertEqual(scheduler.advance(0), 105.0)  # idle
+            self.assertEqual(scheduler.interval, 100.0)  # capped
+
+            self.assertEqual(scheduler.advance(None), 205.0)  # error
+            self.assertEqual(scheduler.interval, 100.0)
+
+            self.assertEqual(scheduler.advance(3), 220.0)  # activity
+            self.assertEqual(scheduler.interval, 15.0)
+
+    def test_drift(self):
+
+        print('***** Test drift-free schedule ***')
+
+        with mock.patch('scheduler.monotonic') as clock:
+
+            clock.return_value = 0.0
+            scheduler = Scheduler(interval=60, minimum=60, maximum=60)
+
+            clock.return_value = 7.0  # time spent polling
+            self.assertEqual(scheduler.advance(0), 53.0)
+            self.assertEqual(scheduler.deadline, 60.0)
+
+            clock.return_value = 500.0  # very late
+            self.assertEqual(scheduler.advance(0), 0.0)
+            self.assertEqual(scheduler.get_delay(), 0.0)
+
+    def test_clocks(self):
+
+        print('***** Test monotonic clocks ***')
+
+        clock = get_monotonic()
+        first = clock()
+        self.assertTrue(clock() >= first)
+
+        if sys.platform.startswith('linux'):
+            clock = get_clock_gettime(1)
+            self.assertTrue(abs(clock() - first) < 1.0)
+
+        wall = mock.Mock(return_value=100.0)
+        clock = get_steady(wall)
+        wall.return_value = 40.0  # system time set back
+        self.assertEqual(clock(), 100.0)
+        wall.return_value = 101.0
+        self.assertEqual(clock(), 101.0)
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
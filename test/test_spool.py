@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from spool import Spool
+
+
+class SpoolTests(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'spool.jsonl.gz')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_drain(self):
+
+        print('***** Test spool drain ***')
+
+        spool = Spool(self.path)
+        self.assertTrue(spool.is_empty())
+
+        spool.append('update_audit_log', [['a', 'b'], ['1', '2']], 'dd-eu')
+        spool.append('on_servers', [{'id': '*id'}], 'dd-na')
+        spool.append('update_audit_log', [['a', 'b'], ['3', '4']], 'dd-eu')
+        self.assertFalse(spool.is_empty())
+
+        stats = spool.get_stats()
+        self.assertTrue(stats['bytes'] > 0)
+        self.assertEqual(stats['appended'], 3)
+
+        replayed = []
+
+        def broken(label, items, region):
+            if label == 'on_servers':
+                return False
+            replayed.append((label, items, region))
+
+        self.assertEqual(spool.drain(broken, rate=1000), 1)
+        self.assertFalse(spool.is_empty())
+
+        spool.append('update_audit_log', [['a', 'b'], ['5', '6']], 'dd-eu')
+
+        def working(label, items, region):
+            replayed.append((label, items, region))
+
+        self.assertEqual(spool.drain(working, rate=1000), 2)  # draining
+        self.assertEqual(spool.drain(working, rate=1000), 1)  # new file
+        self.assertTrue(spool.is_empty())
+        self.assertEqual(spool.drain(working, rate=1000), 0)
+
+        self.assertEqual(replayed, [
+            ('update_audit_log', [['a', 'b'], ['1', '2']], 'dd-eu'),
+            ('on_servers', [{'id': '*id'}], 'dd-na'),
+            ('update_audit_log', [['a', 'b'], ['3', '4']], 'dd-eu'),
+            ('update_audit_log', [['a', 'b'], ['5', '6']], 'dd-eu')])
+
+    def test_truncated(self):
+
+        print('***** Test truncated spool ***')
+
+        spool = Spool(self.path)
+        spool.append('update_audit_log', [['a', 'b'], ['1', '2']], 'dd-eu')
+        spool.append('update_audit_log', [['a', 'b'], ['3', '4']], 'dd-eu')
+
+        with open(self.path, 'rb') as handle:
+            data = handle.read()
+        with open(self.path, 'wb') as handle:
+            handle.write(data[:-10])  # crash while appending
+
+        records = list(spool.read(self.path))
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]['items'], [['a', 'b'], ['1', '2']])
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+import unittest
+import logging
+import mock
+from multiprocessing import Queue
+import os
+import signal
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath('..'))
+
+from supervisor import Heartbeat, Supervisor
+
+
+def crash(queue, region, heart):
+    raise ValueError('*crash')
+
+
+def recycle(queue, region, heart):
+    message = queue.get()
+    heart.count()
+    heart.is_worn()
+    sys.exit(0)
+
+
+def hang(queue, region, heart):
+    time.sleep(60)
+
+
+def idle(queue, region, heart):
+    while queue.get() != 'STOP':
+        pass
+
+
+echoes = Queue()
+
+
+def echo(queue, region, heart):
+    while True:
+        echoes.put(queue.get())
+
+
+class SupervisorTests(unittest.TestCase):
+
+    def wait(self, supervisor):
+        for worker in supervisor.workers:
+            worker.process.join(5)
+
+    def test_restart(self):
+
+        print('***** Test restart of workers ***')
+
+        supervisor = Supervisor({'worker_backoff': 0.2,
+                                 'worker_timeout': 30})
+        worker = supervisor.add('day', 'dd-eu', crash)
+        self.wait(supervisor)
+
+        self.assertEqual(supervisor.check(), 0)  # backoff
+        self.assertEqual(worker.restarts, 1)
+
+        time.sleep(0.3)
+        self.assertEqual(supervisor.check(), 1)
+        self.wait(supervisor)
+
+        supervisor.check()
+        self.assertEqual(worker.failures, 2)
+        self.assertTrue(worker.next_start - time.time() > 0.2)  # grows
+
+        self.assertEqual(supervisor.get_stats(),
+                         {'dd-eu': {'restarts': 2,
+                                    'recycles': 0,
+                                    'alive': 0}})
+
+    def test_recycle(self):
+
+        print('***** Test recycling of workers ***')
+
+        supervisor = Supervisor({'worker_tasks': 1})
+        worker = supervisor.add('minute', 'dd-na', recycle, sticky=True)
+        supervisor.send('minute', '*day')
+        self.wait(supervisor)
+
+        self.assertEqual(supervisor.check(), 1)  # at once
+        self.assertEqual(worker.recycles, 1)
+        self.assertEqual(worker.restarts, 0)
+
+        self.wait(supervisor)  # the last message has been sent again
+        self.assertEqual(worker.process.exitcode, 0)
+        supervisor.stop()
+
+    def test_recycle_region(self):
+
+        print('***** Test recycling of workers of a region ***')
+
+        supervisor = Supervisor({})
+        minute = supervisor.add('minute', 'dd-eu', idle, sticky=True)
+        other = supervisor.add('minute', 'dd-na', idle, sticky=True)
+
+        supervisor.send('minute', '*today')
+        supervisor.recycle('dd-eu')
+        minute.process.join(5)
+        self.assertEqual(minute.process.exitcode, 0)
+
+        self.assertEqual(supervisor.check(), 1)
+        self.assertEqual(minute.recycles, 1)
+        self.assertEqual(other.recycles, 0)
+        self.assertEqual(minute.pending, ['*today'])  # without STOP
+        supervisor.stop()
+
+    def test_silence(self):
+
+        print('***** Test silent workers ***')
+
+        supervisor = Supervisor({'worker_timeout': 0.1,
+                                 'worker_backoff': 60})
+        worker = supervisor.add('day', 'dd-af', hang)
+
+        time.sleep(0.2)
+        self.assertEqual(supervisor.check(), 0)
+        self.assertEqual(worker.restarts, 1)
+        self.assertEqual(supervisor.get_stats()['dd-af']['alive'], 0)
+
+    def test_killed(self):
+
+        print('***** Test workers killed while waiting ***')
+
+        supervisor = Supervisor({'worker_backoff': 0.1})
+        minute = supervisor.add('minute', 'dd-eu', echo, sticky=True)
+        day = supervisor.add('day', 'dd-eu', echo)
+
+        supervisor.send('minute', '*today')
+        self.assertEqual(echoes.get(timeout=5), '*today')
+
+        time.sleep(0.2)  # both processes are waiting in get()
+        for worker in (minute, day):
+            os.kill(worker.process.pid, signal.SIGKILL)
+            worker.process.join(5)
+
+        supervisor.send('day', '*yesterday')  # while the worker is dead
+        self.assertEqual(supervisor.check(), 0)  # backoff
+        time.sleep(0.2)
+        self.assertEqual(supervisor.check(), 2)
+
+        received = set([echoes.get(timeout=5), echoes.get(timeout=5)])
+        self.assertEqual(received, set(['*today', '*yesterday']))
+
+        supervisor.send('minute', '*tomorrow')
+        self.assertEqual(echoes.get(timeout=5), '*tomorrow')
+        supervisor.send('day', '*today')
+        self.assertEqual(echoes.get(timeout=5), '*today')
+
+        for worker in supervisor.workers:
+            worker.process.terminate()
+
+    def test_heartbeat(self):
+
+        print('***** Test heartbeat ***')
+
+        heart = Heartbeat(tasks=2, rss=0)
+        heart.count()
+        self.assertFalse(heart.is_worn())
+        heart.count()
+        self.assertTrue(heart.is_worn())
+        heart.reset()
+        self.assertFalse(heart.is_worn())
+        self.assertTrue(heart.get_silence() < 1.0)
+
+        self.assertTrue(Heartbeat.get_rss() > 1.0)
+
+        heart = Heartbeat(tasks=0, rss=1)
+        self.assertTrue(heart.is_worn())
+
+if __name__ == '__main__':
+    logging.getLogger('').setLevel(logging.DEBUG)
+    sys.exit(unittest.main())